@@ -3,11 +3,93 @@ doit task/build automation
 """
 
 import os
+import re
 from lattice import Lattice  # type: ignore
+import yaml
 from hers_diagnostic_output import HERSDiagnosticData
+from hers_diagnostic_output.fuzz import check_fuzz
+from hers_diagnostic_output.regression import check_regression
 
 data_model = Lattice()
 
+SCHEMA_PATH = os.path.join("schema", "HERSDiagnosticOutput.schema.yaml")
+RECORDS_PATH = os.path.join("hers_diagnostic_output", "records.py")
+RECORD_DATA_GROUPS = ["EnergyOutput", "SystemOutput", "HomeOutputs"]
+PRIMITIVE_TYPES = {"Numeric": "float", "Integer": "int", "String": "str"}
+GOLDEN_RESULTS_PATH = os.path.join("examples", "golden_results.json")
+FUZZ_DOCUMENTS = 20
+FUZZ_SEED = 0
+
+
+def get_record_element(name, element):
+    # Returns the annotation and the expression converting data[name] for one data element
+    data_type = element["Data Type"]
+    array = re.match(r"^\[(.+?)\]", data_type)
+    item_type = array.group(1) if array else data_type
+    if item_type[0] in "<{":  # enumeration or data group
+        annotation = item_type[1:-1]
+        conversion = f"{annotation}({{}})"
+    else:
+        annotation = PRIMITIVE_TYPES[item_type]
+        conversion = "{}"
+    value = f'data["{name}"]'
+    if array:
+        annotation = f"List[{annotation}]"
+        if conversion != "{}":
+            value = f"[{conversion.format('item')} for item in {value}]"
+    else:
+        value = conversion.format(value)
+    if not element.get("Required", False):
+        annotation = f"Optional[{annotation}]"
+        value = f'{value} if "{name}" in data else None'
+    return annotation, value
+
+
+def generate_records(schema_path, records_path, data_groups):
+    with open(schema_path, "r", encoding="utf-8") as schema_file:
+        schema = yaml.safe_load(schema_file)
+    enumerations = sorted(
+        {
+            enumeration.group(1)
+            for data_group in data_groups
+            for element in schema[data_group]["Data Elements"].values()
+            if (enumeration := re.search(r"<(\w+)>", element["Data Type"]))
+        }
+    )
+    lines = [
+        '"""Typed records of the schema data groups used by the HERS Index calculation.',
+        "",
+        "Generated from the schema by `doit generate_records`. Do not edit.",
+        '"""',
+        "",
+        "from typing import Dict, List, Optional",
+        "",
+        f"from .enumerations import {', '.join(enumerations)}",
+    ]
+    for data_group in data_groups:
+        elements = schema[data_group]["Data Elements"]
+        lines += ["", "", f"class {data_group}:"]
+        slots = ", ".join(f'"{name}"' for name in elements)
+        lines.append(f"    __slots__ = ({slots},)")
+        lines += ["", "    def __init__(self, data: Dict):"]
+        for name, element in elements.items():
+            annotation, value = get_record_element(name, element)
+            lines.append(f"        self.{name}: {annotation} = {value}")
+    with open(records_path, "w", encoding="utf-8") as records_file:
+        records_file.write("\n".join(lines) + "\n")
+
+
+def task_generate_records():
+    """Generates typed records from the schema"""
+    return {
+        "file_dep": [SCHEMA_PATH],
+        "targets": [RECORDS_PATH],
+        "actions": [
+            (generate_records, [SCHEMA_PATH, RECORDS_PATH, RECORD_DATA_GROUPS]),
+            f"ruff format {RECORDS_PATH}",
+        ],
+    }
+
 
 def task_generate_web_docs():
     """Generates Markdown Documentation"""
@@ -23,3 +105,25 @@ def task_calculate_hers_index():
     """Calculates HERS Index"""
     for example_file in data_model.examples:
         HERSDiagnosticData(example_file).verify()
+
+
+def task_check_regression():
+    """Compares the examples against their golden intermediaries and budgets"""
+    # Golden results are created with regression.create_golden_results. Without them
+    # the check is skipped, and says so.
+    if os.path.exists(GOLDEN_RESULTS_PATH):
+        action = (check_regression, [GOLDEN_RESULTS_PATH])
+    else:
+        skipped = (
+            f"No golden results at {GOLDEN_RESULTS_PATH}, regression check skipped."
+        )
+        action = (print, [skipped])
+    return {"actions": [action], "verbosity": 2}
+
+
+def task_fuzz():
+    """Compares the calculation engines with an independent reference on random documents"""
+    return {
+        "actions": [(check_fuzz, [FUZZ_DOCUMENTS, FUZZ_SEED])],
+        "verbosity": 2,
+    }
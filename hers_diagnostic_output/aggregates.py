@@ -0,0 +1,575 @@
+"""Annual aggregates of each home type, combined into the HERS Index intermediaries."""
+
+import hashlib
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from koozie import convert  # type: ignore
+
+from .emission_factors import get_emission_factors
+from .enumerations import EndUse, FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .reductions import get_block_sums, get_dot, get_sum
+
+TNML_TERMS = ["nmeul_heat", "nmeul_cool", "nmeul_hw", "ec_la", "ec_vent", "ec_dh"]
+TRL_TERMS = ["reul_heat", "reul_cool", "reul_hw", "rec_la", "rec_vent", "rec_dh"]
+
+
+class SystemAggregates:
+    def __init__(
+        self,
+        primary_fuel_type: FuelType,
+        equipment_efficiency_coefficient: float,
+        load: float,
+        energy: Dict[FuelType, float],
+        energy_consumption: float,
+    ):
+        self.primary_fuel_type = primary_fuel_type
+        self.equipment_efficiency_coefficient = equipment_efficiency_coefficient
+        self.load = load  # annual load (kBtu), zero if not provided
+        self.energy = energy  # annual energy use by fuel type (kBtu)
+        self.energy_consumption = energy_consumption  # EC (kBtu)
+        # kBtu at the document's timestep, if aggregated
+        self.hourly_electricity_use: Optional[np.ndarray] = None
+
+
+class HomeAggregates:
+    def __init__(
+        self,
+        systems: Dict[EndUse, List[SystemAggregates]],
+        energy: Dict[EndUse, Dict[FuelType, float]],
+        hourly_electricity_use: Optional[np.ndarray],
+    ):
+        self.systems = systems
+        self.energy = energy  # annual energy use by end use and fuel type (kBtu)
+        # kBtu at the document's timestep, if requested
+        self.hourly_electricity_use = hourly_electricity_use
+        # Electricity use (kBtu) of each end use, if aggregated from the time series
+        self.end_use_hourly_electricity_use: Dict[EndUse, np.ndarray] = {}
+
+    def get_end_use_energy(self, end_use: EndUse) -> float:
+        return math.fsum(
+            self.energy[end_use].get(fuel_type, 0.0)
+            for fuel_type in HERSDiagnosticData.fuel_types
+        )
+
+    def get_fuel_type_energy(self, fuel_type: FuelType) -> float:
+        return math.fsum(
+            self.energy[end_use].get(fuel_type, 0.0)
+            for end_use in HERSDiagnosticData.end_uses
+        )
+
+
+def get_energy_output_aggregates(energy_outputs: List[Dict]) -> List[Dict]:
+    return [
+        {
+            "fuel_type": energy_output["fuel_type"],
+            "energy": get_sum(energy_output["energy"]),
+        }
+        for energy_output in energy_outputs
+    ]
+
+
+def get_electricity_series(energy_outputs: List[Dict]) -> List[np.ndarray]:
+    return [
+        np.asarray(energy_output["energy"], dtype=float)
+        for energy_output in energy_outputs
+        if energy_output["fuel_type"] == FuelType.ELECTRICITY.value
+    ]
+
+
+def add_series(series: List[np.ndarray], number_of_timesteps: int) -> np.ndarray:
+    # Added one at a time in the given order, as the reference engine does, so the
+    # result is identical
+    total = np.zeros(number_of_timesteps)
+    for values in series:
+        total += values
+    return total
+
+
+def get_hourly_electricity_use(
+    energy_outputs: List[Dict], number_of_timesteps: int
+) -> np.ndarray:
+    return add_series(get_electricity_series(energy_outputs), number_of_timesteps)
+
+
+def get_home_output_aggregates(
+    home_output: Dict,
+    include_hourly: bool,
+    number_of_timesteps: int = HERSDiagnosticData.NUMBER_OF_TIMESTEPS,
+) -> Dict:
+    # Annual totals of one home type's outputs in the layout of the schema's
+    # HomeAggregates data group (the hourly electricity use is kept as an array)
+    home_aggregates: Dict = {}
+    energy_outputs: List[Dict] = []
+    for end_use in HERSDiagnosticData.system_end_uses:
+        system_aggregates = []
+        for system_output in home_output[f"{end_use.value}_system_output"]:
+            aggregates = {
+                "primary_fuel_type": system_output["primary_fuel_type"],
+                "equipment_efficiency_coefficient": system_output[
+                    "equipment_efficiency_coefficient"
+                ],
+                "annual_energy_use": get_energy_output_aggregates(
+                    system_output["energy_use"]
+                ),
+            }
+            if "load" in system_output:
+                aggregates["annual_load"] = get_sum(system_output["load"])
+            system_aggregates.append(aggregates)
+            energy_outputs += system_output["energy_use"]
+        home_aggregates[f"{end_use.value}_system_aggregates"] = system_aggregates
+    for end_use in HERSDiagnosticData.other_end_uses:
+        if f"{end_use.value}_energy" in home_output:
+            home_aggregates[f"{end_use.value}_energy"] = get_energy_output_aggregates(
+                home_output[f"{end_use.value}_energy"]
+            )
+            energy_outputs += home_output[f"{end_use.value}_energy"]
+    if include_hourly:
+        home_aggregates["hourly_electricity_use"] = get_hourly_electricity_use(
+            energy_outputs, number_of_timesteps
+        )
+    return home_aggregates
+
+
+def get_fuel_type_totals(
+    energy: Iterable[Tuple[FuelType, float]],
+) -> Dict[FuelType, float]:
+    terms: Dict[FuelType, List[float]] = {}
+    for fuel_type, fuel_energy in energy:
+        terms.setdefault(fuel_type, []).append(fuel_energy)
+    return {fuel_type: math.fsum(values) for fuel_type, values in terms.items()}
+
+
+def get_energy_aggregate_totals(
+    energy_aggregates: List[Dict],
+) -> Dict[FuelType, float]:
+    return get_fuel_type_totals(
+        (FuelType(energy_aggregate["fuel_type"]), energy_aggregate["energy"])
+        for energy_aggregate in energy_aggregates
+    )
+
+
+def load_home_aggregates(home_aggregates: Dict) -> HomeAggregates:
+    systems: Dict[EndUse, List[SystemAggregates]] = {}
+    energy: Dict[EndUse, Dict[FuelType, float]] = {}
+    for end_use in HERSDiagnosticData.system_end_uses:
+        systems[end_use] = []
+        energy[end_use] = {}
+        for system_aggregates in home_aggregates[f"{end_use.value}_system_aggregates"]:
+            system_energy = get_energy_aggregate_totals(
+                system_aggregates["annual_energy_use"]
+            )
+            systems[end_use].append(
+                SystemAggregates(
+                    FuelType(system_aggregates["primary_fuel_type"]),
+                    system_aggregates["equipment_efficiency_coefficient"],
+                    system_aggregates.get("annual_load", 0.0),
+                    system_energy,
+                    # EC sums the fuel total of each energy use entry
+                    math.fsum(
+                        system_energy[FuelType(energy_aggregate["fuel_type"])]
+                        for energy_aggregate in system_aggregates["annual_energy_use"]
+                    ),
+                )
+            )
+        # Totals of the systems' fuel totals, as in HERSDiagnosticData.get_annual_energy
+        energy[end_use] = get_fuel_type_totals(
+            item for system in systems[end_use] for item in system.energy.items()
+        )
+    for end_use in HERSDiagnosticData.other_end_uses:
+        energy[end_use] = get_energy_aggregate_totals(
+            home_aggregates.get(f"{end_use.value}_energy", [])
+        )
+    hourly_electricity_use = home_aggregates.get("hourly_electricity_use")
+    if hourly_electricity_use is not None:
+        hourly_electricity_use = np.asarray(hourly_electricity_use, dtype=float)
+    return HomeAggregates(systems, energy, hourly_electricity_use)
+
+
+def aggregate_home_output(
+    home_output: Dict,
+    include_hourly: bool,
+    number_of_timesteps: int = HERSDiagnosticData.NUMBER_OF_TIMESTEPS,
+) -> HomeAggregates:
+    # Reduce one home type's outputs to annual totals (plus, for CO2 home types, one
+    # hourly electricity vector per system and end use). Only depends on this home type's
+    # data, so large documents can aggregate home types concurrently (see
+    # HERSDiagnosticData.calculate_in_parallel); otherwise files are the unit of
+    # parallel work (see batch.py).
+    home = load_home_aggregates(get_home_output_aggregates(home_output, False))
+    if include_hourly:
+        # The home total adds every electricity series in document order
+        electricity_series: List[np.ndarray] = []
+        for end_use in HERSDiagnosticData.system_end_uses:
+            end_use_hourly_electricity_use = np.zeros(number_of_timesteps)
+            for system_output, system in zip(
+                home_output[f"{end_use.value}_system_output"], home.systems[end_use]
+            ):
+                series = get_electricity_series(system_output["energy_use"])
+                system.hourly_electricity_use = add_series(series, number_of_timesteps)
+                end_use_hourly_electricity_use += system.hourly_electricity_use
+                electricity_series += series
+            home.end_use_hourly_electricity_use[end_use] = (
+                end_use_hourly_electricity_use
+            )
+        for end_use in HERSDiagnosticData.other_end_uses:
+            series = get_electricity_series(
+                home_output.get(f"{end_use.value}_energy", [])
+            )
+            home.end_use_hourly_electricity_use[end_use] = add_series(
+                series, number_of_timesteps
+            )
+            electricity_series += series
+        home.hourly_electricity_use = add_series(
+            electricity_series, number_of_timesteps
+        )
+    return home
+
+
+def aggregate_home_outputs(data: Dict) -> Dict[HomeType, HomeAggregates]:
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    return {
+        home_type: aggregate_home_output(
+            data[f"{home_type.value}_output"],
+            home_type in HERSDiagnosticData.co2_home_types,
+            number_of_timesteps,
+        )
+        for home_type in HomeType
+    }
+
+
+def get_number_of_values(data: Dict) -> int:
+    # Number of energy use and load values of the five home types
+    number_of_series = 0
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        for end_use in HERSDiagnosticData.system_end_uses:
+            for system_output in home_output[f"{end_use.value}_system_output"]:
+                number_of_series += len(system_output["energy_use"])
+                number_of_series += "load" in system_output
+        for end_use in HERSDiagnosticData.other_end_uses:
+            number_of_series += len(home_output.get(f"{end_use.value}_energy", []))
+    return number_of_series * HERSDiagnosticData.get_number_of_timesteps(data)
+
+
+def update_checksum(checksum, path: str, values: List[float]):
+    checksum.update(path.encode())
+    checksum.update(np.asarray(values, dtype="<f8").tobytes())
+
+
+def get_hourly_data_checksum(data: Dict) -> str:
+    # SHA-256 of every hourly energy use and load array of the five home types, in
+    # document order, each prefixed with its location in the document
+    checksum = hashlib.sha256()
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        for end_use in HERSDiagnosticData.system_end_uses:
+            for system_index, system_output in enumerate(
+                home_output[f"{end_use.value}_system_output"]
+            ):
+                path = f"{home_type.value}/{end_use.value}/{system_index}"
+                if "load" in system_output:
+                    update_checksum(checksum, f"{path}/load", system_output["load"])
+                for energy_index, energy_output in enumerate(
+                    system_output["energy_use"]
+                ):
+                    update_checksum(
+                        checksum,
+                        f"{path}/{energy_index}/{energy_output['fuel_type']}",
+                        energy_output["energy"],
+                    )
+        for end_use in HERSDiagnosticData.other_end_uses:
+            for energy_index, energy_output in enumerate(
+                home_output.get(f"{end_use.value}_energy", [])
+            ):
+                update_checksum(
+                    checksum,
+                    f"{home_type.value}/{end_use.value}/{energy_index}/{energy_output['fuel_type']}",
+                    energy_output["energy"],
+                )
+    return checksum.hexdigest()
+
+
+def embed_annual_aggregates(data: Dict) -> Dict:
+    # Producer-side helper: returns a copy of the document with `annual_aggregates`
+    annual_aggregates: Dict = {"hourly_data_checksum": get_hourly_data_checksum(data)}
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    for home_type in HomeType:
+        home_aggregates = get_home_output_aggregates(
+            data[f"{home_type.value}_output"],
+            home_type in HERSDiagnosticData.co2_home_types,
+            number_of_timesteps,
+        )
+        if "hourly_electricity_use" in home_aggregates:
+            home_aggregates["hourly_electricity_use"] = home_aggregates[
+                "hourly_electricity_use"
+            ].tolist()
+        annual_aggregates[f"{home_type.value}_aggregates"] = home_aggregates
+    return {**data, "annual_aggregates": annual_aggregates}
+
+
+def get_fuel_types(energy_outputs: List[Dict]) -> List[str]:
+    return [energy_output["fuel_type"] for energy_output in energy_outputs]
+
+
+def annual_aggregates_match(data: Dict) -> bool:
+    # Cheap structural check that the embedded aggregates describe this document's
+    # systems (counts, fuel types and EECs); the hourly values are only checked by an audit
+    if "annual_aggregates" not in data:
+        return False
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        home_aggregates = data["annual_aggregates"].get(f"{home_type.value}_aggregates")
+        if home_aggregates is None:
+            return False
+        for end_use in HERSDiagnosticData.system_end_uses:
+            system_outputs = home_output[f"{end_use.value}_system_output"]
+            system_aggregates = home_aggregates.get(
+                f"{end_use.value}_system_aggregates", []
+            )
+            if len(system_outputs) != len(system_aggregates):
+                return False
+            for system_output, aggregates in zip(system_outputs, system_aggregates):
+                if (
+                    system_output["primary_fuel_type"]
+                    != aggregates["primary_fuel_type"]
+                    or system_output["equipment_efficiency_coefficient"]
+                    != aggregates["equipment_efficiency_coefficient"]
+                    or ("load" in system_output) != ("annual_load" in aggregates)
+                    or get_fuel_types(system_output["energy_use"])
+                    != get_fuel_types(aggregates["annual_energy_use"])
+                ):
+                    return False
+        for end_use in HERSDiagnosticData.other_end_uses:
+            if get_fuel_types(
+                home_output.get(f"{end_use.value}_energy", [])
+            ) != get_fuel_types(home_aggregates.get(f"{end_use.value}_energy", [])):
+                return False
+        if home_type in HERSDiagnosticData.co2_home_types and (
+            len(home_aggregates.get("hourly_electricity_use", []))
+            != HERSDiagnosticData.get_number_of_timesteps(data)
+        ):
+            return False
+    return True
+
+
+def is_sampled_for_audit(checksum: str, audit_fraction: float) -> bool:
+    # Deterministic sampling: the same file is always either audited or not
+    return int(checksum[:8], 16) < audit_fraction * 16**8
+
+
+def get_fuel_coefficients(end_use: EndUse, primary_fuel_type: FuelType) -> Dict:
+    # 'a' and 'b' coefficients of Table 4.1.1(1)
+    if primary_fuel_type in HERSDiagnosticData.fossil_fuel_types:
+        primary_fuel_type = FuelType.FOSSIL_FUEL
+    return HERSDiagnosticData.fuel_coefficients[(end_use, primary_fuel_type)]
+
+
+def get_normalized_modified_load(
+    rated_system: SystemAggregates,
+    reference_system: SystemAggregates,
+    end_use: EndUse,
+) -> float:
+    # nMEUL = REUL * nEC_x / EC_r, where nEC_x = EC_x * (a * EEC_x - b) * (EEC_r / EEC_x)
+    coefficients = get_fuel_coefficients(end_use, rated_system.primary_fuel_type)
+    eec_x = rated_system.equipment_efficiency_coefficient
+    eec_r = reference_system.equipment_efficiency_coefficient
+    nec_x = (
+        rated_system.energy_consumption
+        * (coefficients["a"] * eec_x - coefficients["b"])
+        * (eec_r / eec_x)
+    )
+    return reference_system.load * nec_x / reference_system.energy_consumption
+
+
+def get_index_adjustment_factors(data: Dict, iad_save):
+    # IAF_CFA = (2400/CFA) ^ (0.304 * IAD_SAVE)
+    # IAF_Nbr = 1 + (0.069 * IAD_SAVE * (NBr - 3))
+    # IAF_NS = (2/NS) ^ (0.12 * IAD_SAVE)
+    # Also evaluates element-wise for an array of IAD_SAVE values
+    iaf_cfa = (2400 / data["conditioned_floor_area"]) ** (0.304 * iad_save)
+    iaf_nbr = 1 + (0.069 * iad_save * (data["number_of_bedrooms"] - 3))
+    iaf_ns = (2 / data["number_of_stories"]) ** (0.12 * iad_save)
+    return iaf_cfa, iaf_nbr, iaf_ns
+
+
+def get_end_use_loads(
+    rated_home: HomeAggregates, reference_home: HomeAggregates
+) -> Dict[str, float]:
+    # nMEUL and EC terms of the rated home, REUL and REC terms of the reference home.
+    # The number of systems is taken from the rated home.
+    loads = {}
+    for end_use, name in zip(
+        HERSDiagnosticData.system_end_uses, ["heat", "cool", "hw"]
+    ):
+        rated_systems = rated_home.systems[end_use]
+        reference_systems = reference_home.systems[end_use]
+        loads[f"nmeul_{name}"] = math.fsum(
+            get_normalized_modified_load(
+                rated_systems[system_index], reference_systems[system_index], end_use
+            )
+            for system_index in range(len(rated_systems))
+        )
+        loads[f"reul_{name}"] = math.fsum(
+            reference_systems[system_index].load
+            for system_index in range(len(rated_systems))
+        )
+    for end_use, name in zip(HERSDiagnosticData.other_end_uses, ["la", "vent", "dh"]):
+        loads[f"ec_{name}"] = rated_home.get_end_use_energy(end_use)
+        loads[f"rec_{name}"] = reference_home.get_end_use_energy(end_use)
+    return loads
+
+
+def get_total_energy_use(home: HomeAggregates) -> float:
+    # TEU (kWh), with fossil fuels weighted by 0.4
+    return math.fsum(
+        convert(
+            fuel_energy * HERSDiagnosticData.get_fuel_conversion(fuel_type),
+            "kBtu",
+            "kWh",
+        )
+        for end_use in HERSDiagnosticData.end_uses
+        for fuel_type, fuel_energy in home.energy[end_use].items()
+    )
+
+
+def align_with_emission_factors(
+    values: np.ndarray, number_of_emission_factors: int
+) -> np.ndarray:
+    # Block sums of a time series at the emission factors' resolution (e.g., 35,040
+    # 15-minute values to 8760 hourly values), as a reshaped view reduced in one pass
+    return get_block_sums(
+        values,
+        HERSDiagnosticData.get_block_size(len(values), number_of_emission_factors),
+    )
+
+
+def get_series_co2_emissions(values, hourly_emission_factors: np.ndarray) -> float:
+    # Emissions of a time series (e.g., on-site power production) at any timestep
+    return get_dot(
+        align_with_emission_factors(
+            np.asarray(values, dtype=float), len(hourly_emission_factors)
+        ),
+        hourly_emission_factors,
+    )
+
+
+def get_hourly_emission_factors(data: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    # Hourly electricity emission factors in lb/kWh and lb/kBtu (views of the library's
+    # memory-mapped table when the document references a region)
+    hourly_emission_factors_kwh, hourly_emission_factors_kbtu = get_emission_factors(
+        data
+    )
+    return (
+        np.asarray(hourly_emission_factors_kwh, dtype=float),
+        np.asarray(hourly_emission_factors_kbtu, dtype=float),
+    )
+
+
+def get_electricity_co2_emissions(
+    data: Dict,
+    home_type: HomeType,
+    home: HomeAggregates,
+    hourly_emission_factors_kwh: np.ndarray,
+    hourly_emission_factors_kbtu: np.ndarray,
+) -> float:
+    # Electricity emissions, net of on-site power production and battery storage for
+    # the Rated Home
+    emissions = [
+        get_series_co2_emissions(
+            home.hourly_electricity_use, hourly_emission_factors_kbtu
+        )
+    ]
+    if home_type == HomeType.RATED_HOME:
+        if "on_site_power_production" in data:
+            emissions.append(
+                -get_series_co2_emissions(
+                    data["on_site_power_production"], hourly_emission_factors_kwh
+                )
+            )
+        if "battery_storage" in data:
+            emissions.append(
+                get_series_co2_emissions(
+                    data["battery_storage"], hourly_emission_factors_kwh
+                )
+            )
+    return math.fsum(emissions)
+
+
+def get_fossil_fuel_co2_emissions(home: HomeAggregates) -> float:
+    return math.fsum(
+        home.get_fuel_type_energy(fuel_type)
+        * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+        for fuel_type in HERSDiagnosticData.fossil_fuel_types
+    )
+
+
+def calculate_intermediaries(
+    data: Dict, aggregates: Dict[HomeType, HomeAggregates]
+) -> Dict[str, float]:
+    # Combine the independently aggregated home types into the HERS Index and CO2 Index
+    # intermediaries (same keys as HERSDiagnosticData.get_hers_index_intermediaries)
+    hourly_emission_factors = get_hourly_emission_factors(data)
+    on_site_power_production = np.asarray(
+        data.get("on_site_power_production", []), dtype=float
+    )
+    battery_storage = np.asarray(data.get("battery_storage", []), dtype=float)
+
+    loads = get_end_use_loads(
+        aggregates[HomeType.RATED_HOME], aggregates[HomeType.HERS_REFERENCE_HOME]
+    )
+    loads_iad = get_end_use_loads(
+        aggregates[HomeType.IAD_RATED_HOME],
+        aggregates[HomeType.IAD_HERS_REFERENCE_HOME],
+    )
+    # TnML = nMEUL_HEAT + nMEUL_COOL + nMEUL_HW + EC_LA + EC_VENT + EC_DH
+    # TRL = REUL_HEAT + REUL_COOL + REUL_HW + REC_LA + REC_VENT + REC_DH
+    tnml = math.fsum(loads[name] for name in TNML_TERMS)
+    trl = math.fsum(loads[name] for name in TRL_TERMS)
+    tnml_iad = math.fsum(loads_iad[name] for name in TNML_TERMS)
+    trl_iad = math.fsum(loads_iad[name] for name in TRL_TERMS)
+
+    teu = convert(get_total_energy_use(aggregates[HomeType.RATED_HOME]), "kWh", "MBtu")
+    opp = convert(get_sum(on_site_power_production), "kWh", "MBtu")
+    bsl = convert(get_sum(battery_storage), "kWh", "MBtu")
+    pe_frac = (teu - opp + bsl) / teu
+
+    iad_save = (100 - tnml_iad / trl_iad * 100) / 100
+    iaf_cfa, iaf_nbr, iaf_ns = get_index_adjustment_factors(data, iad_save)
+    iaf_rh = iaf_cfa * iaf_nbr * iaf_ns
+
+    aco2, arco2 = [
+        get_electricity_co2_emissions(
+            data, home_type, aggregates[home_type], *hourly_emission_factors
+        )
+        + get_fossil_fuel_co2_emissions(aggregates[home_type])
+        for home_type in [HomeType.RATED_HOME, HomeType.CO2_REFERENCE_HOME]
+    ]
+
+    intermediaries = {
+        "hers_index": pe_frac * tnml / (trl * iaf_rh) * 100,
+        "co2_index": aco2 / (arco2 * iaf_rh) * 100,
+        "iaf_rh": iaf_rh,
+        "aco2": aco2,
+        "arco2": arco2,
+        "pe_frac": pe_frac,
+        "tnml": tnml,
+        "trl": trl,
+        "teu": teu,
+        "opp": opp,
+        "bsl": bsl,
+        "iad_save": iad_save,
+        "iaf_cfa": iaf_cfa,
+        "iaf_nbr": iaf_nbr,
+        "iaf_ns": iaf_ns,
+        "tnml_iad": tnml_iad,
+        "trl_iad": trl_iad,
+    }
+    for terms in [TNML_TERMS, TRL_TERMS]:
+        for name in terms:
+            intermediaries[name] = loads[name]
+        for name in terms:
+            intermediaries[f"{name}_iad"] = loads_iad[name]
+    return intermediaries
@@ -0,0 +1,167 @@
+"""Peak demand and load shape metrics of the time series of each home type."""
+
+import functools
+from typing import Dict, List, Optional
+
+import numpy as np
+from koozie import convert  # type: ignore
+
+from .aggregates import aggregate_home_output
+from .batch import map_files
+from .enumerations import HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import load
+
+KBTU_TO_KWH = convert(1.0, "kBtu", "kWh")
+
+
+def get_top_timesteps(values: np.ndarray, number_of_timesteps: int) -> np.ndarray:
+    # Indices of the largest values in descending order, by a partial sort
+    number_of_timesteps = min(number_of_timesteps, len(values))
+    top = np.argpartition(values, -number_of_timesteps)[-number_of_timesteps:]
+    return top[np.argsort(values[top])[::-1]]
+
+
+def get_peak_metrics(
+    rates: np.ndarray, coincident_timestep: Optional[int] = None
+) -> List[Dict]:
+    # Peak, time step of the peak, load factor (mean / peak) and, optionally, the value
+    # at a coincident time step of each row of a (series, time steps) array
+    peak_timesteps = rates.argmax(axis=1)
+    peaks = rates[np.arange(len(rates)), peak_timesteps]
+    means = rates.mean(axis=1)
+    load_factors = np.divide(means, peaks, out=np.zeros_like(means), where=peaks > 0)
+    metrics = []
+    for index in range(len(rates)):
+        row_metrics = {
+            "peak": float(peaks[index]),
+            "peak_timestep": int(peak_timesteps[index]),
+            "load_factor": float(load_factors[index]),
+        }
+        if coincident_timestep is not None:
+            row_metrics["coincident"] = float(rates[index, coincident_timestep])
+        metrics.append(row_metrics)
+    return metrics
+
+
+def get_home_demand_analytics(
+    home_output: Dict,
+    number_of_timesteps: int,
+    number_of_peak_timesteps: int = 10,
+) -> Dict:
+    # Electric demand (kW) of the home, each end use and each system, with end use and
+    # system demand coincident with the home's peak, and the top time steps of the home
+    # with each end use's contribution. Thermal loads (kBtu/h) of systems with loads.
+    timestep_hours = HERSDiagnosticData.NUMBER_OF_TIMESTEPS / number_of_timesteps
+    home = aggregate_home_output(home_output, True, number_of_timesteps)
+    end_uses = list(home.end_use_hourly_electricity_use)
+    end_use_demand = (
+        np.array([home.end_use_hourly_electricity_use[end_use] for end_use in end_uses])
+        * KBTU_TO_KWH
+        / timestep_hours
+    )
+    home_demand = end_use_demand.sum(axis=0)
+    home_metrics = get_peak_metrics(home_demand[np.newaxis, :])[0]
+    peak_timestep = home_metrics["peak_timestep"]
+    top_timesteps = get_top_timesteps(home_demand, number_of_peak_timesteps)
+    home_metrics["top_timesteps"] = [
+        {
+            "timestep": int(timestep),
+            "demand": float(home_demand[timestep]),
+            "end_uses": dict(
+                zip(
+                    [end_use.value for end_use in end_uses],
+                    end_use_demand[:, timestep].tolist(),
+                )
+            ),
+        }
+        for timestep in top_timesteps
+    ]
+
+    system_analytics: List[Dict] = []
+    for end_use in HERSDiagnosticData.system_end_uses:
+        systems = home.systems[end_use]
+        system_outputs = home_output[f"{end_use.value}_system_output"]
+        first_index = len(system_analytics)
+        system_demand = (
+            np.array([system.hourly_electricity_use for system in systems])
+            * KBTU_TO_KWH
+            / timestep_hours
+        )
+        for system_index, metrics in enumerate(
+            get_peak_metrics(system_demand, peak_timestep)
+        ):
+            system_analytics.append(
+                {
+                    "end_use": end_use.value,
+                    "system_index": system_index,
+                    "electricity": metrics,
+                }
+            )
+        loaded = [
+            system_index
+            for system_index, system_output in enumerate(system_outputs)
+            if "load" in system_output
+        ]
+        if loaded:
+            loads = (
+                np.array(
+                    [system_outputs[system_index]["load"] for system_index in loaded],
+                    dtype=float,
+                )
+                / timestep_hours
+            )
+            for system_index, metrics in zip(loaded, get_peak_metrics(loads)):
+                system_analytics[first_index + system_index]["load"] = metrics
+
+    return {
+        "electricity": home_metrics,
+        "end_uses": dict(
+            zip(
+                [end_use.value for end_use in end_uses],
+                get_peak_metrics(end_use_demand, peak_timestep),
+            )
+        ),
+        "systems": system_analytics,
+    }
+
+
+def get_demand_analytics(
+    data: Dict,
+    home_types: Optional[List[HomeType]] = None,
+    number_of_peak_timesteps: int = 10,
+) -> Dict[str, Dict]:
+    # Demand analytics of each home type (all by default). Time steps are indices into
+    # the document's time series; demand is in kW and loads in kBtu/h.
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    return {
+        home_type.value: get_home_demand_analytics(
+            data[f"{home_type.value}_output"],
+            number_of_timesteps,
+            number_of_peak_timesteps,
+        )
+        for home_type in (home_types or list(HomeType))
+    }
+
+
+def analyze_file(path, **options) -> Dict:
+    # Analyze a single file, recording errors instead of raising so one bad file does
+    # not abort a batch
+    result: Dict = {"path": str(path), "status": "pass", "message": ""}
+    try:
+        result["analytics"] = get_demand_analytics(load(path), **options)
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def analyze_files(
+    paths: List,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    **options,
+) -> List[Dict]:
+    return map_files(
+        functools.partial(analyze_file, **options), paths, max_workers, use_threads
+    )
@@ -0,0 +1,282 @@
+"""Physical consistency checks of the time series of each home type."""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .analytics import get_top_timesteps
+from .enumerations import HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+
+DEFAULT_LIMITS = {
+    # ANSI/RESNET/ICC 301 thermostat setpoints (F) and the allowed drift beyond them
+    "heating_setpoint": 68.0,
+    "cooling_setpoint": 78.0,
+    "temperature_tolerance": 2.0,
+    # Allowed ratio between the implied EEC (energy / load, as the EEC is energy use per
+    # unit of load) and the system's EEC
+    "timestep_efficiency_ratio": 4.0,
+    "annual_efficiency_ratio": 2.0,
+    # Energy without load is expected up to this fraction of the system's peak energy
+    "standby_fraction": 0.05,
+    # Smaller loads and energy uses (kBtu) are treated as zero
+    "minimum_value": 1e-6,
+}
+
+
+def get_anomaly(
+    check: str,
+    severity: float,
+    affected: np.ndarray,
+    magnitude: np.ndarray,
+    number_of_reported_timesteps: int,
+    message: str,
+) -> Dict:
+    # `affected` flags the anomalous time steps; the reported ones are those with the
+    # largest `magnitude`
+    timesteps = np.flatnonzero(affected)
+    top = get_top_timesteps(magnitude[timesteps], number_of_reported_timesteps)
+    return {
+        "check": check,
+        "severity": float(severity),
+        "count": len(timesteps),
+        "timesteps": timesteps[top].tolist(),
+        "message": message,
+    }
+
+
+class SeriesAnomaly(Exception):
+    def __init__(self, anomaly: Dict):
+        super().__init__(anomaly["message"])
+        self.anomaly = anomaly
+
+
+def check_series(
+    name: str,
+    values: List[float],
+    number_of_timesteps: int,
+    number_of_reported_timesteps: int,
+    non_negative: bool = True,
+) -> np.ndarray:
+    # Returns the series as an array, or raises the anomaly if it cannot be checked
+    series = np.asarray(values, dtype=float)
+    if series.shape != (number_of_timesteps,):
+        raise SeriesAnomaly(
+            {
+                "check": "series_length",
+                "severity": 1.0,
+                "count": number_of_timesteps,
+                "timesteps": [],
+                "message": f"{name} has {series.size} values, expected "
+                f"{number_of_timesteps}.",
+            }
+        )
+    invalid = ~np.isfinite(series)
+    if non_negative:
+        invalid |= series < 0.0
+    if invalid.any():
+        raise SeriesAnomaly(
+            get_anomaly(
+                "invalid_values",
+                invalid.mean(),
+                invalid,
+                np.where(np.isfinite(series), np.abs(series), np.inf),
+                number_of_reported_timesteps,
+                f"{name} has {invalid.sum()} non-finite"
+                f"{' or negative' if non_negative else ''} value(s).",
+            )
+        )
+    return series
+
+
+def check_system_output(
+    system_output: Dict,
+    number_of_timesteps: int,
+    limits: Dict,
+    number_of_reported_timesteps: int,
+) -> List[Dict]:
+    try:
+        energy = np.zeros(number_of_timesteps)
+        for energy_output in system_output["energy_use"]:
+            energy += check_series(
+                f"{energy_output['fuel_type']} energy use",
+                energy_output["energy"],
+                number_of_timesteps,
+                number_of_reported_timesteps,
+            )
+        if "load" not in system_output:
+            return []
+        load = check_series(
+            "Load",
+            system_output["load"],
+            number_of_timesteps,
+            number_of_reported_timesteps,
+        )
+    except SeriesAnomaly as anomaly:
+        return [anomaly.anomaly]
+
+    anomalies = []
+    minimum_value = limits["minimum_value"]
+    total_energy = energy.sum()
+    total_load = load.sum()
+    has_load = load > minimum_value
+    has_energy = energy > minimum_value
+
+    energy_without_load = ~has_load & (
+        energy > max(minimum_value, limits["standby_fraction"] * energy.max())
+    )
+    if energy_without_load.any():
+        anomalies.append(
+            get_anomaly(
+                "energy_without_load",
+                energy[energy_without_load].sum() / total_energy,
+                energy_without_load,
+                energy,
+                number_of_reported_timesteps,
+                f"Energy use above standby in {energy_without_load.sum()} time step(s) "
+                "without load.",
+            )
+        )
+
+    load_without_energy = has_load & ~has_energy
+    if load_without_energy.any():
+        anomalies.append(
+            get_anomaly(
+                "load_without_energy",
+                load[load_without_energy].sum() / total_load,
+                load_without_energy,
+                load,
+                number_of_reported_timesteps,
+                f"Load met without energy use in {load_without_energy.sum()} time "
+                "step(s).",
+            )
+        )
+
+    eec = system_output["equipment_efficiency_coefficient"]
+    if eec <= 0.0:
+        return anomalies
+
+    both = has_load & has_energy
+    ratio = np.divide(energy, load * eec, out=np.ones_like(load), where=both)
+    deviation = np.abs(np.log(ratio))
+    limit = limits["timestep_efficiency_ratio"]
+    out_of_range = deviation > np.log(limit)
+    if out_of_range.any():
+        anomalies.append(
+            get_anomaly(
+                "timestep_efficiency",
+                energy[out_of_range].sum() / total_energy,
+                out_of_range,
+                deviation,
+                number_of_reported_timesteps,
+                f"Implied EEC (energy / load) differs from the EEC ({eec}) by more than a "
+                f"factor of {limit} in {out_of_range.sum()} time step(s) (up to "
+                f"{np.exp(deviation.max()):.3g}).",
+            )
+        )
+
+    if total_load > minimum_value and total_energy > minimum_value:
+        annual_ratio = total_energy / (total_load * eec)
+        limit = limits["annual_efficiency_ratio"]
+        if abs(np.log(annual_ratio)) > np.log(limit):
+            anomalies.append(
+                {
+                    "check": "annual_efficiency",
+                    "severity": float(1.0 - min(annual_ratio, 1.0 / annual_ratio)),
+                    "count": number_of_timesteps,
+                    "timesteps": [],
+                    "message": f"Annual implied EEC (energy / load) "
+                    f"({total_energy / total_load:.3g}) differs from the EEC ({eec}) "
+                    f"by more than a factor of {limit}.",
+                }
+            )
+    return anomalies
+
+
+def check_home_output(
+    home_output: Dict,
+    number_of_timesteps: int,
+    limits: Dict,
+    number_of_reported_timesteps: int,
+) -> List[Dict]:
+    anomalies = []
+    try:
+        temperature = check_series(
+            "Conditioned space temperature",
+            home_output["conditioned_space_temperature"],
+            number_of_timesteps,
+            number_of_reported_timesteps,
+            non_negative=False,
+        )
+        lower = limits["heating_setpoint"] - limits["temperature_tolerance"]
+        upper = limits["cooling_setpoint"] + limits["temperature_tolerance"]
+        drift = np.maximum(lower - temperature, temperature - upper)
+        outside = drift > 0.0
+        if outside.any():
+            anomalies.append(
+                get_anomaly(
+                    "temperature_drift",
+                    outside.mean(),
+                    outside,
+                    drift,
+                    number_of_reported_timesteps,
+                    f"Conditioned space temperature outside {lower}-{upper} F in "
+                    f"{outside.sum()} time step(s) (up to {drift.max():.3g} F).",
+                )
+            )
+    except SeriesAnomaly as anomaly:
+        anomalies.append(anomaly.anomaly)
+    for anomaly in anomalies:
+        anomaly["end_use"] = None
+        anomaly["system_index"] = None
+
+    for end_use in HERSDiagnosticData.system_end_uses:
+        for system_index, system_output in enumerate(
+            home_output[f"{end_use.value}_system_output"]
+        ):
+            for anomaly in check_system_output(
+                system_output, number_of_timesteps, limits, number_of_reported_timesteps
+            ):
+                anomaly["end_use"] = end_use.value
+                anomaly["system_index"] = system_index
+                anomalies.append(anomaly)
+
+    for end_use in HERSDiagnosticData.other_end_uses:
+        for energy_output in home_output.get(f"{end_use.value}_energy", []):
+            try:
+                check_series(
+                    f"{end_use.value} {energy_output['fuel_type']} energy use",
+                    energy_output["energy"],
+                    number_of_timesteps,
+                    number_of_reported_timesteps,
+                )
+            except SeriesAnomaly as anomaly:
+                anomaly.anomaly["end_use"] = end_use.value
+                anomaly.anomaly["system_index"] = None
+                anomalies.append(anomaly.anomaly)
+    return anomalies
+
+
+def detect_anomalies(
+    data: Dict,
+    home_types: Optional[List[HomeType]] = None,
+    limits: Optional[Dict] = None,
+    minimum_severity: float = 0.0,
+    number_of_reported_timesteps: int = 5,
+) -> List[Dict]:
+    # Anomalies of each home type (all by default), most severe first. Severity is the
+    # fraction of the series' energy (or load, or time steps) affected, between 0 and 1.
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    anomalies = []
+    for home_type in home_types or list(HomeType):
+        for anomaly in check_home_output(
+            data[f"{home_type.value}_output"],
+            number_of_timesteps,
+            limits,
+            number_of_reported_timesteps,
+        ):
+            if anomaly["severity"] >= minimum_severity:
+                anomaly["home_type"] = home_type.value
+                anomalies.append(anomaly)
+    return sorted(anomalies, key=lambda anomaly: anomaly["severity"], reverse=True)
@@ -0,0 +1,94 @@
+"""Batch verification of the files in zip and tar bundles, read without extraction."""
+
+import functools
+import tarfile
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .batch import check_audit_precision, map_items, verify_file
+from .loaders import is_supported
+
+
+def get_members(archive_path) -> Iterator[Tuple[str, bytes]]:
+    # Path and bytes of each supported file in the archive, in archive order. Tar files
+    # (compressed or not) are read as a stream, one member at a time.
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_supported(info.filename):
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and is_supported(member.name):
+                    yield member.name, archive.extractfile(member).read()  # type: ignore
+    else:
+        raise RuntimeError(f"'{archive_path}' is not a zip or tar file.")
+
+
+def verify_member(
+    member: Tuple[str, bytes],
+    archive_path: str,
+    audit_fraction: Optional[float] = None,
+    check_anomalies: bool = False,
+    single_precision: bool = False,
+) -> Dict:
+    member_path, content = member
+    result = verify_file(
+        member_path, audit_fraction, check_anomalies, content, single_precision
+    )
+    result["archive"] = archive_path
+    return result
+
+
+def verify_archive(
+    archive_path,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    audit_fraction: Optional[float] = None,
+    check_anomalies: bool = False,
+    max_pending: Optional[int] = None,
+    single_precision: bool = False,
+) -> List[Dict]:
+    # Members are read by this process and their bytes sent to the workers, so nothing
+    # is extracted to disk. Each result's "path" is the member's path in the archive.
+    check_audit_precision(audit_fraction, single_precision)
+    return list(
+        map_items(
+            functools.partial(
+                verify_member,
+                archive_path=str(archive_path),
+                audit_fraction=audit_fraction,
+                check_anomalies=check_anomalies,
+                single_precision=single_precision,
+            ),
+            get_members(archive_path),
+            max_workers,
+            use_threads,
+            max_pending,
+        )
+    )
+
+
+def verify_archives(
+    archive_paths: List,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    audit_fraction: Optional[float] = None,
+    check_anomalies: bool = False,
+    single_precision: bool = False,
+) -> List[Dict]:
+    check_audit_precision(audit_fraction, single_precision)
+    results: List[Dict] = []
+    for archive_path in archive_paths:
+        results.extend(
+            verify_archive(
+                archive_path,
+                max_workers,
+                use_threads,
+                audit_fraction,
+                check_anomalies,
+                single_precision=single_precision,
+            )
+        )
+    return results
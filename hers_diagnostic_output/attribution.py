@@ -0,0 +1,217 @@
+"""Attribution of the HERS Index and CO2 Index to systems, end uses and fuel types."""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .aggregates import (
+    HomeAggregates,
+    aggregate_home_outputs,
+    calculate_intermediaries,
+    get_hourly_emission_factors,
+    get_normalized_modified_load,
+    get_series_co2_emissions,
+)
+from .enumerations import EndUse, FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+
+
+def add_contribution(contributions: Dict[str, float], name: str, value: float):
+    contributions[name] = contributions.get(name, 0.0) + value
+
+
+def get_co2_emissions(
+    energy: Dict[FuelType, float],
+    hourly_electricity_use: Optional[np.ndarray],
+    hourly_emission_factors_kbtu: np.ndarray,
+    average_electricity_emission_factor: float,
+) -> Dict[FuelType, float]:
+    # CO2 emissions (lb) by fuel type of one system or end use. Without hourly
+    # electricity use (e.g., aggregates loaded from the document), electricity is
+    # weighted by the home's average emission factor, so the parts still add up.
+    emissions = {}
+    for fuel_type, fuel_energy in energy.items():
+        if fuel_type == FuelType.ELECTRICITY:
+            if hourly_electricity_use is not None:
+                emissions[fuel_type] = get_series_co2_emissions(
+                    hourly_electricity_use, hourly_emission_factors_kbtu
+                )
+            else:
+                emissions[fuel_type] = fuel_energy * average_electricity_emission_factor
+        elif fuel_type in HERSDiagnosticData.fuel_emission_factors:
+            emissions[fuel_type] = (
+                fuel_energy * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+            )
+    return emissions
+
+
+def get_average_electricity_emission_factor(
+    home: HomeAggregates, hourly_emission_factors_kbtu: np.ndarray
+) -> float:
+    # lb/kBtu, weighted by the home's hourly electricity use
+    electricity_use = home.get_fuel_type_energy(FuelType.ELECTRICITY)
+    if home.hourly_electricity_use is None or electricity_use == 0.0:
+        return float(np.mean(hourly_emission_factors_kbtu))
+    return (
+        get_series_co2_emissions(
+            home.hourly_electricity_use, hourly_emission_factors_kbtu
+        )
+        / electricity_use
+    )
+
+
+def get_hers_index_attribution(
+    intermediaries: Dict[str, float],
+    rated_home: HomeAggregates,
+    reference_home: HomeAggregates,
+) -> Dict:
+    # HERS Index = PEfrac * TnML / (TRL * IAF_RH) * 100. Each TnML term (nMEUL of a
+    # system, EC of an other end use by fuel) contributes term / (TRL * IAF_RH) * 100;
+    # on-site power production and battery storage contribute the (PEfrac - 1) part.
+    # nMEUL is attributed to the system's primary fuel type.
+    scale = 100 / (intermediaries["trl"] * intermediaries["iaf_rh"])
+    systems: List[Dict] = []
+    end_uses: Dict[str, float] = {}
+    fuel_types: Dict[str, float] = {}
+    for end_use in HERSDiagnosticData.system_end_uses:
+        end_uses[end_use.value] = 0.0
+        reference_systems = reference_home.systems[end_use]
+        for system_index, rated_system in enumerate(rated_home.systems[end_use]):
+            reference_system = reference_systems[system_index]
+            nmeul = get_normalized_modified_load(
+                rated_system, reference_system, end_use
+            )
+            reul = reference_system.load
+            contribution = nmeul * scale
+            systems.append(
+                {
+                    "end_use": end_use.value,
+                    "system_index": system_index,
+                    "primary_fuel_type": rated_system.primary_fuel_type.value,
+                    "equipment_efficiency_coefficient": rated_system.equipment_efficiency_coefficient,
+                    "nmeul": nmeul,
+                    "reul": reul,
+                    "nmeul_to_reul": nmeul / reul if reul != 0.0 else None,
+                    "contribution": contribution,
+                }
+            )
+            end_uses[end_use.value] += contribution
+            add_contribution(
+                fuel_types, rated_system.primary_fuel_type.value, contribution
+            )
+    for end_use in HERSDiagnosticData.other_end_uses:
+        end_uses[end_use.value] = 0.0
+        for fuel_type in HERSDiagnosticData.fuel_types:
+            energy = rated_home.energy[end_use].get(fuel_type, 0.0)
+            if energy != 0.0:
+                end_uses[end_use.value] += energy * scale
+                add_contribution(fuel_types, fuel_type.value, energy * scale)
+    hers_index_without_opp = intermediaries["tnml"] * scale
+    return {
+        "value": intermediaries["hers_index"],
+        "systems": systems,
+        "end_uses": end_uses,
+        "fuel_types": fuel_types,
+        "on_site_power_production": -hers_index_without_opp
+        * intermediaries["opp"]
+        / intermediaries["teu"],
+        "battery_storage": hers_index_without_opp
+        * intermediaries["bsl"]
+        / intermediaries["teu"],
+    }
+
+
+def get_co2_index_attribution(
+    data: Dict,
+    intermediaries: Dict[str, float],
+    rated_home: HomeAggregates,
+) -> Dict:
+    # CO2 Index = ACO2 / (ARCO2 * IAF_RH) * 100. Each system's and end use's emissions
+    # contribute emissions / (ARCO2 * IAF_RH) * 100; on-site power production and
+    # battery storage contribute their hourly emissions.
+    scale = 100 / (intermediaries["arco2"] * intermediaries["iaf_rh"])
+    hourly_emission_factors_kwh, hourly_emission_factors_kbtu = (
+        get_hourly_emission_factors(data)
+    )
+    average_electricity_emission_factor = get_average_electricity_emission_factor(
+        rated_home, hourly_emission_factors_kbtu
+    )
+    systems: List[Dict] = []
+    end_uses: Dict[str, float] = {}
+    fuel_types: Dict[str, float] = {}
+
+    def add_emissions(emissions: Dict[FuelType, float], end_use: EndUse) -> float:
+        contribution = 0.0
+        for fuel_type, fuel_emissions in emissions.items():
+            add_contribution(fuel_types, fuel_type.value, fuel_emissions * scale)
+            contribution += fuel_emissions * scale
+        end_uses[end_use.value] += contribution
+        return contribution
+
+    for end_use in HERSDiagnosticData.system_end_uses:
+        end_uses[end_use.value] = 0.0
+        for system_index, system in enumerate(rated_home.systems[end_use]):
+            emissions = get_co2_emissions(
+                system.energy,
+                system.hourly_electricity_use,
+                hourly_emission_factors_kbtu,
+                average_electricity_emission_factor,
+            )
+            systems.append(
+                {
+                    "end_use": end_use.value,
+                    "system_index": system_index,
+                    "primary_fuel_type": system.primary_fuel_type.value,
+                    "emissions": {
+                        fuel_type.value: fuel_emissions
+                        for fuel_type, fuel_emissions in emissions.items()
+                    },
+                    "contribution": add_emissions(emissions, end_use),
+                }
+            )
+    for end_use in HERSDiagnosticData.other_end_uses:
+        end_uses[end_use.value] = 0.0
+        add_emissions(
+            get_co2_emissions(
+                rated_home.energy[end_use],
+                rated_home.end_use_hourly_electricity_use.get(end_use),
+                hourly_emission_factors_kbtu,
+                average_electricity_emission_factor,
+            ),
+            end_use,
+        )
+    series_contributions = {}
+    for name, sign in [("on_site_power_production", -1.0), ("battery_storage", 1.0)]:
+        series_contributions[name] = (
+            sign
+            * get_series_co2_emissions(data[name], hourly_emission_factors_kwh)
+            * scale
+            if name in data
+            else 0.0
+        )
+    return {
+        "value": intermediaries["co2_index"],
+        "systems": systems,
+        "end_uses": end_uses,
+        "fuel_types": fuel_types,
+        **series_contributions,
+    }
+
+
+def get_index_attribution(
+    data: Dict, aggregates: Optional[Dict[HomeType, HomeAggregates]] = None
+) -> Dict:
+    # Contributions of each Rated Home system, end use and fuel type (and of on-site
+    # power production and battery storage) to the HERS Index and CO2 Index, in index
+    # points. Computed from the same aggregates as the indices, so the contributions of
+    # each breakdown add up to the index.
+    if aggregates is None:
+        aggregates = aggregate_home_outputs(data)
+    intermediaries = calculate_intermediaries(data, aggregates)
+    rated_home = aggregates[HomeType.RATED_HOME]
+    return {
+        "hers_index": get_hers_index_attribution(
+            intermediaries, rated_home, aggregates[HomeType.HERS_REFERENCE_HOME]
+        ),
+        "co2_index": get_co2_index_attribution(data, intermediaries, rated_home),
+    }
@@ -0,0 +1,344 @@
+"""Batch verification of HERS diagnostic output files."""
+
+import bisect
+import collections
+import functools
+import hashlib
+import io
+import json
+import math
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import get_decoded_size, is_supported, load_stream
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_file_hash(path) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def find_files(directory) -> List[Path]:
+    return sorted(
+        path
+        for path in Path(directory).rglob("*")
+        if path.is_file() and is_supported(path)
+    )
+
+
+def check_audit_precision(audit_fraction: Optional[float], single_precision: bool):
+    # Refused before any file is read rather than recorded as an error for every file
+    if audit_fraction and single_precision:
+        raise RuntimeError(
+            "Annual aggregates cannot be audited (audit_fraction) against time series stored in single precision (single_precision)."
+        )
+
+
+def verify_file(
+    path,
+    audit_fraction: Optional[float] = None,
+    check_anomalies: bool = False,
+    content: Optional[bytes] = None,
+    single_precision: bool = False,
+) -> Dict:
+    # Verify a single file, recording failures instead of raising so one bad file
+    # does not abort a batch. With an `audit_fraction`, embedded annual aggregates are
+    # used when present (see HERSDiagnosticData.verify_fast). With `check_anomalies`,
+    # the time series are also checked for physical consistency. With `content`, the
+    # file's bytes are given (e.g., read from an archive) and `path` only names it.
+    # With `single_precision`, time series are stored as float32 (see precision.py), so
+    # no file can be audited.
+    check_audit_precision(audit_fraction, single_precision)
+    result: Dict = {
+        "path": str(path),
+        "status": "pass",
+        "message": "",
+        "hers_index": None,
+        "co2_index": None,
+    }
+    try:
+        if content is None:
+            hers_data = HERSDiagnosticData(path, single_precision=single_precision)
+        else:
+            hers_data = HERSDiagnosticData(
+                data=load_stream(
+                    io.BytesIO(content), str(path), single_precision=single_precision
+                ),
+                single_precision=single_precision,
+            )
+        result["software_name"] = hers_data.software
+        result["weather_data_state"] = hers_data.data.get("weather_data_state")
+        if audit_fraction is None:
+            result["hers_index"] = hers_data.hers_index
+            result["co2_index"] = hers_data.co2_index
+            hers_data.verify()
+        else:
+            hers_data.verify_fast(audit_fraction)
+            result["hers_index"] = hers_data.hers_index
+            result["co2_index"] = hers_data.co2_index
+        # all intermediaries are already calculated, e.g., for portfolio statistics
+        result["intermediaries"] = hers_data.get_hers_index_intermediaries()
+        if check_anomalies:
+            from .anomalies import detect_anomalies
+
+            result["anomalies"] = detect_anomalies(hers_data.data)
+    except RuntimeError as error:
+        result["status"] = "fail"
+        result["message"] = str(error).strip()
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def map_files(
+    function: Callable,
+    items: List,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+) -> List:
+    # Threads avoid pickling and process start-up and run in parallel on free-threaded
+    # Python builds. `function` must be picklable (module-level) for processes.
+    if max_workers == 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    executor_type = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_type(max_workers=max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def map_items(
+    function: Callable,
+    items: Iterable,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    max_pending: Optional[int] = None,
+) -> Iterator:
+    # As map_files, for items produced while earlier ones are processed (e.g., read
+    # from an archive). At most `max_pending` items (default twice the number of
+    # workers) are submitted and not yet finished, so reading the items never runs far
+    # ahead of the workers. Results are yielded in the order of the items.
+    if max_workers == 1:
+        yield from map(function, items)
+        return
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    executor_type = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_type(max_workers=max_workers) as executor:
+        pending: Deque[Future] = collections.deque()
+        for item in items:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, item))
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_next_file(
+    pending: List[Tuple[int, int]], budget: Optional[int]
+) -> Tuple[int, int]:
+    # Largest pending (cost, index) within the budget, or the largest if none fits.
+    # `pending` is sorted by increasing cost.
+    position = len(pending)
+    if budget is not None:
+        position = bisect.bisect_right(pending, (budget, math.inf)) or position
+    return pending.pop(position - 1)
+
+
+def map_files_by_size(
+    function: Callable,
+    paths: List,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    memory_budget: Optional[int] = None,
+) -> List:
+    # As map_files, with the files started largest first (by decoded size, see
+    # loaders.get_decoded_size), so no worker is left with a large file at the end of
+    # the run. Each worker takes the next file as soon as it is free, and the decoded
+    # size of the files in flight is kept within `memory_budget` bytes: a worker takes
+    # the largest file that fits, and a file larger than the budget runs alone.
+    if max_workers == 1 or len(paths) <= 1:
+        return [function(path) for path in paths]
+    max_workers = max_workers or os.cpu_count() or 1
+    costs = []
+    for path in paths:
+        try:
+            costs.append(get_decoded_size(path))
+        except OSError:  # reported by `function`
+            costs.append(0)
+    pending = sorted((cost, index) for index, cost in enumerate(costs))
+    results: List = [None] * len(paths)
+    running: Dict[Future, int] = {}
+    bytes_in_flight = 0
+    executor_type = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_type(max_workers=max_workers) as executor:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                budget = None
+                if memory_budget is not None:
+                    budget = memory_budget - bytes_in_flight
+                    if running and pending[0][0] > budget:
+                        break  # wait for running files to finish
+                cost, index = get_next_file(pending, budget)
+                running[executor.submit(function, paths[index])] = index
+                bytes_in_flight += cost
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = running.pop(future)
+                results[index] = future.result()
+                bytes_in_flight -= costs[index]
+    return results
+
+
+def verify_files(
+    paths: List,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    audit_fraction: Optional[float] = None,
+    check_anomalies: bool = False,
+    memory_budget: Optional[int] = None,
+    single_precision: bool = False,
+) -> List[Dict]:
+    # Each file is evaluated by its own HERSDiagnosticData instance, scheduled by size
+    # (see map_files_by_size)
+    check_audit_precision(audit_fraction, single_precision)
+    return map_files_by_size(
+        functools.partial(
+            verify_file,
+            audit_fraction=audit_fraction,
+            check_anomalies=check_anomalies,
+            single_precision=single_precision,
+        ),
+        paths,
+        max_workers,
+        use_threads,
+        memory_budget,
+    )
+
+
+def load_json(path) -> Dict:
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as input_file:
+        return json.load(input_file)
+
+
+def dump_json(content: Dict, path):
+    # Write to a temporary file first so an interrupted run never leaves a truncated file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as output_file:
+        json.dump(content, output_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def get_changed_files(
+    directory, manifest: Dict[str, Dict]
+) -> Tuple[Dict[str, Dict], Dict[str, Dict], List[str]]:
+    # Compare the directory against the manifest. Files whose size and mtime are
+    # unchanged are not read; content is only hashed when either differs.
+    changed: Dict[str, Dict] = {}
+    unchanged: Dict[str, Dict] = {}
+    found = set()
+    for path in find_files(directory):
+        key = path.relative_to(directory).as_posix()
+        found.add(key)
+        stat = path.stat()
+        entry = manifest.get(key)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            unchanged[key] = entry
+            continue
+        signature = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": get_file_hash(path),
+        }
+        if entry is not None and entry["sha256"] == signature["sha256"]:
+            unchanged[key] = signature  # touched, but content is identical
+        else:
+            changed[key] = signature
+    removed = sorted(key for key in manifest if key not in found)
+    return changed, unchanged, removed
+
+
+def verify_directory(
+    directory,
+    manifest_path,
+    report_path,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+) -> Dict:
+    # Verify only new or modified files and merge the results into the previous report
+    directory = Path(directory)
+    manifest = load_json(manifest_path)
+    report = load_json(report_path)
+    results: Dict[str, Dict] = report.get("files", {})
+
+    changed, unchanged, removed = get_changed_files(directory, manifest)
+
+    keys = sorted(changed)
+    for key, result in zip(
+        keys, verify_files([directory / key for key in keys], max_workers, use_threads)
+    ):
+        result["path"] = key
+        result["sha256"] = changed[key]["sha256"]
+        results[key] = result
+
+    for key in removed:
+        results.pop(key, None)
+
+    summary = {
+        "verified": len(keys),
+        "unchanged": len(unchanged),
+        "removed": len(removed),
+        "total": len(changed) + len(unchanged),
+        "failed": sum(1 for result in results.values() if result["status"] != "pass"),
+    }
+    report = {"summary": summary, "files": results}
+    dump_json(report, report_path)
+    # The manifest is written last so an interrupted run re-verifies the delta
+    dump_json({**unchanged, **changed}, manifest_path)
+    return report
+
+
+def watch_directory(
+    directory,
+    manifest_path,
+    report_path,
+    interval: float = 60.0,
+    max_workers: Optional[int] = None,
+    iterations: Optional[int] = None,
+    use_threads: bool = False,
+):
+    # Re-run incremental verification every `interval` seconds (forever if `iterations` is None)
+    iteration = 0
+    while iterations is None or iteration < iterations:
+        start = time.monotonic()
+        summary = verify_directory(
+            directory, manifest_path, report_path, max_workers, use_threads
+        )["summary"]
+        if summary["verified"] or summary["removed"]:
+            print(
+                f"Verified {summary['verified']} new or modified file(s), "
+                f"removed {summary['removed']}, {summary['failed']} failing in total."
+            )
+        iteration += 1
+        if iterations is None or iteration < iterations:
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
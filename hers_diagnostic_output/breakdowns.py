@@ -0,0 +1,272 @@
+"""Monthly and time-of-use breakdowns of each home type's energy, loads and emissions."""
+
+import calendar
+import functools
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .aggregates import get_hourly_emission_factors
+from .batch import map_files
+from .enumerations import FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import load
+
+MONTH_NAMES = list(calendar.month_name[1:])
+DAYS_PER_MONTH = calendar.mdays[1:]  # non-leap year
+HOURS_PER_DAY = 24
+ON_PEAK = "on_peak"
+OFF_PEAK = "off_peak"
+
+
+class SeriesBlock:
+    # Time series of one home type as the rows of a single (series, time steps) array,
+    # with what each row is, so all rows are reduced to periods in one operation
+    def __init__(self, number_of_timesteps: int):
+        self.number_of_timesteps = number_of_timesteps
+        self.rows: List[Tuple[str, str, str]] = []  # (quantity, end use, fuel type)
+        self.series: List = []
+
+    def add(self, quantity: str, end_use: str, fuel_type: str, values):
+        self.rows.append((quantity, end_use, fuel_type))
+        self.series.append(values)
+
+    def get_values(self) -> np.ndarray:
+        values = np.empty((len(self.series), self.number_of_timesteps))
+        for row, series in enumerate(self.series):
+            values[row] = series
+        return values
+
+
+def get_series_block(
+    data: Dict,
+    home_type: HomeType,
+    number_of_timesteps: int,
+    hourly_emission_factors: Tuple[np.ndarray, np.ndarray],
+) -> SeriesBlock:
+    # Energy (kBtu) of each energy use entry, loads (kBtu) of each system that reports
+    # them and electricity emissions (lb) at each time step. Hourly emission factors are
+    # repeated for sub-hourly time steps.
+    block = SeriesBlock(number_of_timesteps)
+    home_output = data[f"{home_type.value}_output"]
+    energy_outputs: List[Tuple[str, Dict]] = []
+    for end_use in HERSDiagnosticData.system_end_uses:
+        for system_output in home_output[f"{end_use.value}_system_output"]:
+            if "load" in system_output:
+                block.add("load", end_use.value, "", system_output["load"])
+            energy_outputs += [
+                (end_use.value, energy_output)
+                for energy_output in system_output["energy_use"]
+            ]
+    for end_use in HERSDiagnosticData.other_end_uses:
+        energy_outputs += [
+            (end_use.value, energy_output)
+            for energy_output in home_output.get(f"{end_use.value}_energy", [])
+        ]
+    electricity_use = np.zeros(number_of_timesteps)
+    for end_use_name, energy_output in energy_outputs:
+        block.add(
+            "energy", end_use_name, energy_output["fuel_type"], energy_output["energy"]
+        )
+        if energy_output["fuel_type"] == FuelType.ELECTRICITY.value:
+            electricity_use += energy_output["energy"]
+
+    factors_kwh, factors_kbtu = [
+        np.repeat(
+            factors,
+            HERSDiagnosticData.get_block_size(number_of_timesteps, len(factors)),
+        )
+        for factors in hourly_emission_factors
+    ]
+    block.add(
+        "co2_emissions", "", FuelType.ELECTRICITY.value, electricity_use * factors_kbtu
+    )
+    if home_type == HomeType.RATED_HOME:
+        # net of on-site power production and battery storage (kWh), as in the CO2 Index
+        if "on_site_power_production" in data:
+            block.add(
+                "co2_emissions",
+                "",
+                FuelType.ELECTRICITY.value,
+                -np.asarray(data["on_site_power_production"], dtype=float)
+                * factors_kwh,
+            )
+        if "battery_storage" in data:
+            block.add(
+                "co2_emissions",
+                "",
+                FuelType.ELECTRICITY.value,
+                np.asarray(data["battery_storage"], dtype=float) * factors_kwh,
+            )
+    return block
+
+
+def get_home_breakdown(
+    block: SeriesBlock, reduced: np.ndarray, period_names: List[str]
+) -> Dict:
+    # Group the reduced rows (one column per period) by end use and fuel type. Fossil
+    # fuel emissions follow from the fossil fuel energy of each period.
+    number_of_periods = len(period_names)
+    energy: Dict[str, Dict[str, np.ndarray]] = {}
+    loads: Dict[str, np.ndarray] = {}
+    fuel_energy: Dict[str, np.ndarray] = {}
+    electricity_emissions = np.zeros(number_of_periods)
+    for (quantity, end_use, fuel_type), values in zip(block.rows, reduced):
+        if quantity == "energy":
+            end_use_energy = energy.setdefault(end_use, {})
+            end_use_energy[fuel_type] = end_use_energy.get(fuel_type, 0.0) + values
+            fuel_energy[fuel_type] = fuel_energy.get(fuel_type, 0.0) + values
+        elif quantity == "load":
+            loads[end_use] = loads.get(end_use, 0.0) + values
+        else:
+            electricity_emissions += values
+    fossil_fuel_emissions = np.zeros(number_of_periods)
+    for fuel_type in HERSDiagnosticData.fossil_fuel_types:
+        if fuel_type.value in fuel_energy:
+            fossil_fuel_emissions += (
+                fuel_energy[fuel_type.value]
+                * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+            )
+    return {
+        "periods": period_names,
+        "energy": {
+            end_use: {fuel_type: values.tolist() for fuel_type, values in fuels.items()}
+            for end_use, fuels in energy.items()
+        },
+        "load": {end_use: values.tolist() for end_use, values in loads.items()},
+        "co2_emissions": {
+            "electricity": electricity_emissions.tolist(),
+            "fossil_fuel": fossil_fuel_emissions.tolist(),
+            "total": (electricity_emissions + fossil_fuel_emissions).tolist(),
+        },
+    }
+
+
+def get_breakdowns(
+    data: Dict,
+    reduce: Callable[[np.ndarray], np.ndarray],
+    period_names: List[str],
+    home_types: Optional[List[HomeType]] = None,
+) -> Dict[str, Dict]:
+    # `reduce` maps a (series, time steps) array to a (series, periods) array
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    hourly_emission_factors = get_hourly_emission_factors(data)
+    breakdowns = {}
+    for home_type in home_types or list(HomeType):
+        block = get_series_block(
+            data, home_type, number_of_timesteps, hourly_emission_factors
+        )
+        breakdowns[home_type.value] = get_home_breakdown(
+            block, reduce(block.get_values()), period_names
+        )
+    return breakdowns
+
+
+def get_month_starts(number_of_timesteps: int) -> np.ndarray:
+    # Index of the first time step of each month
+    timesteps_per_day = (
+        HOURS_PER_DAY * number_of_timesteps // HERSDiagnosticData.NUMBER_OF_TIMESTEPS
+    )
+    return np.concatenate([[0], np.cumsum(DAYS_PER_MONTH[:-1])]) * timesteps_per_day
+
+
+def get_monthly_breakdowns(
+    data: Dict, home_types: Optional[List[HomeType]] = None
+) -> Dict[str, Dict]:
+    # Monthly energy (kBtu) by end use and fuel type, loads (kBtu) by end use and CO2
+    # emissions (lb) of each home type (all by default)
+    month_starts = get_month_starts(HERSDiagnosticData.get_number_of_timesteps(data))
+    return get_breakdowns(
+        data,
+        lambda values: np.add.reduceat(values, month_starts, axis=1),
+        MONTH_NAMES,
+        home_types,
+    )
+
+
+def get_time_of_use_mask(
+    hours: Iterable[int],
+    months: Optional[Iterable[int]] = None,
+    weekdays_only: bool = False,
+    first_weekday: int = calendar.MONDAY,
+) -> np.ndarray:
+    # Hourly mask of the `hours` (0-23) of the `months` (1-12, all by default), on
+    # weekdays only if requested. `first_weekday` is the weekday of January 1st.
+    hour_of_day = np.tile(np.arange(HOURS_PER_DAY), sum(DAYS_PER_MONTH))
+    day = np.arange(HERSDiagnosticData.NUMBER_OF_TIMESTEPS) // HOURS_PER_DAY
+    month = np.repeat(np.arange(1, 13), np.array(DAYS_PER_MONTH) * HOURS_PER_DAY)
+    mask = np.isin(hour_of_day, list(hours))
+    if months is not None:
+        mask &= np.isin(month, list(months))
+    if weekdays_only:
+        mask &= (day + first_weekday) % 7 < 5
+    return mask
+
+
+def get_period_matrix(
+    periods: Dict[str, Sequence], number_of_timesteps: int
+) -> np.ndarray:
+    # (time steps, periods) weights of masks given hourly or at the document's timestep
+    matrix = np.empty((number_of_timesteps, len(periods)))
+    for column, (name, mask) in enumerate(periods.items()):
+        mask = np.asarray(mask, dtype=float)
+        if len(mask) != number_of_timesteps:
+            mask = np.repeat(
+                mask, HERSDiagnosticData.get_block_size(number_of_timesteps, len(mask))
+            )
+        matrix[:, column] = mask
+    return matrix
+
+
+def get_time_of_use_breakdowns(
+    data: Dict,
+    periods: Dict[str, Sequence],
+    home_types: Optional[List[HomeType]] = None,
+) -> Dict[str, Dict]:
+    # As get_monthly_breakdowns, for time-of-use periods given as masks (hourly or at
+    # the document's timestep). A single mask is split into on-peak and off-peak.
+    if len(periods) == 1:
+        mask = np.asarray(next(iter(periods.values())), dtype=bool)
+        periods = {ON_PEAK: mask, OFF_PEAK: ~mask}
+    matrix = get_period_matrix(
+        periods, HERSDiagnosticData.get_number_of_timesteps(data)
+    )
+    return get_breakdowns(
+        data, lambda values: values @ matrix, list(periods), home_types
+    )
+
+
+def breakdown_file(
+    path,
+    periods: Optional[Dict[str, Sequence]] = None,
+    home_types: Optional[List[HomeType]] = None,
+) -> Dict:
+    # Monthly (and, with `periods`, time-of-use) breakdowns of a single file, recording
+    # errors instead of raising so one bad file does not abort a batch
+    result: Dict = {"path": str(path), "status": "pass", "message": ""}
+    try:
+        data = load(path)
+        result["monthly"] = get_monthly_breakdowns(data, home_types)
+        if periods is not None:
+            result["time_of_use"] = get_time_of_use_breakdowns(
+                data, periods, home_types
+            )
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def breakdown_files(
+    paths: List,
+    periods: Optional[Dict[str, Sequence]] = None,
+    home_types: Optional[List[HomeType]] = None,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+) -> List[Dict]:
+    return map_files(
+        functools.partial(breakdown_file, periods=periods, home_types=home_types),
+        paths,
+        max_workers,
+        use_threads,
+    )
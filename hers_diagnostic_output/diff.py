@@ -0,0 +1,309 @@
+"""Structural and numeric differences between two HERS diagnostic output documents."""
+
+import functools
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .aggregates import HomeAggregates, aggregate_home_outputs, calculate_intermediaries
+from .batch import map_files
+from .enumerations import HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import load
+
+HOURLY_SERIES = [
+    "electricity_co2_emissions_factors",
+    "outdoor_drybulb_temperature",
+    "on_site_power_production",
+    "battery_storage",
+]
+COMPARED_FIELDS = [
+    "software_name",
+    "software_version",
+    "weather_data_location",
+    "weather_data_state",
+    "conditioned_floor_area",
+    "number_of_bedrooms",
+    "number_of_stories",
+    "hers_index",
+    "carbon_index",
+]
+
+
+def get_hourly_series(data: Dict) -> Dict[str, List[float]]:
+    # Every hourly series of the document keyed by its location, in document order
+    series = {name: data[name] for name in HOURLY_SERIES if name in data}
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        series[f"{home_type.value}/conditioned_space_temperature"] = home_output[
+            "conditioned_space_temperature"
+        ]
+        for end_use in HERSDiagnosticData.system_end_uses:
+            for system_index, system_output in enumerate(
+                home_output[f"{end_use.value}_system_output"]
+            ):
+                path = f"{home_type.value}/{end_use.value}/{system_index}"
+                if "load" in system_output:
+                    series[f"{path}/load"] = system_output["load"]
+                for energy_index, energy_output in enumerate(
+                    system_output["energy_use"]
+                ):
+                    series[f"{path}/{energy_index}/{energy_output['fuel_type']}"] = (
+                        energy_output["energy"]
+                    )
+        for end_use in HERSDiagnosticData.other_end_uses:
+            for energy_index, energy_output in enumerate(
+                home_output.get(f"{end_use.value}_energy", [])
+            ):
+                series[
+                    f"{home_type.value}/{end_use.value}/{energy_index}/{energy_output['fuel_type']}"
+                ] = energy_output["energy"]
+    return series
+
+
+def is_close(
+    value_a, value_b, relative_tolerance: float, absolute_tolerance: float
+) -> bool:
+    if isinstance(value_a, (int, float)) and isinstance(value_b, (int, float)):
+        return math.isclose(
+            value_a, value_b, rel_tol=relative_tolerance, abs_tol=absolute_tolerance
+        )
+    return value_a == value_b
+
+
+def get_difference(value_a, value_b) -> Dict:
+    difference = {"a": value_a, "b": value_b}
+    if isinstance(value_a, (int, float)) and isinstance(value_b, (int, float)):
+        difference["difference"] = value_b - value_a
+    return difference
+
+
+def diff_fields(
+    data_a: Dict,
+    data_b: Dict,
+    relative_tolerance: float,
+    absolute_tolerance: float,
+) -> Dict[str, Dict]:
+    return {
+        name: get_difference(data_a.get(name), data_b.get(name))
+        for name in COMPARED_FIELDS
+        if not is_close(
+            data_a.get(name), data_b.get(name), relative_tolerance, absolute_tolerance
+        )
+    }
+
+
+def diff_intermediaries(
+    intermediaries_a: Dict[str, float],
+    intermediaries_b: Dict[str, float],
+    relative_tolerance: float,
+    absolute_tolerance: float,
+) -> Dict[str, Dict]:
+    return {
+        name: get_difference(value_a, intermediaries_b[name])
+        for name, value_a in intermediaries_a.items()
+        if not is_close(
+            value_a, intermediaries_b[name], relative_tolerance, absolute_tolerance
+        )
+    }
+
+
+def diff_systems(
+    aggregates_a: Dict[HomeType, HomeAggregates],
+    aggregates_b: Dict[HomeType, HomeAggregates],
+    relative_tolerance: float,
+    absolute_tolerance: float,
+) -> Tuple[List[Dict], List[str]]:
+    # Differences of each system's EEC, primary fuel type, annual load and annual
+    # energy use by fuel, and the home types and end uses with different system counts
+    differences: List[Dict] = []
+    structure: List[str] = []
+    for home_type in HomeType:
+        for end_use in HERSDiagnosticData.system_end_uses:
+            systems_a = aggregates_a[home_type].systems[end_use]
+            systems_b = aggregates_b[home_type].systems[end_use]
+            if len(systems_a) != len(systems_b):
+                structure.append(
+                    f"{home_type.value}/{end_use.value}: {len(systems_a)} systems in a, {len(systems_b)} in b"
+                )
+            for system_index, (system_a, system_b) in enumerate(
+                zip(systems_a, systems_b)
+            ):
+                values = [
+                    (
+                        "primary_fuel_type",
+                        system_a.primary_fuel_type.value,
+                        system_b.primary_fuel_type.value,
+                    ),
+                    (
+                        "equipment_efficiency_coefficient",
+                        system_a.equipment_efficiency_coefficient,
+                        system_b.equipment_efficiency_coefficient,
+                    ),
+                    ("annual_load", system_a.load, system_b.load),
+                ]
+                for fuel_type in HERSDiagnosticData.fuel_types:
+                    if fuel_type in system_a.energy or fuel_type in system_b.energy:
+                        values.append(
+                            (
+                                f"annual_energy_use/{fuel_type.value}",
+                                system_a.energy.get(fuel_type, 0.0),
+                                system_b.energy.get(fuel_type, 0.0),
+                            )
+                        )
+                for name, value_a, value_b in values:
+                    if not is_close(
+                        value_a, value_b, relative_tolerance, absolute_tolerance
+                    ):
+                        differences.append(
+                            {
+                                "system": f"{home_type.value}/{end_use.value}/{system_index}",
+                                "element": name,
+                                **get_difference(value_a, value_b),
+                            }
+                        )
+    return differences, structure
+
+
+def diff_hourly_series(
+    series_a: Dict[str, List[float]],
+    series_b: Dict[str, List[float]],
+    relative_tolerance: float,
+    absolute_tolerance: float,
+    number_of_deviations: int,
+) -> Tuple[Dict, List[str]]:
+    # Series present in both documents with equal lengths are stacked and compared at
+    # once. Reports each series with hours out of tolerance (maximum deviation and its
+    # hour), and the largest individual deviations over all series and hours.
+    structure = [f"{name}: only in a" for name in series_a if name not in series_b]
+    structure += [f"{name}: only in b" for name in series_b if name not in series_a]
+    names = []
+    for name in series_a:
+        if name in series_b:
+            if len(series_a[name]) == len(series_b[name]):
+                names.append(name)
+            else:
+                structure.append(
+                    f"{name}: {len(series_a[name])} values in a, {len(series_b[name])} in b"
+                )
+    summary: Dict = {"series": {}, "largest_deviations": []}
+    for length in sorted({len(series_a[name]) for name in names}):
+        group = [name for name in names if len(series_a[name]) == length]
+        values_a = np.array([series_a[name] for name in group], dtype=float)
+        values_b = np.array([series_b[name] for name in group], dtype=float)
+        deviations = np.abs(values_b - values_a)
+        out_of_tolerance = deviations > (
+            absolute_tolerance + relative_tolerance * np.abs(values_a)
+        )
+        counts = out_of_tolerance.sum(axis=1)
+        hours = deviations.argmax(axis=1)
+        for series_index in np.nonzero(counts)[0]:
+            hour = int(hours[series_index])
+            summary["series"][group[series_index]] = {
+                "hours_out_of_tolerance": int(counts[series_index]),
+                "maximum_deviation": float(deviations[series_index, hour]),
+                "hour": hour,
+                "a": float(values_a[series_index, hour]),
+                "b": float(values_b[series_index, hour]),
+            }
+        deviations = np.where(out_of_tolerance, deviations, 0.0).ravel()
+        number = min(number_of_deviations, int(np.count_nonzero(deviations)))
+        if number > 0:
+            largest = np.argpartition(deviations, -number)[-number:]
+            for index in largest:
+                series_index, hour = divmod(int(index), length)
+                summary["largest_deviations"].append(
+                    {
+                        "series": group[series_index],
+                        "hour": hour,
+                        "a": float(values_a[series_index, hour]),
+                        "b": float(values_b[series_index, hour]),
+                        "deviation": float(deviations[index]),
+                    }
+                )
+    summary["largest_deviations"] = sorted(
+        summary["largest_deviations"],
+        key=lambda deviation: deviation["deviation"],
+        reverse=True,
+    )[:number_of_deviations]
+    return summary, structure
+
+
+def diff_documents(
+    data_a: Dict,
+    data_b: Dict,
+    relative_tolerance: float = 1e-6,
+    absolute_tolerance: float = 1e-9,
+    number_of_deviations: int = 10,
+) -> Dict:
+    # Differences outside the tolerances between document `a` and document `b`
+    aggregates_a = aggregate_home_outputs(data_a)
+    aggregates_b = aggregate_home_outputs(data_b)
+    hourly_series, series_structure = diff_hourly_series(
+        get_hourly_series(data_a),
+        get_hourly_series(data_b),
+        relative_tolerance,
+        absolute_tolerance,
+        number_of_deviations,
+    )
+    systems, system_structure = diff_systems(
+        aggregates_a, aggregates_b, relative_tolerance, absolute_tolerance
+    )
+    differences = {
+        "structure": system_structure + series_structure,
+        "fields": diff_fields(data_a, data_b, relative_tolerance, absolute_tolerance),
+        "intermediaries": diff_intermediaries(
+            calculate_intermediaries(data_a, aggregates_a),
+            calculate_intermediaries(data_b, aggregates_b),
+            relative_tolerance,
+            absolute_tolerance,
+        ),
+        "systems": systems,
+        "hourly_series": hourly_series,
+    }
+    differences["identical"] = not (
+        differences["structure"]
+        or differences["fields"]
+        or differences["intermediaries"]
+        or systems
+        or hourly_series["series"]
+    )
+    return differences
+
+
+def diff_files(
+    paths: Tuple,
+    relative_tolerance: float = 1e-6,
+    absolute_tolerance: float = 1e-9,
+    number_of_deviations: int = 10,
+) -> Dict:
+    # Diff one pair of files, recording errors instead of raising so one bad pair does
+    # not abort a batch
+    path_a, path_b = paths
+    result: Dict = {"a": str(path_a), "b": str(path_b), "status": "same"}
+    try:
+        result["differences"] = diff_documents(
+            load(path_a),
+            load(path_b),
+            relative_tolerance,
+            absolute_tolerance,
+            number_of_deviations,
+        )
+        if not result["differences"]["identical"]:
+            result["status"] = "different"
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def diff_file_pairs(
+    pairs: List[Tuple],
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+    **tolerances,
+) -> List[Dict]:
+    return map_files(
+        functools.partial(diff_files, **tolerances), pairs, max_workers, use_threads
+    )
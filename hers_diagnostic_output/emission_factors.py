@@ -0,0 +1,155 @@
+"""Library of regional electricity emission factor tables, memory-mapped on lookup."""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from koozie import convert  # type: ignore
+
+LIBRARY_PATH_VARIABLE = "HERS_EMISSION_FACTOR_LIBRARY"
+DEFAULT_LIBRARY_PATH = Path(__file__).parent / "emission_factor_tables"
+INDEX_FILE_NAME = "index.json"
+
+
+class EmissionFactorLibrary:
+    # One .npy table per region and year holding the factors in lb/kWh and lb/kBtu
+    # (rows 0 and 1), converted when the table is added. Tables are memory-mapped, so
+    # processes reading the same table share its pages.
+    def __init__(self, directory=None):
+        self.directory = Path(
+            directory or os.environ.get(LIBRARY_PATH_VARIABLE, DEFAULT_LIBRARY_PATH)
+        )
+        self.index: Dict[str, Dict] = {}
+        self.index_version: Optional[Tuple[int, int]] = None
+        self.tables: Dict[str, np.ndarray] = {}
+        self.load_index()
+
+    def load_index(self):
+        # (Re-)read the index when it was replaced since it was last read, e.g., by
+        # add_table in another process. Tables whose entry changed are dropped.
+        index_path = self.directory / INDEX_FILE_NAME
+        try:
+            status = index_path.stat()
+        except FileNotFoundError:
+            return
+        version = (status.st_mtime_ns, status.st_ino)
+        if version == self.index_version:
+            return
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        self.tables = {
+            key: table
+            for key, table in self.tables.items()
+            if index.get(key) == self.index.get(key)
+        }
+        self.index = index
+        self.index_version = version
+
+    @staticmethod
+    def get_key(region: str, year: int) -> str:
+        return f"{region}/{year}"
+
+    def get_years(self, region: str) -> List[int]:
+        self.load_index()
+        return sorted(
+            entry["year"] for entry in self.index.values() if entry["region"] == region
+        )
+
+    def get_factors(self, region: str, year: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Factors (lb/kWh, lb/kBtu) of the region for the year
+        self.load_index()
+        key = self.get_key(region, year)
+        if key not in self.tables:
+            if key not in self.index:
+                raise RuntimeError(
+                    f"No emission factors for region '{region}' and year {year} in "
+                    f"{self.directory}."
+                )
+            self.tables[key] = np.load(
+                self.directory / self.index[key]["file"], mmap_mode="r"
+            )
+        table = self.tables[key]
+        return table[0], table[1]
+
+    def add_table(self, region: str, year: int, factors: Sequence[float]):
+        # Add or replace the table of a region and year from factors in lb/kWh
+        self.load_index()
+        factors_kwh = np.asarray(factors, dtype=float)
+        table = np.stack(
+            [
+                factors_kwh,
+                np.asarray(convert(factors_kwh, "lb/kWh", "lb/kBtu"), dtype=float),
+            ]
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file_name = f"{region}_{year}.npy"
+        # Replaced rather than overwritten, so tables already memory-mapped (in any
+        # process) keep their pages
+        temporary_path = self.directory / f"{file_name}.tmp"
+        with open(temporary_path, "wb") as table_file:
+            np.save(table_file, table)
+        os.replace(temporary_path, self.directory / file_name)
+        key = self.get_key(region, year)
+        self.index[key] = {
+            "region": region,
+            "year": year,
+            "file": file_name,
+            "number_of_values": len(factors_kwh),
+            # distinguishes a replaced table when the index is re-read
+            "modified": (self.directory / file_name).stat().st_mtime_ns,
+        }
+        self.tables.pop(key, None)
+        # Written last (and atomically) so readers never see a table that is missing
+        index_path = self.directory / INDEX_FILE_NAME
+        temporary_path = f"{index_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as index_file:
+            json.dump(self.index, index_file, indent=2, sort_keys=True)
+        os.replace(temporary_path, index_path)
+        status = index_path.stat()
+        self.index_version = (status.st_mtime_ns, status.st_ino)
+
+
+def build_library(
+    directory, tables: Dict[Tuple[str, int], Sequence[float]]
+) -> EmissionFactorLibrary:
+    # `tables` maps (region, year) to hourly factors in lb/kWh
+    library = EmissionFactorLibrary(directory)
+    for (region, year), factors in tables.items():
+        library.add_table(region, year, factors)
+    return library
+
+
+libraries: Dict[str, EmissionFactorLibrary] = {}  # one instance per directory
+
+
+def get_library(directory=None) -> EmissionFactorLibrary:
+    path = str(directory or os.environ.get(LIBRARY_PATH_VARIABLE, DEFAULT_LIBRARY_PATH))
+    if path not in libraries:
+        libraries[path] = EmissionFactorLibrary(path)
+    return libraries[path]
+
+
+def get_emission_factors(data: Dict, directory=None) -> Tuple[Sequence, Sequence]:
+    # Factors in lb/kWh and lb/kBtu: embedded in the document, or from the library by
+    # `electricity_co2_emissions_region` (default `weather_data_state`) and
+    # `electricity_co2_emissions_year`. The year is required so adding a newer table
+    # to the library never changes the CO2 Index of an existing document.
+    if "electricity_co2_emissions_factors" in data:
+        factors = data["electricity_co2_emissions_factors"]
+        # Converted as an array: koozie converts the elements of a list one at a time
+        return factors, convert(np.asarray(factors, dtype=float), "lb/kWh", "lb/kBtu")
+    region = data.get(
+        "electricity_co2_emissions_region", data.get("weather_data_state")
+    )
+    if region is None:
+        raise RuntimeError(
+            "Either electricity emission factors or their region must be given."
+        )
+    year = data.get("electricity_co2_emissions_year")
+    if year is None:
+        raise RuntimeError(
+            f"The year of the electricity emission factors of region '{region}' must be given."
+        )
+    return get_library(directory).get_factors(region, year)
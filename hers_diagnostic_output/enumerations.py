@@ -0,0 +1,29 @@
+"""Enumerations shared by the HERS Index calculation."""
+
+from enum import Enum
+
+
+class HomeType(Enum):
+    RATED_HOME = "rated_home"
+    HERS_REFERENCE_HOME = "hers_reference_home"
+    CO2_REFERENCE_HOME = "co2_reference_home"
+    IAD_RATED_HOME = "iad_rated_home"
+    IAD_HERS_REFERENCE_HOME = "iad_hers_reference_home"
+
+
+class EndUse(Enum):
+    SPACE_HEATING = "space_heating"
+    SPACE_COOLING = "space_cooling"
+    WATER_HEATING = "water_heating"
+    LIGHTING_AND_APPLIANCE = "lighting_and_appliance"
+    VENTILATION = "ventilation"
+    DEHUMIDIFCATION = "dehumidification"
+
+
+class FuelType(Enum):
+    ELECTRICITY = "ELECTRICITY"
+    BIOMASS = "BIOMASS"
+    NATURAL_GAS = "NATURAL_GAS"
+    FUEL_OIL_2 = "FUEL_OIL_2"
+    LIQUID_PETROLEUM_GAS = "LIQUID_PETROLEUM_GAS"
+    FOSSIL_FUEL = "FOSSIL_FUEL"
@@ -0,0 +1,240 @@
+"""pandas views of the time series and columnar exports of batch results."""
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import TNML_TERMS, TRL_TERMS
+from .enumerations import HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+
+try:
+    import pyarrow  # type: ignore
+    import pyarrow.ipc  # type: ignore
+    import pyarrow.parquet  # type: ignore
+except ImportError:  # optional, only needed for Arrow and Parquet exports
+    pyarrow = None
+
+SERIES_LEVELS = ["home_type", "end_use", "system", "fuel_type", "quantity"]
+DOCUMENT_SERIES = [
+    "outdoor_drybulb_temperature",
+    "electricity_co2_emissions_factors",
+    "on_site_power_production",
+    "battery_storage",
+]
+NOT_APPLICABLE = ""
+NO_SYSTEM = -1
+
+STRING_COLUMNS = ["path", "status", "message", "software_name", "weather_data_state"]
+INTERMEDIARY_NAMES = [
+    "hers_index",
+    "co2_index",
+    "iaf_rh",
+    "aco2",
+    "arco2",
+    "pe_frac",
+    "tnml",
+    "trl",
+    "teu",
+    "opp",
+    "bsl",
+    "iad_save",
+    "iaf_cfa",
+    "iaf_nbr",
+    "iaf_ns",
+    "tnml_iad",
+    "trl_iad",
+] + [
+    f"{name}{suffix}"
+    for terms in [TNML_TERMS, TRL_TERMS]
+    for suffix in ["", "_iad"]
+    for name in terms
+]
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def get_series(data: Dict, number_of_timesteps: int) -> Iterator[Tuple[Tuple, List]]:
+    # (home type, end use, system, fuel type, quantity) and values of each time series
+    # with one value per time step (hourly emission factors of sub-hourly documents are
+    # left out). Levels that do not apply are "" (or -1 for the system).
+    for name in DOCUMENT_SERIES:
+        if name in data and len(data[name]) == number_of_timesteps:
+            yield (
+                (NOT_APPLICABLE, NOT_APPLICABLE, NO_SYSTEM, NOT_APPLICABLE, name),
+                data[name],
+            )
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        yield (
+            (
+                home_type.value,
+                NOT_APPLICABLE,
+                NO_SYSTEM,
+                NOT_APPLICABLE,
+                "conditioned_space_temperature",
+            ),
+            home_output["conditioned_space_temperature"],
+        )
+        for end_use in HERSDiagnosticData.system_end_uses:
+            for system_index, system_output in enumerate(
+                home_output[f"{end_use.value}_system_output"]
+            ):
+                if "load" in system_output:
+                    yield (
+                        (
+                            home_type.value,
+                            end_use.value,
+                            system_index,
+                            NOT_APPLICABLE,
+                            "load",
+                        ),
+                        system_output["load"],
+                    )
+                for energy_output in system_output["energy_use"]:
+                    yield (
+                        (
+                            home_type.value,
+                            end_use.value,
+                            system_index,
+                            energy_output["fuel_type"],
+                            "energy",
+                        ),
+                        energy_output["energy"],
+                    )
+        for end_use in HERSDiagnosticData.other_end_uses:
+            for energy_output in home_output.get(f"{end_use.value}_energy", []):
+                yield (
+                    (
+                        home_type.value,
+                        end_use.value,
+                        NO_SYSTEM,
+                        energy_output["fuel_type"],
+                        "energy",
+                    ),
+                    energy_output["energy"],
+                )
+
+
+def get_wide_frame(data: Dict) -> pd.DataFrame:
+    # One column per time series (MultiIndex of SERIES_LEVELS), one row per time step.
+    # The values are converted once into a single column-major block that the frame
+    # wraps without copying.
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    keys, values = zip(*get_series(data, number_of_timesteps))
+    block = np.empty((number_of_timesteps, len(keys)), order="F")
+    for column, series in enumerate(values):
+        block[:, column] = series
+    frame = pd.DataFrame(
+        block,
+        index=pd.RangeIndex(number_of_timesteps, name="timestep"),
+        columns=pd.MultiIndex.from_tuples(keys, names=SERIES_LEVELS),
+        copy=False,
+    )
+    frame.attrs["timestep"] = data.get("timestep", HERSDiagnosticData.DEFAULT_TIMESTEP)
+    return frame
+
+
+def get_long_frame(data: Dict) -> pd.DataFrame:
+    # One row per series and time step. The series levels are categorical and the
+    # value column is a view of the wide frame's block.
+    wide_frame = get_wide_frame(data)
+    number_of_timesteps, number_of_series = wide_frame.shape
+    columns = wide_frame.columns
+    content = {
+        name: pd.Categorical.from_codes(
+            np.repeat(columns.codes[level], number_of_timesteps),
+            categories=columns.levels[level],
+        )
+        for level, name in enumerate(SERIES_LEVELS)
+    }
+    content["timestep"] = np.tile(
+        np.arange(number_of_timesteps, dtype=np.int32), number_of_series
+    )
+    content["value"] = wide_frame.to_numpy(copy=False).T.reshape(-1)
+    frame = pd.DataFrame(content, copy=False)
+    frame.attrs["timestep"] = wide_frame.attrs["timestep"]
+    return frame
+
+
+def get_result_columns(results: List[Dict]) -> Dict[str, object]:
+    # Columns of a chunk of batch.verify_file results. Intermediaries missing from a
+    # result (e.g., a failed file) are NaN.
+    columns: Dict[str, object] = {
+        name: [result.get(name) for result in results] for name in STRING_COLUMNS
+    }
+    for name in INTERMEDIARY_NAMES:
+        columns[name] = np.fromiter(
+            (
+                (result.get("intermediaries") or {}).get(name, result.get(name))
+                for result in results
+            ),
+            dtype=float,
+            count=len(results),
+        )
+    return columns
+
+
+def get_chunks(items: Iterable, chunk_size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_results_frame(
+    results: Iterable[Dict], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> pd.DataFrame:
+    frames = [
+        pd.DataFrame(get_result_columns(chunk), copy=False)
+        for chunk in get_chunks(results, chunk_size)
+    ]
+    if not frames:
+        return pd.DataFrame(get_result_columns([]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_results_schema():
+    return pyarrow.schema(
+        [(name, pyarrow.string()) for name in STRING_COLUMNS]
+        + [(name, pyarrow.float64()) for name in INTERMEDIARY_NAMES]
+    )
+
+
+def write_results(
+    results: Iterable[Dict], path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    # Stream results (e.g., as they are verified) to a Parquet file (".parquet") or an
+    # Arrow IPC file (any other extension), one record batch of `chunk_size` results
+    # at a time. NaN intermediaries are written as nulls. Returns the number of rows.
+    if pyarrow is None:
+        raise RuntimeError("Arrow and Parquet exports require pyarrow.")
+    schema = get_results_schema()
+    if Path(path).suffix.lower() == ".parquet":
+        writer = pyarrow.parquet.ParquetWriter(str(path), schema)
+    else:
+        writer = pyarrow.ipc.new_file(str(path), schema)
+    number_of_rows = 0
+    try:
+        for chunk in get_chunks(results, chunk_size):
+            columns = get_result_columns(chunk)
+            writer.write_batch(
+                pyarrow.record_batch(
+                    [
+                        pyarrow.array(
+                            columns[field.name], type=field.type, from_pandas=True
+                        )
+                        for field in schema
+                    ],
+                    schema=schema,
+                )
+            )
+            number_of_rows += len(chunk)
+    finally:
+        writer.close()
+    return number_of_rows
@@ -0,0 +1,649 @@
+"""Randomized checks of the calculation engines against an independent reference."""
+
+import copy
+import math
+import os
+import random
+from typing import Callable, Dict, Iterator, List, Optional
+
+from koozie import convert  # type: ignore
+
+from .aggregates import (
+    aggregate_home_outputs,
+    calculate_intermediaries,
+    embed_annual_aggregates,
+    load_home_aggregates,
+)
+from .batch import dump_json
+from .enumerations import EndUse, FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+
+TIMESTEPS = [60, 60, 60, 30, 15]
+OPTIONAL_SERIES = ["on_site_power_production", "battery_storage"]
+PRIMARY_FUEL_TYPES = {
+    EndUse.SPACE_HEATING: [
+        FuelType.ELECTRICITY,
+        FuelType.NATURAL_GAS,
+        FuelType.FUEL_OIL_2,
+        FuelType.LIQUID_PETROLEUM_GAS,
+        FuelType.BIOMASS,
+    ],
+    EndUse.SPACE_COOLING: [FuelType.ELECTRICITY],
+    EndUse.WATER_HEATING: [
+        FuelType.ELECTRICITY,
+        FuelType.NATURAL_GAS,
+        FuelType.FUEL_OIL_2,
+        FuelType.LIQUID_PETROLEUM_GAS,
+    ],
+}
+
+
+def get_series(
+    generator: random.Random,
+    number_of_timesteps: int,
+    scale: float,
+    extreme: bool = True,
+) -> List[float]:
+    # Random non-negative series, with `extreme`, sometimes with degenerate shapes or
+    # extreme magnitudes
+    shape = "uniform"
+    if extreme:
+        shape = generator.choice(["uniform"] * 4 + ["sparse", "constant", "zero"])
+        if generator.random() < 0.1:
+            scale *= generator.choice([1e-9, 1e6])
+    if shape == "zero":
+        return [0.0] * number_of_timesteps
+    if shape == "constant":
+        return [scale * generator.random()] * number_of_timesteps
+    if shape == "sparse":
+        return [
+            scale * generator.random() * 100 if generator.random() < 0.01 else 0.0
+            for _ in range(number_of_timesteps)
+        ]
+    return [scale * generator.random() for _ in range(number_of_timesteps)]
+
+
+def get_energy_outputs(
+    generator: random.Random,
+    number_of_timesteps: int,
+    fuel_types: List[FuelType],
+    scale: float,
+) -> List[Dict]:
+    return [
+        {
+            "fuel_type": fuel_type.value,
+            "energy": get_series(generator, number_of_timesteps, scale),
+        }
+        for fuel_type in fuel_types
+    ]
+
+
+def get_home_output(
+    generator: random.Random,
+    number_of_timesteps: int,
+    structure: Dict,
+    include_loads: bool,
+) -> Dict:
+    home_output: Dict = {
+        "conditioned_space_temperature": [
+            60.0 + 20.0 * generator.random() for _ in range(number_of_timesteps)
+        ]
+    }
+    for end_use in HERSDiagnosticData.system_end_uses:
+        system_outputs = []
+        for primary_fuel_type, fuel_types in structure[end_use]:
+            system_output = {
+                "primary_fuel_type": primary_fuel_type.value,
+                "equipment_efficiency_coefficient": generator.choice(
+                    [0.5, 0.8, 0.95, 2.5, 3.5, 0.3 + 10.0 * generator.random()]
+                ),
+                "energy_use": get_energy_outputs(
+                    generator, number_of_timesteps, fuel_types, 2.0
+                ),
+            }
+            # primary fuel energy and loads are kept regular so EC_r, REUL and the IAD
+            # savings are well-defined
+            system_output["energy_use"][0]["energy"] = get_series(
+                generator, number_of_timesteps, 2.0, False
+            )
+            if include_loads:
+                system_output["load"] = get_series(
+                    generator, number_of_timesteps, 5.0, False
+                )
+            system_outputs.append(system_output)
+        home_output[f"{end_use.value}_system_output"] = system_outputs
+    for end_use in HERSDiagnosticData.other_end_uses:
+        if end_use in structure:
+            home_output[f"{end_use.value}_energy"] = get_energy_outputs(
+                generator, number_of_timesteps, structure[end_use], 1.0
+            )
+    return home_output
+
+
+def generate_document(generator: random.Random) -> Dict:
+    # Random valid document. All home types share one system structure (counts and fuel
+    # mixes); optional series, rated home loads and dehumidification vary per document.
+    timestep = generator.choice(TIMESTEPS)
+    number_of_timesteps = HERSDiagnosticData.NUMBER_OF_TIMESTEPS * 60 // timestep
+    structure: Dict = {}
+    for end_use in HERSDiagnosticData.system_end_uses:
+        structure[end_use] = []
+        for _ in range(generator.choice([1, 1, 2, 3])):
+            primary_fuel_type = generator.choice(PRIMARY_FUEL_TYPES[end_use])
+            fuel_types = [primary_fuel_type]
+            if primary_fuel_type != FuelType.ELECTRICITY and generator.random() < 0.7:
+                fuel_types.append(FuelType.ELECTRICITY)  # e.g., fans and pumps
+            structure[end_use].append((primary_fuel_type, fuel_types))
+    for end_use in HERSDiagnosticData.other_end_uses:
+        if end_use != EndUse.DEHUMIDIFCATION or generator.random() < 0.7:
+            structure[end_use] = generator.sample(
+                HERSDiagnosticData.fuel_types,
+                generator.choice([1, 1, 2]),
+            )
+    include_rated_loads = generator.random() < 0.5
+    data: Dict = {
+        "metadata": {"schema": "HERS_DIAGNOSTIC_OUTPUT"},
+        "project_name": "fuzz",
+        "software_name": "fuzz",
+        "software_version": "0",
+        "weather_data_location": "fuzz",
+        "weather_data_state": "CO",
+        "conditioned_floor_area": generator.choice([500.0, 2400.0, 10000.0]),
+        "number_of_bedrooms": generator.choice([1, 3, 6]),
+        "number_of_stories": generator.choice([1, 2, 4]),
+        "hers_index": 0.0,
+        "carbon_index": 0.0,
+        "outdoor_drybulb_temperature": [
+            100.0 * generator.random() for _ in range(number_of_timesteps)
+        ],
+    }
+    if timestep != HERSDiagnosticData.DEFAULT_TIMESTEP:
+        data["timestep"] = timestep
+    emission_factor_timesteps = generator.choice(
+        [HERSDiagnosticData.NUMBER_OF_TIMESTEPS, number_of_timesteps]
+    )
+    data["electricity_co2_emissions_factors"] = [
+        0.2 + generator.random() for _ in range(emission_factor_timesteps)
+    ]
+    if generator.random() < 0.6:
+        data["on_site_power_production"] = get_series(
+            generator, number_of_timesteps, 1.0
+        )
+    if generator.random() < 0.4:
+        data["battery_storage"] = [
+            generator.random() * 0.4 - 0.2 for _ in range(number_of_timesteps)
+        ]
+    for home_type in HomeType:
+        data[f"{home_type.value}_output"] = get_home_output(
+            generator,
+            number_of_timesteps,
+            structure,
+            include_rated_loads
+            or home_type not in [HomeType.RATED_HOME, HomeType.IAD_RATED_HOME],
+        )
+    return data
+
+
+# Independent reference: Standard 301 written out on the plain document, with every
+# sum correctly rounded (math.fsum) and no code shared with the engines beyond the
+# coefficient tables
+
+
+def get_reference_fuel_energy(energy_outputs: List[Dict], fuel_type: FuelType) -> float:
+    return math.fsum(
+        math.fsum(energy_output["energy"])
+        for energy_output in energy_outputs
+        if energy_output["fuel_type"] == fuel_type.value
+    )
+
+
+def get_reference_annual_energy(
+    home_output: Dict, end_use: EndUse, fuel_type: FuelType
+) -> float:
+    if end_use in HERSDiagnosticData.system_end_uses:
+        return math.fsum(
+            get_reference_fuel_energy(system_output["energy_use"], fuel_type)
+            for system_output in home_output[f"{end_use.value}_system_output"]
+        )
+    return get_reference_fuel_energy(
+        home_output.get(f"{end_use.value}_energy", []), fuel_type
+    )
+
+
+def get_reference_end_use_energy(home_output: Dict, end_use: EndUse) -> float:
+    # EC_LA, EC_VENT, EC_DH (and REC_*) in kBtu; biomass is not counted
+    return math.fsum(
+        get_reference_annual_energy(home_output, end_use, fuel_type)
+        for fuel_type in HERSDiagnosticData.fuel_types
+    )
+
+
+def get_reference_system_energy(system_output: Dict) -> float:
+    # EC_x or EC_r: the energy of each entry's fuel type, once per entry
+    return math.fsum(
+        get_reference_fuel_energy(
+            system_output["energy_use"], FuelType(energy_output["fuel_type"])
+        )
+        for energy_output in system_output["energy_use"]
+    )
+
+
+def get_reference_nmeul(
+    rated_output: Dict, reference_output: Dict, end_use: EndUse
+) -> float:
+    # nMEUL = REUL * nEC_x / EC_r, with nEC_x = EC_x * (a * EEC_x - b) * (EEC_r / EEC_x)
+    key = f"{end_use.value}_system_output"
+    nmeul = []
+    for rated_system, reference_system in zip(rated_output[key], reference_output[key]):
+        fuel_type = FuelType(rated_system["primary_fuel_type"])
+        if fuel_type in HERSDiagnosticData.fossil_fuel_types:
+            fuel_type = FuelType.FOSSIL_FUEL
+        coefficients = HERSDiagnosticData.fuel_coefficients[(end_use, fuel_type)]
+        eec_x = rated_system["equipment_efficiency_coefficient"]
+        eec_r = reference_system["equipment_efficiency_coefficient"]
+        nec_x = (
+            get_reference_system_energy(rated_system)
+            * (coefficients["a"] * eec_x - coefficients["b"])
+            * (eec_r / eec_x)
+        )
+        nmeul.append(
+            math.fsum(reference_system["load"])
+            * nec_x
+            / get_reference_system_energy(reference_system)
+        )
+    return math.fsum(nmeul)
+
+
+def get_reference_reul(reference_output: Dict, end_use: EndUse) -> float:
+    return math.fsum(
+        math.fsum(system_output["load"])
+        for system_output in reference_output[f"{end_use.value}_system_output"]
+    )
+
+
+def get_reference_block_sums(values: List[float], block_size: int) -> List[float]:
+    return [
+        math.fsum(values[start : start + block_size])
+        for start in range(0, len(values), block_size)
+    ]
+
+
+def get_reference_co2_emissions(
+    data: Dict, home_type: HomeType, factors_kwh: List[float]
+) -> float:
+    # lb: electricity at each (hourly or time step) factor, fossil fuels annually
+    home_output = data[f"{home_type.value}_output"]
+    number_of_timesteps = HERSDiagnosticData.get_number_of_timesteps(data)
+    block_size = number_of_timesteps // len(factors_kwh)
+    kwh_per_kbtu = convert(1.0, "kBtu", "kWh")
+    electricity_outputs = []
+    for end_use in HERSDiagnosticData.end_uses:
+        if end_use in HERSDiagnosticData.system_end_uses:
+            energy_outputs = [
+                energy_output
+                for system_output in home_output[f"{end_use.value}_system_output"]
+                for energy_output in system_output["energy_use"]
+            ]
+        else:
+            energy_outputs = home_output.get(f"{end_use.value}_energy", [])
+        electricity_outputs += [
+            energy_output["energy"]
+            for energy_output in energy_outputs
+            if energy_output["fuel_type"] == FuelType.ELECTRICITY.value
+        ]
+    electricity_use = [math.fsum(values) for values in zip(*electricity_outputs)]
+    emissions = [
+        math.fsum(
+            value * factor * kwh_per_kbtu
+            for value, factor in zip(
+                get_reference_block_sums(electricity_use, block_size), factors_kwh
+            )
+        )
+    ]
+    for fuel_type in HERSDiagnosticData.fossil_fuel_types:
+        emissions.append(
+            math.fsum(
+                get_reference_annual_energy(home_output, end_use, fuel_type)
+                for end_use in HERSDiagnosticData.end_uses
+            )
+            * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+        )
+    if home_type == HomeType.RATED_HOME:
+        for name, sign in [
+            ("on_site_power_production", -1.0),
+            ("battery_storage", 1.0),
+        ]:
+            if name in data:
+                emissions.append(
+                    sign
+                    * math.fsum(
+                        value * factor
+                        for value, factor in zip(
+                            get_reference_block_sums(data[name], block_size),
+                            factors_kwh,
+                        )
+                    )
+                )
+    return math.fsum(emissions)
+
+
+def calculate_reference(data: Dict) -> Dict[str, float]:
+    outputs = {home_type: data[f"{home_type.value}_output"] for home_type in HomeType}
+    intermediaries: Dict[str, float] = {}
+    for suffix, rated_home, reference_home in [
+        ("", HomeType.RATED_HOME, HomeType.HERS_REFERENCE_HOME),
+        ("_iad", HomeType.IAD_RATED_HOME, HomeType.IAD_HERS_REFERENCE_HOME),
+    ]:
+        for name, end_use in [
+            ("heat", EndUse.SPACE_HEATING),
+            ("cool", EndUse.SPACE_COOLING),
+            ("hw", EndUse.WATER_HEATING),
+        ]:
+            intermediaries[f"nmeul_{name}{suffix}"] = get_reference_nmeul(
+                outputs[rated_home], outputs[reference_home], end_use
+            )
+            intermediaries[f"reul_{name}{suffix}"] = get_reference_reul(
+                outputs[reference_home], end_use
+            )
+        for name, end_use in [
+            ("la", EndUse.LIGHTING_AND_APPLIANCE),
+            ("vent", EndUse.VENTILATION),
+            ("dh", EndUse.DEHUMIDIFCATION),
+        ]:
+            intermediaries[f"ec_{name}{suffix}"] = get_reference_end_use_energy(
+                outputs[rated_home], end_use
+            )
+            intermediaries[f"rec_{name}{suffix}"] = get_reference_end_use_energy(
+                outputs[reference_home], end_use
+            )
+        intermediaries[f"tnml{suffix}"] = math.fsum(
+            intermediaries[f"{name}{suffix}"]
+            for name in [
+                "nmeul_heat",
+                "nmeul_cool",
+                "nmeul_hw",
+                "ec_la",
+                "ec_vent",
+                "ec_dh",
+            ]
+        )
+        intermediaries[f"trl{suffix}"] = math.fsum(
+            intermediaries[f"{name}{suffix}"]
+            for name in [
+                "reul_heat",
+                "reul_cool",
+                "reul_hw",
+                "rec_la",
+                "rec_vent",
+                "rec_dh",
+            ]
+        )
+
+    # TEU, OPP and BSL in MBtu; fossil fuels count for 0.4 of their energy
+    teu = math.fsum(
+        convert(
+            get_reference_annual_energy(
+                outputs[HomeType.RATED_HOME], end_use, fuel_type
+            )
+            * (0.4 if fuel_type in HERSDiagnosticData.fossil_fuel_types else 1.0),
+            "kBtu",
+            "kWh",
+        )
+        for end_use in HERSDiagnosticData.end_uses
+        for fuel_type in HERSDiagnosticData.fuel_types + [FuelType.BIOMASS]
+    )
+    intermediaries["teu"] = convert(teu, "kWh", "MBtu")
+    for name, series in [
+        ("opp", "on_site_power_production"),
+        ("bsl", "battery_storage"),
+    ]:
+        intermediaries[name] = convert(math.fsum(data.get(series, [])), "kWh", "MBtu")
+    intermediaries["pe_frac"] = (
+        intermediaries["teu"] - intermediaries["opp"] + intermediaries["bsl"]
+    ) / intermediaries["teu"]
+
+    # Index adjustment factors
+    iad_save = (
+        100 - intermediaries["tnml_iad"] / intermediaries["trl_iad"] * 100
+    ) / 100
+    intermediaries["iad_save"] = iad_save
+    intermediaries["iaf_cfa"] = (2400 / data["conditioned_floor_area"]) ** (
+        0.304 * iad_save
+    )
+    intermediaries["iaf_nbr"] = 1 + (
+        0.069 * iad_save * (data["number_of_bedrooms"] - 3)
+    )
+    intermediaries["iaf_ns"] = (2 / data["number_of_stories"]) ** (0.12 * iad_save)
+    intermediaries["iaf_rh"] = (
+        intermediaries["iaf_cfa"] * intermediaries["iaf_nbr"] * intermediaries["iaf_ns"]
+    )
+
+    factors_kwh = list(data["electricity_co2_emissions_factors"])
+    intermediaries["aco2"] = get_reference_co2_emissions(
+        data, HomeType.RATED_HOME, factors_kwh
+    )
+    intermediaries["arco2"] = get_reference_co2_emissions(
+        data, HomeType.CO2_REFERENCE_HOME, factors_kwh
+    )
+    intermediaries["hers_index"] = (
+        intermediaries["pe_frac"]
+        * intermediaries["tnml"]
+        / (intermediaries["trl"] * intermediaries["iaf_rh"])
+        * 100
+    )
+    intermediaries["co2_index"] = (
+        intermediaries["aco2"]
+        / (intermediaries["arco2"] * intermediaries["iaf_rh"])
+        * 100
+    )
+    return intermediaries
+
+
+def calculate_hers_diagnostic_data(data: Dict) -> Dict[str, float]:
+    return HERSDiagnosticData(data=data).get_hers_index_intermediaries()
+
+
+def calculate_aggregates(data: Dict) -> Dict[str, float]:
+    return calculate_intermediaries(data, aggregate_home_outputs(data))
+
+
+def calculate_embedded_aggregates(data: Dict) -> Dict[str, float]:
+    annual_aggregates = embed_annual_aggregates(data)["annual_aggregates"]
+    return calculate_intermediaries(
+        data,
+        {
+            home_type: load_home_aggregates(
+                annual_aggregates[f"{home_type.value}_aggregates"]
+            )
+            for home_type in HomeType
+        },
+    )
+
+
+# Engines compared against the reference
+ENGINES: Dict[str, Callable[[Dict], Dict[str, float]]] = {
+    "hers_diagnostic_data": calculate_hers_diagnostic_data,
+    "aggregates": calculate_aggregates,
+    "embedded_aggregates": calculate_embedded_aggregates,
+}
+
+
+def run_engine(engine: Callable[[Dict], Dict[str, float]], data: Dict):
+    # Intermediaries, or the name of the exception raised
+    try:
+        return engine(data)
+    except Exception as error:
+        return type(error).__name__
+
+
+def compare_engines(
+    data: Dict,
+    relative_tolerance: float = 1e-9,
+    absolute_tolerance: float = 1e-9,
+) -> List[str]:
+    # Differences of every engine from the reference. Engines agree on invalid input if
+    # they raise the same type of exception.
+    reference = run_engine(calculate_reference, data)
+    mismatches = []
+    for name, engine in ENGINES.items():
+        result = run_engine(engine, data)
+        if isinstance(reference, str) or isinstance(result, str):
+            if reference != result:
+                mismatches.append(f"{name}: {result!r}, reference {reference!r}")
+            continue
+        for intermediary, reference_value in reference.items():
+            value = result[intermediary]
+            if value != reference_value and not (
+                abs(value - reference_value)
+                <= max(
+                    relative_tolerance * max(abs(value), abs(reference_value)),
+                    absolute_tolerance,
+                )
+            ):
+                mismatches.append(
+                    f"{name}: {intermediary} {value!r}, reference {reference_value!r}"
+                )
+    return mismatches
+
+
+def get_mutable_series(data: Dict) -> List[List[float]]:
+    series = [data[name] for name in OPTIONAL_SERIES if name in data]
+    series.append(data["electricity_co2_emissions_factors"])
+    for home_type in HomeType:
+        home_output = data[f"{home_type.value}_output"]
+        for end_use in HERSDiagnosticData.system_end_uses:
+            for system_output in home_output[f"{end_use.value}_system_output"]:
+                if "load" in system_output:
+                    series.append(system_output["load"])
+                series += [
+                    energy_output["energy"]
+                    for energy_output in system_output["energy_use"]
+                ]
+        for end_use in HERSDiagnosticData.other_end_uses:
+            series += [
+                energy_output["energy"]
+                for energy_output in home_output.get(f"{end_use.value}_energy", [])
+            ]
+    return series
+
+
+def get_reductions(data: Dict) -> Iterator[Dict]:
+    # Candidate simplifications of a document, from the coarsest to the finest, copied
+    # only when needed. Every candidate is still a valid document.
+    for name in OPTIONAL_SERIES:
+        if name in data:
+            candidate = copy.deepcopy(data)
+            del candidate[name]
+            yield candidate
+    home_outputs = [data[f"{home_type.value}_output"] for home_type in HomeType]
+    for end_use in HERSDiagnosticData.system_end_uses:
+        key = f"{end_use.value}_system_output"
+        for system_index in range(len(home_outputs[0][key])):
+            if len(home_outputs[0][key]) > 1:
+                candidate = copy.deepcopy(data)
+                for home_type in HomeType:
+                    del candidate[f"{home_type.value}_output"][key][system_index]
+                yield candidate
+            for energy_index in range(
+                len(home_outputs[0][key][system_index]["energy_use"])
+            ):
+                if len(home_outputs[0][key][system_index]["energy_use"]) > 1:
+                    candidate = copy.deepcopy(data)
+                    for home_type in HomeType:
+                        del candidate[f"{home_type.value}_output"][key][system_index][
+                            "energy_use"
+                        ][energy_index]
+                    yield candidate
+    for end_use in HERSDiagnosticData.other_end_uses:
+        key = f"{end_use.value}_energy"
+        if key in home_outputs[0]:
+            if end_use == EndUse.DEHUMIDIFCATION:
+                candidate = copy.deepcopy(data)
+                for home_type in HomeType:
+                    candidate[f"{home_type.value}_output"].pop(key, None)
+                yield candidate
+            for energy_index in range(len(home_outputs[0][key])):
+                if len(home_outputs[0][key]) > 1:
+                    candidate = copy.deepcopy(data)
+                    for home_type in HomeType:
+                        del candidate[f"{home_type.value}_output"][key][energy_index]
+                    yield candidate
+    # replace each remaining series by a constant with the same total
+    candidate = copy.deepcopy(data)
+    changed = False
+    for series in get_mutable_series(candidate):
+        mean = sum(series) / len(series)
+        if any(value != mean for value in series):
+            series[:] = [mean] * len(series)
+            changed = True
+    if changed:
+        yield candidate
+
+
+def shrink_document(
+    data: Dict, is_failing: Callable[[Dict], bool], max_steps: int = 100
+) -> Dict:
+    # Greedily apply the first simplification that keeps the failure, until none does
+    for _ in range(max_steps):
+        for candidate in get_reductions(data):
+            if is_failing(candidate):
+                data = candidate
+                break
+        else:
+            break
+    return data
+
+
+def run_fuzz(
+    number_of_documents: int = 100,
+    seed: int = 0,
+    output_directory: Optional[str] = None,
+    relative_tolerance: float = 1e-9,
+    absolute_tolerance: float = 1e-9,
+) -> List[Dict]:
+    # Compare the engines on random documents. Each failing document is minimized and,
+    # with an `output_directory`, written as a reproducer named by its seed.
+    failures = []
+    for document_seed in range(seed, seed + number_of_documents):
+        data = generate_document(random.Random(document_seed))
+        mismatches = compare_engines(data, relative_tolerance, absolute_tolerance)
+        if not mismatches:
+            continue
+        data = shrink_document(
+            data,
+            lambda candidate: bool(
+                compare_engines(candidate, relative_tolerance, absolute_tolerance)
+            ),
+        )
+        failure: Dict = {
+            "seed": document_seed,
+            "mismatches": compare_engines(data, relative_tolerance, absolute_tolerance),
+        }
+        if output_directory is not None:
+            os.makedirs(output_directory, exist_ok=True)
+            failure["path"] = os.path.join(
+                output_directory, f"fuzz_{document_seed}.json"
+            )
+            dump_json(data, failure["path"])
+        failures.append(failure)
+    return failures
+
+
+def check_fuzz(
+    number_of_documents: int = 20,
+    seed: int = 0,
+    output_directory: Optional[str] = None,
+):
+    # Raise with the (minimized) mismatches of every failing document
+    failures = run_fuzz(number_of_documents, seed, output_directory)
+    if failures:
+        lines = [
+            f"  seed {failure['seed']}: {mismatch}"
+            for failure in failures
+            for mismatch in failure["mismatches"]
+        ]
+        raise RuntimeError(
+            f"\nEngines differ from the reference on {len(failures)} of "
+            f"{number_of_documents} random documents.\n" + "\n".join(lines)
+        )
+    print(f"{number_of_documents} random documents, no mismatches.")
@@ -1,10 +1,16 @@
 """Package calculating HERS Index."""
 
-from enum import Enum
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import math
+from typing import Dict, List, Optional
 
 from koozie import convert  # type: ignore
-import lattice  # type: ignore
+
+from .emission_factors import get_emission_factors
+from .enumerations import EndUse, FuelType, HomeType
+from .loaders import load
+from .records import EnergyOutput, HomeOutputs, SystemOutput
+from .reductions import get_block_sums, get_dot, get_sum
 
 
 def element_add(list1, list2):
@@ -15,46 +21,12 @@ def element_add(list1, list2):
     return list3
 
 
-def element_product(list1, list2):
-    number_of_elements = len(list1)
-    list3 = [0] * number_of_elements
-    for i in range(number_of_elements):
-        list3[i] = list1[i] * list2[i]
-    return list3
-
-
 class EndUseSystem:
     fuel_type: str
     end_use_type: str
     home_type: str
 
 
-class HomeType(Enum):
-    RATED_HOME = "rated_home"
-    HERS_REFERENCE_HOME = "hers_reference_home"
-    CO2_REFERENCE_HOME = "co2_reference_home"
-    IAD_RATED_HOME = "iad_rated_home"
-    IAD_HERS_REFERENCE_HOME = "iad_hers_reference_home"
-
-
-class EndUse(Enum):
-    SPACE_HEATING = "space_heating"
-    SPACE_COOLING = "space_cooling"
-    WATER_HEATING = "water_heating"
-    LIGHTING_AND_APPLIANCE = "lighting_and_appliance"
-    VENTILATION = "ventilation"
-    DEHUMIDIFCATION = "dehumidification"
-
-
-class FuelType(Enum):
-    ELECTRICITY = "ELECTRICITY"
-    BIOMASS = "BIOMASS"
-    NATURAL_GAS = "NATURAL_GAS"
-    FUEL_OIL_2 = "FUEL_OIL_2"
-    LIQUID_PETROLEUM_GAS = "LIQUID_PETROLEUM_GAS"
-    FOSSIL_FUEL = "FOSSIL_FUEL"
-
-
 class HERSDiagnosticData:
     # Define coefficients 'a' and 'b based on Table 4.1.1(1) in Standard 301 for
     # space heating, space cooling, and water heating
@@ -111,9 +83,13 @@ class HERSDiagnosticData:
     ]
 
     INDEX_TOLERANCE = 0.005
-    NUMBER_OF_TIMESTEPS = 8760
+    NUMBER_OF_TIMESTEPS = 8760  # hourly
+    DEFAULT_TIMESTEP = 60  # minutes
+    PARALLEL_MINIMUM_VALUES = 10_000_000  # see calculate_in_parallel
 
-    def __init__(self, file):
+    def __init__(
+        self, file=None, data: Optional[Dict] = None, single_precision: bool = False
+    ):
         self._hers_index = -1.0
         self._co2_index = -1.0
         self._iaf_rh = -1.0
@@ -198,23 +174,59 @@ class HERSDiagnosticData:
         self.rec_vent_iad_set = False
         self.rec_dh_iad_set = False
 
-        # load data
+        # load data (or use already loaded data, which is never modified), with the
+        # encoding detected by loaders.load and, optionally, time series stored in single
+        # precision (see precision.py for their effect on the indices)
         # determine number of sub-systems for each system type (ex. determine number of heating systems)
-        self.data = lattice.load(file)
+        self.data = (
+            load(file, single_precision=single_precision) if data is None else data
+        )
+        self.single_precision = single_precision
         self.software = self.data["software_name"]
         self.project_name = self.data["project_name"]
+        self.number_of_timesteps = self.get_number_of_timesteps(self.data)
+
+        # typed records of each home type's outputs, with enumerations resolved once, and
+        # the system and energy outputs of each (home type, end use) for direct lookup
+        self.home_outputs: Dict[HomeType, HomeOutputs] = {}
+        self.system_outputs: Dict[tuple[HomeType, EndUse], List[SystemOutput]] = {}
+        self.other_energy_outputs: Dict[
+            tuple[HomeType, EndUse], Optional[List[EnergyOutput]]
+        ] = {}
+        for home_type in HomeType:
+            home_outputs = HomeOutputs(self.data[f"{home_type.value}_output"])
+            self.home_outputs[home_type] = home_outputs
+            self.system_outputs[(home_type, EndUse.SPACE_HEATING)] = (
+                home_outputs.space_heating_system_output
+            )
+            self.system_outputs[(home_type, EndUse.SPACE_COOLING)] = (
+                home_outputs.space_cooling_system_output
+            )
+            self.system_outputs[(home_type, EndUse.WATER_HEATING)] = (
+                home_outputs.water_heating_system_output
+            )
+            self.other_energy_outputs[(home_type, EndUse.LIGHTING_AND_APPLIANCE)] = (
+                home_outputs.lighting_and_appliance_energy
+            )
+            self.other_energy_outputs[(home_type, EndUse.VENTILATION)] = (
+                home_outputs.ventilation_energy
+            )
+            self.other_energy_outputs[(home_type, EndUse.DEHUMIDIFCATION)] = (
+                home_outputs.dehumidification_energy
+            )
 
         self.number_of_systems: Dict[EndUse, int] = {}
         for end_use in self.system_end_uses:
             self.number_of_systems[end_use] = len(
-                self.data["rated_home_output"][f"{end_use.value}_system_output"]
+                self.system_outputs[(HomeType.RATED_HOME, end_use)]
             )
         self.number_of_other_end_uses: Dict[EndUse, int] = {}
         for other_end_use in self.other_end_uses:
-            if f"{other_end_use.value}_energy" in self.data["rated_home_output"]:
-                self.number_of_other_end_uses[other_end_use] = len(
-                    self.data["rated_home_output"][f"{other_end_use.value}_energy"]
-                )
+            energy_outputs = self.other_energy_outputs[
+                (HomeType.RATED_HOME, other_end_use)
+            ]
+            if energy_outputs is not None:
+                self.number_of_other_end_uses[other_end_use] = len(energy_outputs)
 
         # initialize energy use for each fuel type and home type to calculate co2e emissions
         # TODO: there will be several layers to the data cache
@@ -227,7 +239,7 @@ class HERSDiagnosticData:
                 if energy_type == FuelType.ELECTRICITY:
                     self.data_cache[(energy_type, home_type, "hourly")] = [
                         0
-                    ] * self.NUMBER_OF_TIMESTEPS
+                    ] * self.number_of_timesteps
                 else:
                     self.data_cache[(energy_type, home_type, "annual")] = 0
 
@@ -240,17 +252,16 @@ class HERSDiagnosticData:
         self.annual_energy_cache = {}
         self.annual_end_use_energy_cache = {}
         self.annual_fuel_type_energy_cache = {}
-        self.hourly_electricity_use = {
-            HomeType.RATED_HOME: [0] * self.NUMBER_OF_TIMESTEPS,
-            HomeType.CO2_REFERENCE_HOME: [0] * self.NUMBER_OF_TIMESTEPS,
-        }
-        self.hourly_electricity_emission_factors_kwh = self.data[
-            "electricity_co2_emissions_factors"
-        ]
-        self.hourly_electricity_emission_factors_kbtu = convert(
-            self.data["electricity_co2_emissions_factors"],
-            "lb/kWh",
-            "lb/kBtu",
+        self.hourly_electricity_use: Dict[HomeType, List[float]] = {}
+        (
+            self.hourly_electricity_emission_factors_kwh,
+            self.hourly_electricity_emission_factors_kbtu,
+        ) = get_emission_factors(self.data)
+        # number of time steps summed to align the time series with the emission factors
+        # (e.g., 4 for 15-minute data with hourly emission factors)
+        self.emission_factor_block_size = self.get_block_size(
+            self.number_of_timesteps,
+            len(self.hourly_electricity_emission_factors_kwh),
         )
 
     @property
@@ -860,19 +871,15 @@ class HERSDiagnosticData:
         # EEC_x for rated home
         # EEC_r for reference home
         # Retrieve energy efficiency coefficient for each system type and sub-system type
-        return self.data[f"{home_type.value}_output"][f"{end_use.value}_system_output"][
+        return self.system_outputs[(home_type, end_use)][
             system_index
-        ]["equipment_efficiency_coefficient"]
+        ].equipment_efficiency_coefficient
 
     def get_system_fuel_type(
         self, home_type: HomeType, end_use: EndUse, system_index: int
     ):
         # Retrieve fuel type
-        return FuelType(
-            self.data[f"{home_type.value}_output"][f"{end_use.value}_system_output"][
-                system_index
-            ]["primary_fuel_type"]
-        )
+        return self.system_outputs[(home_type, end_use)][system_index].primary_fuel_type
 
     def get_system_energy_consumption(
         self, home_type: HomeType, end_use: EndUse, system_index: int
@@ -880,15 +887,14 @@ class HERSDiagnosticData:
         # EC_x for rated home
         # EC_r for reference home
         # Retrieve energy consumption for each system type and sub-system type
-        energy_consumption = 0
-        for energy_use in self.data[f"{home_type.value}_output"][
-            f"{end_use.value}_system_output"
-        ][system_index]["energy_use"]:
-            energy_consumption += self.get_system_end_use_annual_energy(
-                home_type, end_use, FuelType(energy_use["fuel_type"]), system_index
+        return math.fsum(
+            self.get_system_end_use_annual_energy(
+                home_type, end_use, energy_use.fuel_type, system_index
             )
-
-        return energy_consumption
+            for energy_use in self.system_outputs[(home_type, end_use)][
+                system_index
+            ].energy_use
+        )
 
     def get_normalized_energy_consumption(
         self,
@@ -917,11 +923,7 @@ class HERSDiagnosticData:
 
     def get_system_loads(self, home_type: HomeType, end_use: EndUse, system_index: int):
         # REUL
-        return sum(
-            self.data[f"{home_type.value}_output"][f"{end_use.value}_system_output"][
-                system_index
-            ]["load"]
-        )
+        return get_sum(self.system_outputs[(home_type, end_use)][system_index].load)
 
     def get_normalized_modified_load(
         self, home_type: HomeType, end_use: EndUse, system_index: int
@@ -947,32 +949,34 @@ class HERSDiagnosticData:
         return reul * nec_x / ec_r
 
     def get_end_use_energy_consumption(self, home_type: HomeType, end_use: EndUse):
-        end_use_total = 0
-        for system_index in range(self.number_of_systems[end_use]):
-            end_use_total += self.get_normalized_modified_load(
-                home_type, end_use, system_index
-            )
-        return end_use_total
+        return math.fsum(
+            self.get_normalized_modified_load(home_type, end_use, system_index)
+            for system_index in range(self.number_of_systems[end_use])
+        )
 
     def get_total_normalized_modified_load(self, home_type: HomeType):
         # TnML = nMEUL_HEAT + nMEUL_COOL + nMEUL_HW + EC_LA + EC_VENT + EC_DH
         if home_type == HomeType.RATED_HOME:
-            return (
-                self.nmeul_heat
-                + self.nmeul_cool
-                + self.nmeul_hw
-                + self.ec_la
-                + self.ec_vent
-                + self.ec_dh
+            return math.fsum(
+                [
+                    self.nmeul_heat,
+                    self.nmeul_cool,
+                    self.nmeul_hw,
+                    self.ec_la,
+                    self.ec_vent,
+                    self.ec_dh,
+                ]
             )
         elif home_type == HomeType.IAD_RATED_HOME:
-            return (
-                self.nmeul_heat_iad
-                + self.nmeul_cool_iad
-                + self.nmeul_hw_iad
-                + self.ec_la_iad
-                + self.ec_vent_iad
-                + self.ec_dh_iad
+            return math.fsum(
+                [
+                    self.nmeul_heat_iad,
+                    self.nmeul_cool_iad,
+                    self.nmeul_hw_iad,
+                    self.ec_la_iad,
+                    self.ec_vent_iad,
+                    self.ec_dh_iad,
+                ]
             )
         else:
             raise NameError(
@@ -980,31 +984,35 @@ class HERSDiagnosticData:
             )
 
     def get_reference_home_system_load(self, home_type: HomeType, end_use: EndUse):
-        reul_system = 0
-        for system_index in range(self.number_of_systems[end_use]):
-            reul_system += self.get_system_loads(home_type, end_use, system_index)
-        return reul_system
+        return math.fsum(
+            self.get_system_loads(home_type, end_use, system_index)
+            for system_index in range(self.number_of_systems[end_use])
+        )
 
     def get_total_reference_home_load(self, home_type: HomeType):
         # TRL = REUL_HEAT + REUL_COOL + REUL_HW + REC_LA + REC_VENT + REC_DH
 
         if home_type == HomeType.HERS_REFERENCE_HOME:
-            return (
-                self.reul_heat
-                + self.reul_cool
-                + self.reul_hw
-                + self.rec_la
-                + self.rec_vent
-                + self.rec_dh
+            return math.fsum(
+                [
+                    self.reul_heat,
+                    self.reul_cool,
+                    self.reul_hw,
+                    self.rec_la,
+                    self.rec_vent,
+                    self.rec_dh,
+                ]
             )
         elif home_type == HomeType.IAD_HERS_REFERENCE_HOME:
-            return (
-                self.reul_heat_iad
-                + self.reul_cool_iad
-                + self.reul_hw_iad
-                + self.rec_la_iad
-                + self.rec_vent_iad
-                + self.rec_dh_iad
+            return math.fsum(
+                [
+                    self.reul_heat_iad,
+                    self.reul_cool_iad,
+                    self.reul_hw_iad,
+                    self.rec_la_iad,
+                    self.rec_vent_iad,
+                    self.rec_dh_iad,
+                ]
             )
         else:
             raise NameError(
@@ -1028,120 +1036,120 @@ class HERSDiagnosticData:
                 (home_type, end_use, fuel_type, system_index)
             ] = self.get_fuel_energy(
                 fuel_type,
-                self.data[f"{home_type.value}_output"][
-                    f"{end_use.value}_system_output"
-                ][system_index]["energy_use"],
+                self.system_outputs[(home_type, end_use)][system_index].energy_use,
             )
         return self.annual_subsystem_energy_cache[
             (home_type, end_use, fuel_type, system_index)
         ]
 
-    def get_fuel_energy(self, fuel_type: FuelType, energy_uses: List[Dict]):
-        total_energy = 0
-        for energy_use in energy_uses:
-            if fuel_type.value == energy_use["fuel_type"]:
-                total_energy += sum(energy_use["energy"])
-        return total_energy
+    def get_fuel_energy(self, fuel_type: FuelType, energy_uses: List[EnergyOutput]):
+        return math.fsum(
+            get_sum(energy_use.energy)
+            for energy_use in energy_uses
+            if fuel_type == energy_use.fuel_type
+        )
 
     def get_annual_energy(
         self, home_type: HomeType, end_use: EndUse, fuel_type: FuelType
     ):
         if (home_type, end_use, fuel_type) not in self.annual_energy_cache:
-            total_energy = 0
+            total_energy = 0.0
             if end_use in self.system_end_uses:
-                for system_index, energy_data in enumerate(
-                    self.data[f"{home_type.value}_output"][
-                        f"{end_use.value}_system_output"
-                    ]
-                ):
-                    total_energy += self.get_system_end_use_annual_energy(
+                total_energy = math.fsum(
+                    self.get_system_end_use_annual_energy(
                         home_type,
                         end_use,
                         fuel_type,
                         system_index,
                     )
+                    for system_index in range(
+                        len(self.system_outputs[(home_type, end_use)])
+                    )
+                )
             else:  # other end uses
-                if f"{end_use.value}_energy" in self.data[f"{home_type.value}_output"]:
-                    energy_data = self.data[f"{home_type.value}_output"][
-                        f"{end_use.value}_energy"
-                    ]
-                    total_energy += self.get_fuel_energy(fuel_type, energy_data)
+                energy_data = self.other_energy_outputs[(home_type, end_use)]
+                if energy_data is not None:
+                    total_energy = self.get_fuel_energy(fuel_type, energy_data)
             self.annual_energy_cache[(home_type, end_use, fuel_type)] = total_energy
         return self.annual_energy_cache[(home_type, end_use, fuel_type)]
 
     def get_annual_end_use_energy(self, home_type: HomeType, end_use: EndUse):
         if (home_type, end_use) not in self.annual_end_use_energy_cache:
-            total_energy = 0
-            for fuel_type in self.fuel_types:
-                total_energy += self.get_annual_energy(home_type, end_use, fuel_type)
-            self.annual_end_use_energy_cache[(home_type, end_use)] = total_energy
+            self.annual_end_use_energy_cache[(home_type, end_use)] = math.fsum(
+                self.get_annual_energy(home_type, end_use, fuel_type)
+                for fuel_type in self.fuel_types
+            )
         return self.annual_end_use_energy_cache[(home_type, end_use)]
 
     def get_annual_fuel_type_energy(self, home_type: HomeType, fuel_type: FuelType):
         if (home_type, fuel_type) not in self.annual_fuel_type_energy_cache:
-            total_energy = 0
-            for end_use in self.end_uses:
-                total_energy += self.get_annual_energy(home_type, end_use, fuel_type)
-            self.annual_fuel_type_energy_cache[(home_type, fuel_type)] = total_energy
+            self.annual_fuel_type_energy_cache[(home_type, fuel_type)] = math.fsum(
+                self.get_annual_energy(home_type, end_use, fuel_type)
+                for end_use in self.end_uses
+            )
         return self.annual_fuel_type_energy_cache[(home_type, fuel_type)]
 
     def get_hourly_electricity_emissions(self, home_type: HomeType):
-        for end_use in self.end_uses:
-            if end_use in self.system_end_uses:
-                for energy_data in self.data[f"{home_type.value}_output"][
-                    f"{end_use.value}_system_output"
-                ]:
-                    for energy_use in energy_data["energy_use"]:
-                        if energy_use["fuel_type"] == FuelType.ELECTRICITY.value:
-                            self.hourly_electricity_use[home_type] = element_add(
-                                energy_use["energy"],
-                                self.hourly_electricity_use[home_type],
-                            )
-            else:  # other end uses
-                if f"{end_use.value}_energy" in self.data[f"{home_type.value}_output"]:
-                    for energy_use in self.data[f"{home_type.value}_output"][
-                        f"{end_use.value}_energy"
-                    ]:
-                        if energy_use["fuel_type"] == FuelType.ELECTRICITY.value:
-                            self.hourly_electricity_use[home_type] = element_add(
-                                energy_use["energy"],
-                                self.hourly_electricity_use[home_type],
-                            )
+        # Accumulate into a local list and cache it only once complete, so repeated or
+        # concurrent calls never add to shared state
+        if home_type not in self.hourly_electricity_use:
+            hourly_electricity_use = [0.0] * self.number_of_timesteps
+            energy_uses: List[EnergyOutput] = []
+            for end_use in self.end_uses:
+                if end_use in self.system_end_uses:
+                    for energy_data in self.system_outputs[(home_type, end_use)]:
+                        energy_uses += energy_data.energy_use
+                else:  # other end uses
+                    energy_data = self.other_energy_outputs[(home_type, end_use)]
+                    if energy_data is not None:
+                        energy_uses += energy_data
+            for energy_use in energy_uses:
+                if energy_use.fuel_type == FuelType.ELECTRICITY:
+                    hourly_electricity_use = element_add(
+                        energy_use.energy,
+                        hourly_electricity_use,
+                    )
+            self.hourly_electricity_use[home_type] = get_block_sums(
+                hourly_electricity_use, self.emission_factor_block_size
+            )
         return self.hourly_electricity_use[home_type]
 
     def get_annual_hourly_co2_emissions(self, home_type: HomeType):
-        emissions = 0
-        for fuel_type in self.fuel_types:
-            if fuel_type == FuelType.ELECTRICITY:
-                emissions += sum(
-                    element_product(
-                        self.get_hourly_electricity_emissions(home_type),
-                        self.hourly_electricity_emission_factors_kbtu,
-                    )
-                )
-            else:
-                emissions += (
-                    self.get_annual_fuel_type_energy(home_type, fuel_type)
-                    * self.fuel_emission_factors[fuel_type]
-                )
+        # Electricity (net of OPP and battery storage for the Rated Home) plus fossil
+        # fuel emissions, each summed with a single rounding
+        electricity_emissions = [
+            get_dot(
+                self.get_hourly_electricity_emissions(home_type),
+                self.hourly_electricity_emission_factors_kbtu,
+            )
+        ]
         if home_type == HomeType.RATED_HOME:
             if "on_site_power_production" in self.data:
-                emissions += sum(
-                    element_product(
-                        [
-                            -value for value in self.data["on_site_power_production"]
-                        ],  # kWh
+                electricity_emissions.append(
+                    -get_dot(
+                        get_block_sums(
+                            self.data["on_site_power_production"],
+                            self.emission_factor_block_size,
+                        ),  # kWh
                         self.hourly_electricity_emission_factors_kwh,  # lb/kWh
                     )
                 )
             if "battery_storage" in self.data:
-                emissions += sum(
-                    element_product(
-                        self.data["battery_storage"],
+                electricity_emissions.append(
+                    get_dot(
+                        get_block_sums(
+                            self.data["battery_storage"],
+                            self.emission_factor_block_size,
+                        ),
                         self.hourly_electricity_emission_factors_kwh,
                     )
                 )
-        return emissions
+        fossil_fuel_emissions = math.fsum(
+            self.get_annual_fuel_type_energy(home_type, fuel_type)
+            * self.fuel_emission_factors[fuel_type]
+            for fuel_type in self.fossil_fuel_types
+        )
+        return math.fsum(electricity_emissions) + fossil_fuel_emissions
 
     def get_iad_hers_index(self):
         # ERI = TnML_IAD / TRL_IAD
@@ -1176,56 +1184,60 @@ class HERSDiagnosticData:
 
         return (2 / ns) ** (0.12 * self.iad_save)
 
-    def get_fuel_conversion(self, fuel_type: FuelType):
+    @classmethod
+    def get_fuel_conversion(cls, fuel_type: FuelType):
         # If fuel type is a fossil fuel, return 0.4, else return 1
 
-        if fuel_type in self.fossil_fuel_types:
+        if fuel_type in cls.fossil_fuel_types:
             return 0.4
         return 1.0
 
-    def get_sub_system_energy_use(self, energy_use_specs):
-        # Calculate the sub-system energy use, converted into kWh
+    @classmethod
+    def get_number_of_timesteps(cls, data: Dict) -> int:
+        # Number of values of each time series for the declared timestep (minutes)
+        timestep = data.get("timestep", cls.DEFAULT_TIMESTEP)
+        if timestep not in range(1, 61) or 60 % timestep != 0:
+            raise RuntimeError(
+                f"Timestep must be a divisor of 60 minutes, not {timestep}."
+            )
+        return cls.NUMBER_OF_TIMESTEPS * 60 // timestep
 
-        energy_use_hourly = energy_use_specs["energy"]
-        fuel_type = FuelType(energy_use_specs["fuel_type"])
-        return convert(
-            sum(energy_use_hourly) * self.get_fuel_conversion(fuel_type),
-            "kBtu",
-            "kWh",
-        )
+    @staticmethod
+    def get_block_size(number_of_timesteps: int, number_of_values: int) -> int:
+        # Number of time steps per value of a coarser time series (e.g., hourly factors)
+        if number_of_values == 0 or number_of_timesteps % number_of_values != 0:
+            raise RuntimeError(
+                f"{number_of_values} values cannot be aligned with {number_of_timesteps} time steps."
+            )
+        return number_of_timesteps // number_of_values
 
     def get_total_energy_use_rated_home(self):
-        # calculate total energy use from the rated home
-
-        teu = 0
-        for end_use, number_of_systems in self.number_of_systems.items():
-            number_of_systems = len(
-                self.data["rated_home_output"][f"{end_use.value}_system_output"]
+        # calculate total energy use from the rated home (kWh) from the annual energy
+        # of each end use and fuel type (biomass has no emission factor but is counted)
+
+        return math.fsum(
+            convert(
+                self.get_annual_energy(HomeType.RATED_HOME, end_use, fuel_type)
+                * self.get_fuel_conversion(fuel_type),
+                "kBtu",
+                "kWh",
             )
-            for system_index in range(number_of_systems):
-                for energy_use_specs in self.data["rated_home_output"][
-                    f"{end_use.value}_system_output"
-                ][system_index]["energy_use"]:
-                    teu += self.get_sub_system_energy_use(energy_use_specs)
-        for other_end_use, number_of_systems in self.number_of_other_end_uses.items():
-            for energy_use_specs in self.data["rated_home_output"][
-                f"{other_end_use.value}_energy"
-            ]:
-                teu += self.get_sub_system_energy_use(energy_use_specs)
-        return teu
+            for end_use in self.end_uses
+            for fuel_type in self.fuel_types + [FuelType.BIOMASS]
+        )
 
     def get_battery_storage_charge_discharge(self):
         # Calculate net annual battery storage losses of the rated home
 
         if "battery_storage" in self.data:
-            return sum(self.data["battery_storage"])
+            return get_sum(self.data["battery_storage"])
         return 0.0
 
     def get_on_site_power_production(self):
         # Calculate on-site power production (OPP)
 
         if "on_site_power_production" in self.data:
-            return sum(self.data["on_site_power_production"])
+            return get_sum(self.data["on_site_power_production"])
         return 0.0
 
     def check_index_mismatch(
@@ -1253,6 +1265,163 @@ class HERSDiagnosticData:
         self.verify_hers_index()
         self.verify_carbon_index()
 
+    def verify_fast(self, audit_fraction: float = 0.0):
+        # Verify from the embedded annual aggregates when they are present and match
+        # the document's systems, otherwise from the hourly data. A deterministic sample
+        # of `audit_fraction` of the files is also audited against the hourly data.
+        from .aggregates import (
+            annual_aggregates_match,
+            calculate_intermediaries,
+            is_sampled_for_audit,
+            load_home_aggregates,
+        )
+
+        # the checksum and the aggregates were calculated from the double precision values
+        if audit_fraction > 0.0 and self.single_precision:
+            raise RuntimeError(
+                f"""\n{self.project_name} annual aggregates cannot be audited against time series stored in single precision."""
+            )
+        if annual_aggregates_match(self.data):
+            annual_aggregates = self.data["annual_aggregates"]
+            aggregates = {
+                home_type: load_home_aggregates(
+                    annual_aggregates[f"{home_type.value}_aggregates"]
+                )
+                for home_type in HomeType
+            }
+            self.set_intermediaries(calculate_intermediaries(self.data, aggregates))
+            if is_sampled_for_audit(
+                annual_aggregates["hourly_data_checksum"], audit_fraction
+            ):
+                self.audit_annual_aggregates()
+        self.verify()
+
+    def audit_annual_aggregates(self):
+        # Check the embedded annual aggregates against the hourly data
+        from .aggregates import (
+            aggregate_home_output,
+            calculate_intermediaries,
+            get_hourly_data_checksum,
+            load_home_aggregates,
+        )
+
+        annual_aggregates = self.data["annual_aggregates"]
+        if (
+            get_hourly_data_checksum(self.data)
+            != annual_aggregates["hourly_data_checksum"]
+        ):
+            raise RuntimeError(
+                f"""\n{self.project_name} annual aggregates checksum does not match the hourly data."""
+            )
+        embedded = calculate_intermediaries(
+            self.data,
+            {
+                home_type: load_home_aggregates(
+                    annual_aggregates[f"{home_type.value}_aggregates"]
+                )
+                for home_type in HomeType
+            },
+        )
+        hourly = calculate_intermediaries(
+            self.data,
+            {
+                home_type: aggregate_home_output(
+                    self.data[f"{home_type.value}_output"],
+                    home_type in self.co2_home_types,
+                    self.number_of_timesteps,
+                )
+                for home_type in HomeType
+            },
+        )
+        mismatches = [
+            name
+            for name, value in hourly.items()
+            if not math.isclose(embedded[name], value, rel_tol=1e-9, abs_tol=1e-9)
+        ]
+        if mismatches:
+            raise RuntimeError(
+                f"""\n{self.project_name} annual aggregates do not match the hourly data: {", ".join(mismatches)}"""
+            )
+
+    def calculate_in_parallel(
+        self,
+        max_workers: Optional[int] = None,
+        minimum_values: int = PARALLEL_MINIMUM_VALUES,
+    ) -> Dict:
+        # Opt-in for large inputs (e.g., multifamily models with many systems or
+        # sub-hourly time series): the five home types are aggregated on a thread pool,
+        # overlapping in numpy's reductions, which release the GIL. Documents with fewer
+        # than `minimum_values` time series values are aggregated serially, as a home
+        # type of a typical hourly document takes about a millisecond, less than handing
+        # it to a thread. The intermediaries are stored through the property setters.
+        from .aggregates import (
+            aggregate_home_output,
+            calculate_intermediaries,
+            get_number_of_values,
+        )
+
+        arguments = {
+            home_type: (
+                self.data[f"{home_type.value}_output"],
+                home_type in self.co2_home_types,
+                self.number_of_timesteps,
+            )
+            for home_type in HomeType
+        }
+        if get_number_of_values(self.data) < minimum_values:
+            aggregates = {
+                home_type: aggregate_home_output(*home_arguments)
+                for home_type, home_arguments in arguments.items()
+            }
+        else:
+            with ThreadPoolExecutor(
+                max_workers=max_workers or len(HomeType)
+            ) as executor:
+                futures = {
+                    home_type: executor.submit(aggregate_home_output, *home_arguments)
+                    for home_type, home_arguments in arguments.items()
+                }
+                aggregates = {
+                    home_type: future.result() for home_type, future in futures.items()
+                }
+        self.set_intermediaries(calculate_intermediaries(self.data, aggregates))
+        return self.get_hers_index_intermediaries()
+
+    def set_intermediaries(self, intermediaries: Dict):
+        for name, value in intermediaries.items():
+            setattr(self, name, value)
+
+    def evaluate_standards(self, versions: Optional[List[str]] = None) -> Dict:
+        # Intermediaries under several versions of the standard's coefficients (see
+        # standards.add_standard), side by side, from one aggregation pass
+        from .standards import evaluate_standards
+
+        return evaluate_standards(self.data, versions)
+
+    def get_breakdowns(self, periods: Optional[Dict] = None) -> Dict:
+        # Monthly (and, with time-of-use `periods` masks, time-of-use) energy, loads and
+        # emissions of each home type (see breakdowns.py)
+        from .breakdowns import get_monthly_breakdowns, get_time_of_use_breakdowns
+
+        breakdowns = {"monthly": get_monthly_breakdowns(self.data)}
+        if periods is not None:
+            breakdowns["time_of_use"] = get_time_of_use_breakdowns(self.data, periods)
+        return breakdowns
+
+    def get_data_frame(self, long_form: bool = False):
+        # pandas DataFrame of the time series: one column per series (home type, end
+        # use, system, fuel type, quantity) or, in long form, one row per series and
+        # time step
+        from .frames import get_long_frame, get_wide_frame
+
+        return get_long_frame(self.data) if long_form else get_wide_frame(self.data)
+
+    def evaluate(self) -> Dict:
+        # Re-entrant evaluation: all values are calculated by a fresh instance sharing the
+        # read-only loaded data, so this instance's caches are never filled or read and
+        # the result does not depend on any earlier calls
+        return type(self)(data=self.data).get_hers_index_intermediaries()
+
     def get_hers_index_intermediaries(self) -> Dict:
         return {
             "hers_index": self.hers_index,
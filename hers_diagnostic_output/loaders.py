@@ -0,0 +1,277 @@
+"""Loaders for plain, compressed and binary encodings of diagnostic output documents."""
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional, faster JSON parsing
+    orjson = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # optional, only needed for zstd compressed files
+    zstandard = None
+
+try:
+    import cbor2  # type: ignore
+except ImportError:  # optional, only needed for CBOR files
+    cbor2 = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # optional, only needed for MessagePack files
+    msgpack = None
+
+try:
+    import yaml  # type: ignore
+except ImportError:  # optional, only needed for YAML files
+    yaml = None
+
+SIGNATURE_LENGTH = 8
+# Assumed size ratio of decompressed to compressed documents when the decompressed size
+# is not recorded in the file
+COMPRESSION_RATIO = 3.0
+
+# Content kept in double precision whatever the precision of the time series: the
+# embedded annual aggregates are sums, not time series
+DOUBLE_PRECISION_KEYS = ["annual_aggregates"]
+
+# RFC 8746 typed array tags of float arrays: (item type code, big endian)
+CBOR_FLOAT_ARRAY_TAGS = {
+    81: ("f", True),
+    82: ("d", True),
+    85: ("f", False),
+    86: ("d", False),
+}
+
+
+class Compression:
+    # Compressions are detected by their signature (leading bytes), whatever the name
+    # of the file
+    def __init__(
+        self,
+        name: str,
+        signature: bytes,
+        extensions: List[str],
+        open_stream: Callable[[BinaryIO], BinaryIO],
+    ):
+        self.name = name
+        self.signature = signature
+        self.extensions = extensions
+        self.open_stream = open_stream
+
+
+class Format:
+    # Formats are identified by the extension of the file (without any compression
+    # extension), or else by `detect`, given the leading bytes of the document
+    def __init__(
+        self,
+        name: str,
+        extensions: List[str],
+        decode: Callable[[BinaryIO], Dict],
+        detect: Callable[[bytes], bool],
+    ):
+        self.name = name
+        self.extensions = extensions
+        self.decode = decode
+        self.detect = detect
+
+
+def open_zstd(stream: BinaryIO) -> BinaryIO:
+    if zstandard is None:
+        raise RuntimeError("Reading zstd compressed files requires zstandard.")
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream))
+
+
+def decode_json(stream: BinaryIO) -> Dict:
+    if orjson is not None:
+        return orjson.loads(stream.read())
+    return json.load(stream)
+
+
+def decode_cbor_tag(*arguments):
+    # Typed float arrays are read straight into a buffer. cbor2 versions differ in the
+    # arguments of the hook ((decoder, tag) or (tag, immutable)).
+    tag = next(
+        argument for argument in arguments if isinstance(argument, cbor2.CBORTag)
+    )
+    if tag.tag not in CBOR_FLOAT_ARRAY_TAGS:
+        return tag
+    type_code, big_endian = CBOR_FLOAT_ARRAY_TAGS[tag.tag]
+    values = array(type_code, tag.value)
+    if big_endian != (sys.byteorder == "big"):
+        values.byteswap()
+    return values if type_code == "d" else array("d", values)
+
+
+def decode_cbor(stream: BinaryIO) -> Dict:
+    if cbor2 is None:
+        raise RuntimeError("Reading CBOR files requires cbor2.")
+    return cbor2.load(stream, tag_hook=decode_cbor_tag)
+
+
+def decode_msgpack(stream: BinaryIO) -> Dict:
+    if msgpack is None:
+        raise RuntimeError("Reading MessagePack files requires msgpack.")
+    return msgpack.unpack(stream, raw=False)
+
+
+def decode_yaml(stream: BinaryIO) -> Dict:
+    if yaml is None:
+        raise RuntimeError("Reading YAML files requires PyYAML.")
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def is_json(signature: bytes) -> bool:
+    return signature.lstrip(b" \t\r\n\xef\xbb\xbf").startswith(b"{")
+
+
+def is_cbor(signature: bytes) -> bool:
+    # A map, possibly after the self-described CBOR tag
+    return signature[:3] == b"\xd9\xd9\xf7" or 0xA0 <= signature[0] <= 0xBF
+
+
+def is_msgpack(signature: bytes) -> bool:
+    return 0x80 <= signature[0] <= 0x8F or signature[0] in (0xDE, 0xDF)
+
+
+compressions: Dict[str, Compression] = {}
+formats: Dict[str, Format] = {}
+
+
+def add_compression(compression: Compression):
+    compressions[compression.name] = compression
+
+
+def add_format(document_format: Format):
+    formats[document_format.name] = document_format
+
+
+add_compression(
+    Compression(
+        "gzip", b"\x1f\x8b", [".gz"], lambda stream: gzip.GzipFile(fileobj=stream)
+    )
+)
+add_compression(Compression("zstd", b"\x28\xb5\x2f\xfd", [".zst"], open_zstd))
+add_compression(Compression("bzip2", b"BZh", [".bz2"], bz2.BZ2File))
+add_compression(Compression("xz", b"\xfd7zXZ\x00", [".xz"], lzma.LZMAFile))
+add_format(Format("json", [".json"], decode_json, is_json))
+add_format(Format("cbor", [".cbor"], decode_cbor, is_cbor))
+add_format(Format("msgpack", [".msgpack", ".mpk"], decode_msgpack, is_msgpack))
+add_format(Format("yaml", [".yaml", ".yml"], decode_yaml, lambda signature: False))
+
+
+def get_signature(stream: BinaryIO) -> bytes:
+    # Leading bytes of the stream, without consuming them
+    return stream.peek(SIGNATURE_LENGTH)[:SIGNATURE_LENGTH]  # type: ignore
+
+
+def get_format_extension(name: str) -> str:
+    # Extension of the document format, e.g., ".json" for "home.json.gz"
+    suffixes = [suffix.lower() for suffix in Path(name).suffixes]
+    if suffixes and any(suffixes[-1] in c.extensions for c in compressions.values()):
+        suffixes = suffixes[:-1]
+    return suffixes[-1] if suffixes else ""
+
+
+def is_supported(name) -> bool:
+    extension = get_format_extension(str(name))
+    return any(
+        extension in document_format.extensions for document_format in formats.values()
+    )
+
+
+def get_format(extension: str, signature: bytes) -> Optional[Format]:
+    for document_format in formats.values():
+        if extension in document_format.extensions:
+            return document_format
+    for document_format in formats.values():
+        if document_format.detect(signature):
+            return document_format
+    return None
+
+
+def get_decoded_size(path) -> int:
+    # Estimated size (bytes) of the document once decompressed, without decompressing
+    # it: gzip records it (modulo 2^32) in its last four bytes
+    size = os.path.getsize(path)
+    with open(path, "rb") as input_file:
+        signature = input_file.read(SIGNATURE_LENGTH)
+        if not any(
+            signature.startswith(compression.signature)
+            for compression in compressions.values()
+        ):
+            return size
+        if signature.startswith(compressions["gzip"].signature) and size >= 4:
+            input_file.seek(-4, os.SEEK_END)
+            decoded_size = int.from_bytes(input_file.read(4), "little")
+            if decoded_size >= size:
+                return decoded_size
+    return int(size * COMPRESSION_RATIO)
+
+
+def to_numeric_arrays(content, single_precision: bool = False):
+    # Lists of numbers (e.g., time series) become array("d") buffers, which take a
+    # quarter of the memory of float lists and are read by numpy without conversion.
+    # With `single_precision`, they are stored as array("f") (half the memory again);
+    # their values are read back as Python floats or converted to float64 arrays, so
+    # sums still accumulate in double precision.
+    type_code = "f" if single_precision else "d"
+    if isinstance(content, dict):
+        for key, value in content.items():
+            content[key] = to_numeric_arrays(
+                value, single_precision and key not in DOUBLE_PRECISION_KEYS
+            )
+    elif isinstance(content, array):
+        if content.typecode != type_code:
+            return array(type_code, content)
+    elif isinstance(content, list) and content:
+        if type(content[0]) in (float, int):
+            try:
+                return array(type_code, content)
+            except TypeError:  # not only numbers
+                pass
+        for index, value in enumerate(content):
+            content[index] = to_numeric_arrays(value, single_precision)
+    return content
+
+
+def load_stream(
+    stream: BinaryIO,
+    name: str = "",
+    numeric_arrays: bool = True,
+    single_precision: bool = False,
+) -> Dict:
+    # Decompress (streaming) and decode a binary stream. `name` (e.g., the file name)
+    # identifies the format by its extension when it has one.
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)  # type: ignore
+    signature = get_signature(stream)
+    for compression in compressions.values():
+        if signature.startswith(compression.signature):
+            stream = compression.open_stream(stream)
+            signature = get_signature(stream)
+            break
+    if not signature:
+        raise RuntimeError(f"'{name}' is empty.")
+    document_format = get_format(get_format_extension(name), signature)
+    if document_format is None:
+        raise RuntimeError(f"Unsupported encoding of '{name}'.")
+    content = document_format.decode(stream)
+    if not numeric_arrays:
+        return content
+    return to_numeric_arrays(content, single_precision)
+
+
+def load(path, numeric_arrays: bool = True, single_precision: bool = False) -> Dict:
+    with open(path, "rb") as input_file:
+        return load_stream(input_file, str(path), numeric_arrays, single_precision)
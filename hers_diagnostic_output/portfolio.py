@@ -0,0 +1,354 @@
+"""Mergeable streaming statistics of verification results across a portfolio of homes."""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .batch import dump_json, load_json
+
+DEFAULT_METRICS = [
+    "hers_index",
+    "co2_index",
+    "pe_frac",
+    "iaf_rh",
+    "nmeul_heat",
+    "nmeul_cool",
+    "nmeul_hw",
+    "reul_heat",
+    "reul_cool",
+    "reul_hw",
+    "ec_la",
+    "ec_vent",
+    "ec_dh",
+]
+DEFAULT_GROUP_FIELDS = ["weather_data_state", "software_name"]
+DEFAULT_HISTOGRAM_WIDTHS = {
+    "hers_index": 1.0,
+    "co2_index": 1.0,
+    "pe_frac": 0.01,
+    "iaf_rh": 0.01,
+}
+DEFAULT_HISTOGRAM_WIDTH = 1000.0  # kBtu, for the end use loads
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+class Moments:
+    # Count, mean, variance (Welford), minimum and maximum; merged with Chan's formula
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "Moments"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def get_variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "minimum": self.minimum if self.count else None,
+            "maximum": self.maximum if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "Moments":
+        moments = cls()
+        moments.count = content["count"]
+        moments.mean = content["mean"]
+        moments.m2 = content["m2"]
+        if moments.count:
+            moments.minimum = content["minimum"]
+            moments.maximum = content["maximum"]
+        return moments
+
+
+class QuantileSketch:
+    # Logarithmically binned sketch (as in DDSketch): every quantile is returned within
+    # `relative_accuracy` of a value of the data. Sketches with the same accuracy merge
+    # exactly by adding bin counts.
+    MINIMUM_VALUE = 1e-12  # smaller magnitudes are counted as zero
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def get_index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def get_value(self, index: int) -> float:
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, value: float):
+        self.count += 1
+        if abs(value) < self.MINIMUM_VALUE:
+            self.zero_count += 1
+            return
+        bins = self.positive if value > 0 else self.negative
+        index = self.get_index(abs(value))
+        bins[index] = bins.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise RuntimeError("Quantile sketches with different accuracies.")
+        for bins, other_bins in [
+            (self.positive, other.positive),
+            (self.negative, other.negative),
+        ]:
+            for index, count in other_bins.items():
+                bins[index] = bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def get_quantile(self, quantile: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = quantile * (self.count - 1)
+        cumulative = 0
+        for index in sorted(self.negative, reverse=True):
+            cumulative += self.negative[index]
+            if cumulative > rank:
+                return -self.get_value(index)
+        cumulative += self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            cumulative += self.positive[index]
+            if cumulative > rank:
+                return self.get_value(index)
+        return self.get_value(max(self.positive))
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(index): count for index, count in self.positive.items()},
+            "negative": {str(index): count for index, count in self.negative.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "QuantileSketch":
+        sketch = cls(content["relative_accuracy"])
+        sketch.positive = {
+            int(index): count for index, count in content["positive"].items()
+        }
+        sketch.negative = {
+            int(index): count for index, count in content["negative"].items()
+        }
+        sketch.zero_count = content["zero_count"]
+        sketch.count = content["count"]
+        return sketch
+
+
+class Histogram:
+    # Sparse fixed-width histogram; bin i counts values in [i * width, (i + 1) * width)
+    def __init__(self, width: float):
+        self.width = width
+        self.bins: Dict[int, int] = {}
+
+    def add(self, value: float):
+        index = math.floor(value / self.width)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "Histogram"):
+        if other.width != self.width:
+            raise RuntimeError("Histograms with different bin widths.")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def get_bins(self) -> List[Tuple[float, int]]:
+        # (lower edge, count) in ascending order
+        return [(index * self.width, self.bins[index]) for index in sorted(self.bins)]
+
+    def to_dict(self) -> Dict:
+        return {
+            "width": self.width,
+            "bins": {str(index): count for index, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "Histogram":
+        histogram = cls(content["width"])
+        histogram.bins = {int(index): count for index, count in content["bins"].items()}
+        return histogram
+
+
+class MetricSketch:
+    def __init__(self, histogram_width: float, relative_accuracy: float = 0.01):
+        self.moments = Moments()
+        self.quantiles = QuantileSketch(relative_accuracy)
+        self.histogram = Histogram(histogram_width)
+
+    def add(self, value: float):
+        self.moments.add(value)
+        self.quantiles.add(value)
+        self.histogram.add(value)
+
+    def merge(self, other: "MetricSketch"):
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        self.histogram.merge(other.histogram)
+
+    def summarize(self, percentiles: Sequence[float]) -> Dict:
+        return {
+            "count": self.moments.count,
+            "mean": self.moments.mean,
+            "standard_deviation": math.sqrt(self.moments.get_variance()),
+            "minimum": self.moments.minimum if self.moments.count else None,
+            "maximum": self.moments.maximum if self.moments.count else None,
+            "percentiles": {
+                percentile: self.quantiles.get_quantile(percentile / 100)
+                for percentile in percentiles
+            },
+            "histogram": self.histogram.get_bins(),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "moments": self.moments.to_dict(),
+            "quantiles": self.quantiles.to_dict(),
+            "histogram": self.histogram.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "MetricSketch":
+        sketch = cls(content["histogram"]["width"])
+        sketch.moments = Moments.from_dict(content["moments"])
+        sketch.quantiles = QuantileSketch.from_dict(content["quantiles"])
+        sketch.histogram = Histogram.from_dict(content["histogram"])
+        return sketch
+
+
+class PortfolioStatistics:
+    # Sketches of each metric per group (e.g., per state and software). Records are not
+    # retained, so memory depends on the number of groups and bins only. Statistics from
+    # parallel workers or separate runs are combined with `merge`.
+    GROUP_SEPARATOR = "|"
+
+    def __init__(
+        self,
+        metrics: Optional[List[str]] = None,
+        group_fields: Optional[List[str]] = None,
+        histogram_widths: Optional[Dict[str, float]] = None,
+        relative_accuracy: float = 0.01,
+    ):
+        self.metrics = metrics or DEFAULT_METRICS
+        self.group_fields = group_fields or DEFAULT_GROUP_FIELDS
+        self.histogram_widths = {**DEFAULT_HISTOGRAM_WIDTHS, **(histogram_widths or {})}
+        self.relative_accuracy = relative_accuracy
+        self.groups: Dict[str, Dict[str, MetricSketch]] = {}
+
+    def get_group_key(self, record: Dict) -> str:
+        return self.GROUP_SEPARATOR.join(
+            str(record.get(field)) for field in self.group_fields
+        )
+
+    def get_group(self, key: str) -> Dict[str, MetricSketch]:
+        if key not in self.groups:
+            self.groups[key] = {
+                metric: MetricSketch(
+                    self.histogram_widths.get(metric, DEFAULT_HISTOGRAM_WIDTH),
+                    self.relative_accuracy,
+                )
+                for metric in self.metrics
+            }
+        return self.groups[key]
+
+    def add(self, record: Dict, values: Dict[str, float]):
+        # `record` provides the group fields; `values` the metrics (missing metrics and
+        # non-finite values are skipped)
+        group = self.get_group(self.get_group_key(record))
+        for metric in self.metrics:
+            value = values.get(metric)
+            if value is not None and math.isfinite(value):
+                group[metric].add(value)
+
+    def add_result(self, result: Dict):
+        # Consume a passing result of batch.verify_file
+        if result.get("status") == "pass" and result.get("intermediaries"):
+            self.add(result, result["intermediaries"])
+
+    def add_results(self, results: Iterable[Dict]):
+        for result in results:
+            self.add_result(result)
+
+    def merge(self, other: "PortfolioStatistics"):
+        if other.metrics != self.metrics or other.group_fields != self.group_fields:
+            raise RuntimeError("Portfolio statistics with different metrics or groups.")
+        for key, other_group in other.groups.items():
+            group = self.get_group(key)
+            for metric, sketch in other_group.items():
+                group[metric].merge(sketch)
+
+    def summarize(
+        self, percentiles: Sequence[float] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Dict]:
+        return {
+            key: {
+                metric: sketch.summarize(percentiles)
+                for metric, sketch in group.items()
+            }
+            for key, group in sorted(self.groups.items())
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "metrics": self.metrics,
+            "group_fields": self.group_fields,
+            "histogram_widths": self.histogram_widths,
+            "relative_accuracy": self.relative_accuracy,
+            "groups": {
+                key: {metric: sketch.to_dict() for metric, sketch in group.items()}
+                for key, group in self.groups.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "PortfolioStatistics":
+        statistics = cls(
+            content["metrics"],
+            content["group_fields"],
+            content["histogram_widths"],
+            content["relative_accuracy"],
+        )
+        statistics.groups = {
+            key: {
+                metric: MetricSketch.from_dict(sketch)
+                for metric, sketch in group.items()
+            }
+            for key, group in content["groups"].items()
+        }
+        return statistics
+
+    def save(self, path):
+        dump_json(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path) -> "PortfolioStatistics":
+        return cls.from_dict(load_json(path))
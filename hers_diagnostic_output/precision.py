@@ -0,0 +1,79 @@
+"""Effect of storing time series in single precision on the HERS and CO2 indices."""
+
+import copy
+from typing import Dict, List, Optional
+
+from .aggregates import aggregate_home_outputs, calculate_intermediaries
+from .batch import map_files
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import load, to_numeric_arrays
+
+INDEX_NAMES = ["hers_index", "co2_index"]
+
+
+def get_precision_effect(data: Dict) -> Dict[str, Dict[str, float]]:
+    # Indices of the document as given (double precision) and with its time series
+    # rounded to single precision (sums accumulate in double precision either way). The
+    # relative difference moves the verification ratio by the same amount, so
+    # `tolerance_fraction` is the share of INDEX_TOLERANCE single precision uses up.
+    single_precision_data = to_numeric_arrays(copy.deepcopy(data), True)
+    double_precision = calculate_intermediaries(data, aggregate_home_outputs(data))
+    single_precision = calculate_intermediaries(
+        single_precision_data, aggregate_home_outputs(single_precision_data)
+    )
+    effect = {}
+    for name in INDEX_NAMES:
+        relative_difference = abs(
+            (single_precision[name] - double_precision[name]) / double_precision[name]
+        )
+        effect[name] = {
+            "double_precision": double_precision[name],
+            "single_precision": single_precision[name],
+            "relative_difference": relative_difference,
+            "tolerance_fraction": relative_difference
+            / HERSDiagnosticData.INDEX_TOLERANCE,
+        }
+    return effect
+
+
+def check_precision_file(path) -> Dict:
+    # Check a single file, recording errors instead of raising so one bad file does
+    # not abort a batch
+    result: Dict = {"path": str(path), "status": "pass", "message": ""}
+    try:
+        result["effect"] = get_precision_effect(load(path))
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def check_precision_files(
+    paths: List, max_workers: Optional[int] = None, use_threads: bool = False
+) -> List[Dict]:
+    return map_files(check_precision_file, paths, max_workers, use_threads)
+
+
+def summarize_precision(results: List[Dict], margin: float = 0.01) -> Dict:
+    # Worst case of each index over the checked files. Single precision is considered
+    # safe for files like these if it uses at most `margin` of INDEX_TOLERANCE.
+    checked = [result for result in results if result["status"] == "pass"]
+    summary: Dict = {
+        "files": len(checked),
+        "errors": len(results) - len(checked),
+        "tolerance": HERSDiagnosticData.INDEX_TOLERANCE,
+        "margin": margin,
+    }
+    for name in INDEX_NAMES:
+        summary[name] = None
+        for result in checked:
+            effect = result["effect"][name]
+            worst = summary[name]
+            if worst is None or (
+                effect["relative_difference"] > worst["relative_difference"]
+            ):
+                summary[name] = {"path": result["path"], **effect}
+    summary["safe"] = bool(checked) and all(
+        summary[name]["tolerance_fraction"] <= margin for name in INDEX_NAMES
+    )
+    return summary
@@ -0,0 +1,75 @@
+"""Typed records of the schema data groups used by the HERS Index calculation.
+
+Generated from the schema by `doit generate_records`. Do not edit.
+"""
+
+from typing import Dict, List, Optional
+
+from .enumerations import FuelType
+
+
+class EnergyOutput:
+    __slots__ = (
+        "fuel_type",
+        "energy",
+    )
+
+    def __init__(self, data: Dict):
+        self.fuel_type: FuelType = FuelType(data["fuel_type"])
+        self.energy: List[float] = data["energy"]
+
+
+class SystemOutput:
+    __slots__ = (
+        "primary_fuel_type",
+        "equipment_efficiency_coefficient",
+        "load",
+        "energy_use",
+    )
+
+    def __init__(self, data: Dict):
+        self.primary_fuel_type: FuelType = FuelType(data["primary_fuel_type"])
+        self.equipment_efficiency_coefficient: float = data[
+            "equipment_efficiency_coefficient"
+        ]
+        self.load: Optional[List[float]] = data["load"] if "load" in data else None
+        self.energy_use: List[EnergyOutput] = [
+            EnergyOutput(item) for item in data["energy_use"]
+        ]
+
+
+class HomeOutputs:
+    __slots__ = (
+        "conditioned_space_temperature",
+        "space_heating_system_output",
+        "space_cooling_system_output",
+        "water_heating_system_output",
+        "lighting_and_appliance_energy",
+        "ventilation_energy",
+        "dehumidification_energy",
+    )
+
+    def __init__(self, data: Dict):
+        self.conditioned_space_temperature: List[float] = data[
+            "conditioned_space_temperature"
+        ]
+        self.space_heating_system_output: List[SystemOutput] = [
+            SystemOutput(item) for item in data["space_heating_system_output"]
+        ]
+        self.space_cooling_system_output: List[SystemOutput] = [
+            SystemOutput(item) for item in data["space_cooling_system_output"]
+        ]
+        self.water_heating_system_output: List[SystemOutput] = [
+            SystemOutput(item) for item in data["water_heating_system_output"]
+        ]
+        self.lighting_and_appliance_energy: List[EnergyOutput] = [
+            EnergyOutput(item) for item in data["lighting_and_appliance_energy"]
+        ]
+        self.ventilation_energy: List[EnergyOutput] = [
+            EnergyOutput(item) for item in data["ventilation_energy"]
+        ]
+        self.dehumidification_energy: Optional[List[EnergyOutput]] = (
+            [EnergyOutput(item) for item in data["dehumidification_energy"]]
+            if "dehumidification_energy" in data
+            else None
+        )
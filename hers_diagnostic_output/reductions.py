@@ -0,0 +1,30 @@
+"""Reductions of time series shared by the calculation engines."""
+
+import numpy as np
+
+
+def to_array(values) -> np.ndarray:
+    # Contiguous float64 array (without a copy when the values already are one), so both
+    # engines reduce identical memory layouts and get identical results
+    return np.ascontiguousarray(values, dtype=float)
+
+
+def get_sum(values) -> float:
+    # numpy's pairwise summation: an error growing with log(n) rather than n, in a
+    # vectorized loop that releases the GIL. Exact rounding (math.fsum) is kept for the
+    # few scalar terms combined into the intermediaries.
+    return float(np.sum(to_array(values)))
+
+
+def get_dot(values, weights) -> float:
+    # Pairwise sum of the element-wise products (np.dot may use BLAS kernels whose
+    # results depend on memory alignment)
+    return float(np.sum(to_array(values) * to_array(weights)))
+
+
+def get_block_sums(values, block_size: int) -> np.ndarray:
+    # Sums of consecutive blocks of `block_size` values (e.g., 15-minute values to hourly)
+    values = to_array(values)
+    if block_size == 1:
+        return values
+    return values.reshape(-1, block_size).sum(axis=1)
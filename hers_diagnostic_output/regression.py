@@ -0,0 +1,197 @@
+"""Regression checks of a corpus of diagnostic files against golden intermediaries."""
+
+import math
+import os
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from .batch import dump_json, load_json
+from .hers_diagnostic_output import HERSDiagnosticData
+
+
+def run_file(path) -> Dict:
+    # Load and calculate one file, measuring wall time (s) and the peak memory (bytes)
+    # allocated while doing so. Tracing must already be started.
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    intermediaries = HERSDiagnosticData(path).get_hers_index_intermediaries()
+    elapsed = time.perf_counter() - start
+    return {
+        "intermediaries": intermediaries,
+        "time": elapsed,
+        "peak_memory": tracemalloc.get_traced_memory()[1] - memory_before,
+    }
+
+
+def run_corpus(paths: List) -> Dict:
+    # Files are run one at a time in this process so the measurements are comparable
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        total_peak_memory = 0
+        files = {}
+        for path in paths:
+            files[path] = run_file(path)
+            total_peak_memory = max(
+                total_peak_memory, tracemalloc.get_traced_memory()[1] - memory_before
+            )
+        return {
+            "files": files,
+            "time": time.perf_counter() - start,
+            "peak_memory": total_peak_memory,
+        }
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def create_golden_results(
+    paths: List,
+    golden_path,
+    time_margin: float = 5.0,
+    memory_margin: float = 1.5,
+):
+    # Store the intermediaries of each file (by path relative to the golden file) and
+    # budgets set to the measured time and memory times a margin
+    golden_directory = os.path.dirname(os.path.abspath(golden_path))
+    results = run_corpus([os.path.abspath(path) for path in paths])
+    files = {
+        os.path.relpath(path, golden_directory): result["intermediaries"]
+        for path, result in results["files"].items()
+    }
+    file_results = list(results["files"].values())
+    dump_json(
+        {
+            "files": files,
+            "budgets": {
+                "file_time": max(result["time"] for result in file_results)
+                * time_margin,
+                "file_peak_memory": int(
+                    max(result["peak_memory"] for result in file_results)
+                    * memory_margin
+                ),
+                "total_time": results["time"] * time_margin,
+                "total_peak_memory": int(results["peak_memory"] * memory_margin),
+            },
+        },
+        golden_path,
+    )
+
+
+def compare_intermediaries(
+    golden: Dict[str, float],
+    calculated: Dict[str, float],
+    relative_tolerance: float,
+    absolute_tolerance: float,
+) -> List[str]:
+    mismatches = []
+    for name, golden_value in golden.items():
+        if name not in calculated:
+            mismatches.append(f"{name}: missing")
+        elif not math.isclose(
+            calculated[name],
+            golden_value,
+            rel_tol=relative_tolerance,
+            abs_tol=absolute_tolerance,
+        ):
+            mismatches.append(
+                f"{name}: calculated {calculated[name]!r}, golden {golden_value!r}"
+            )
+    return mismatches
+
+
+def run_regression(
+    golden_path,
+    relative_tolerance: float = 1e-9,
+    absolute_tolerance: float = 1e-9,
+    budgets: Optional[Dict[str, float]] = None,
+    enforce_file_time_budgets: bool = False,
+) -> Dict:
+    # Compare every intermediary of every golden file and check the budgets stored in
+    # the golden file (overridden by `budgets`). Returns a report with a list of failures.
+    # The wall time of a single file is noisy on shared machines, so exceeding its budget
+    # is only a warning unless `enforce_file_time_budgets`; the total time budget and
+    # the memory budgets always fail.
+    golden = load_json(golden_path)
+    if not golden:
+        raise RuntimeError(
+            f"Golden results not found: {golden_path} (create them with create_golden_results)"
+        )
+    budgets = {**golden.get("budgets", {}), **(budgets or {})}
+    golden_directory = os.path.dirname(os.path.abspath(golden_path))
+    paths = {name: os.path.join(golden_directory, name) for name in golden["files"]}
+    results = run_corpus(list(paths.values()))
+
+    failures: List[str] = []
+    warnings: List[str] = []
+    exceeded_file_time = failures if enforce_file_time_budgets else warnings
+    files = {}
+    for name, path in paths.items():
+        result = results["files"][path]
+        mismatches = compare_intermediaries(
+            golden["files"][name],
+            result["intermediaries"],
+            relative_tolerance,
+            absolute_tolerance,
+        )
+        failures += [f"{name}: {mismatch}" for mismatch in mismatches]
+        for measure, budget, exceeded in [
+            ("time", budgets.get("file_time"), exceeded_file_time),
+            ("peak_memory", budgets.get("file_peak_memory"), failures),
+        ]:
+            if budget is not None and result[measure] > budget:
+                exceeded.append(
+                    f"{name}: {measure} {result[measure]:.6g} exceeds budget {budget:.6g}"
+                )
+        files[name] = {
+            "time": result["time"],
+            "peak_memory": result["peak_memory"],
+            "mismatches": mismatches,
+        }
+    for measure, budget in [
+        ("time", budgets.get("total_time")),
+        ("peak_memory", budgets.get("total_peak_memory")),
+    ]:
+        if budget is not None and results[measure] > budget:
+            failures.append(
+                f"total {measure} {results[measure]:.6g} exceeds budget {budget:.6g}"
+            )
+    return {
+        "files": files,
+        "time": results["time"],
+        "peak_memory": results["peak_memory"],
+        "budgets": budgets,
+        "failures": failures,
+        "warnings": warnings,
+    }
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"{len(report['files'])} files, {report['time']:.3f} s, peak memory {report['peak_memory'] / 2**20:.1f} MiB"
+    ]
+    for name, result in report["files"].items():
+        status = "FAIL" if result["mismatches"] else "ok"
+        lines.append(
+            f"  {status:4} {name}: {result['time']:.3f} s, {result['peak_memory'] / 2**20:.1f} MiB"
+        )
+    if report["warnings"]:
+        lines.append(f"{len(report['warnings'])} warnings:")
+        lines += [f"  {warning}" for warning in report["warnings"]]
+    if report["failures"]:
+        lines.append(f"{len(report['failures'])} failures:")
+        lines += [f"  {failure}" for failure in report["failures"]]
+    return "\n".join(lines)
+
+
+def check_regression(golden_path, **options):
+    # Raise with the full report if any intermediary or budget regressed
+    report = run_regression(golden_path, **options)
+    if report["failures"]:
+        raise RuntimeError(f"\nRegression check failed.\n{format_report(report)}")
+    print(format_report(report))
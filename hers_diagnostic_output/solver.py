@@ -0,0 +1,286 @@
+"""Inverse solver for the equipment efficiency, OPP or battery storage reaching a target index."""
+
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from koozie import convert  # type: ignore
+
+from .aggregates import (
+    HomeAggregates,
+    aggregate_home_outputs,
+    calculate_intermediaries,
+    get_fuel_coefficients,
+    get_hourly_emission_factors,
+    get_index_adjustment_factors,
+    get_series_co2_emissions,
+)
+from .enumerations import EndUse, FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .reductions import get_sum
+
+INDEX_NAMES = ("hers_index", "co2_index")
+SCALED_SERIES = ("on_site_power_production", "battery_storage")
+KBTU_TO_MBTU = convert(1.0, "kBtu", "MBtu")
+
+
+def find_bracket(
+    function: Callable[[float], float],
+    lower: float,
+    upper: float,
+    start: float,
+    number_of_points: int = 33,
+) -> Tuple[float, float]:
+    # Sign-changing sub-interval of a geometric grid over [lower, upper] closest to
+    # `start`, for functions that are not monotonic over the whole range
+    points = np.geomspace(lower, upper, number_of_points)
+    values = np.array([function(point) for point in points])
+    changes = np.nonzero(np.sign(values[:-1]) != np.sign(values[1:]))[0]
+    if changes.size == 0:
+        raise RuntimeError(
+            f"Target is not reachable between {lower:.6g} and {upper:.6g}."
+        )
+    distances = np.abs(np.log(np.sqrt(points[changes] * points[changes + 1]) / start))
+    change = changes[np.argmin(distances)]
+    return float(points[change]), float(points[change + 1])
+
+
+def find_root(
+    function: Callable[[float], float],
+    lower: float,
+    upper: float,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100,
+) -> float:
+    # Illinois (modified regula falsi) root-find within a sign-changing bracket
+    f_lower = function(lower)
+    f_upper = function(upper)
+    if f_lower == 0.0:
+        return lower
+    if f_upper == 0.0:
+        return upper
+    if f_lower * f_upper > 0.0:
+        raise RuntimeError(
+            f"Target is not reachable between {lower:.6g} and {upper:.6g}."
+        )
+    side = 0
+    root = lower
+    for _ in range(max_iterations):
+        root = (lower * f_upper - upper * f_lower) / (f_upper - f_lower)
+        f_root = function(root)
+        if abs(f_root) <= tolerance or abs(upper - lower) <= tolerance * abs(root):
+            return root
+        if f_root * f_upper > 0.0:
+            upper, f_upper = root, f_root
+            if side == -1:
+                f_lower /= 2
+            side = -1
+        else:
+            lower, f_lower = root, f_root
+            if side == 1:
+                f_upper /= 2
+            side = 1
+    return root
+
+
+class IndexModel:
+    # Incremental evaluator of the HERS Index and CO2 Index. The document is aggregated
+    # once; changing a rated system's EEC or scaling OPP or battery storage only updates
+    # the affected annual terms, so each evaluation is O(1).
+    #
+    # A rated system's EEC is changed with its loads fixed, so its energy use (every fuel,
+    # annual and hourly) scales with EEC_x,original / EEC_x.
+
+    def __init__(
+        self, data: Dict, aggregates: Optional[Dict[HomeType, HomeAggregates]] = None
+    ):
+        self.data = data
+        self.aggregates = (
+            aggregate_home_outputs(data) if aggregates is None else aggregates
+        )
+        self.intermediaries = calculate_intermediaries(data, self.aggregates)
+        (
+            self.hourly_emission_factors_kwh,
+            self.hourly_emission_factors_kbtu,
+        ) = get_hourly_emission_factors(data)
+        self.series_emissions = {
+            name: get_series_co2_emissions(data[name], self.hourly_emission_factors_kwh)
+            if name in data
+            else 0.0
+            for name in SCALED_SERIES
+        }
+        self.system_emissions: Dict[Tuple[EndUse, int], float] = {}
+
+    def get_system_emissions(self, end_use: EndUse, system_index: int) -> float:
+        # Annual emissions of one Rated Home system (electricity and fossil fuels)
+        if (end_use, system_index) not in self.system_emissions:
+            system_output = self.data["rated_home_output"][
+                f"{end_use.value}_system_output"
+            ][system_index]
+            emissions = 0.0
+            for energy_use in system_output["energy_use"]:
+                fuel_type = FuelType(energy_use["fuel_type"])
+                if fuel_type == FuelType.ELECTRICITY:
+                    emissions += get_series_co2_emissions(
+                        energy_use["energy"], self.hourly_emission_factors_kbtu
+                    )
+                elif fuel_type in HERSDiagnosticData.fuel_emission_factors:
+                    emissions += (
+                        get_sum(energy_use["energy"])
+                        * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+                    )
+            self.system_emissions[(end_use, system_index)] = emissions
+        return self.system_emissions[(end_use, system_index)]
+
+    def get_normalized_modified_load_change(
+        self,
+        home_type: HomeType,
+        end_use: EndUse,
+        system_index: int,
+        equipment_efficiency_coefficient: float,
+    ) -> float:
+        reference_home_type = (
+            HomeType.HERS_REFERENCE_HOME
+            if home_type == HomeType.RATED_HOME
+            else HomeType.IAD_HERS_REFERENCE_HOME
+        )
+        rated_system = self.aggregates[home_type].systems[end_use][system_index]
+        reference_system = self.aggregates[reference_home_type].systems[end_use][
+            system_index
+        ]
+        coefficients = get_fuel_coefficients(end_use, rated_system.primary_fuel_type)
+        eec_r = reference_system.equipment_efficiency_coefficient
+
+        def get_normalized_modified_load(eec_x: float, ec_x: float) -> float:
+            # nMEUL = REUL * EC_x * (a * EEC_x - b) * (EEC_r / EEC_x) / EC_r
+            return (
+                reference_system.load
+                * ec_x
+                * (coefficients["a"] * eec_x - coefficients["b"])
+                * (eec_r / eec_x)
+                / reference_system.energy_consumption
+            )
+
+        eec_0 = rated_system.equipment_efficiency_coefficient
+        return get_normalized_modified_load(
+            equipment_efficiency_coefficient,
+            rated_system.energy_consumption * eec_0 / equipment_efficiency_coefficient,
+        ) - get_normalized_modified_load(eec_0, rated_system.energy_consumption)
+
+    def evaluate(
+        self,
+        equipment_efficiency_coefficients: Optional[
+            Dict[Tuple[EndUse, int], float]
+        ] = None,
+        on_site_power_production_scale: float = 1.0,
+        battery_storage_scale: float = 1.0,
+        apply_to_iad: bool = True,
+    ) -> Dict[str, float]:
+        # HERS Index and CO2 Index with the given Rated Home system EECs, keyed by
+        # (end use, system index), and OPP and battery storage scaled. With
+        # `apply_to_iad`, the same EECs are used for the IAD Rated Home systems.
+        # The changes are summed with the base values with a single rounding
+        # (math.fsum), as in the full calculation
+        base = self.intermediaries
+        tnml = [base["tnml"]]
+        tnml_iad = [base["tnml_iad"]]
+        teu = [base["teu"]]
+        aco2 = [base["aco2"]]
+        for (end_use, system_index), eec_x in (
+            equipment_efficiency_coefficients or {}
+        ).items():
+            rated_system = self.aggregates[HomeType.RATED_HOME].systems[end_use][
+                system_index
+            ]
+            energy_change = rated_system.equipment_efficiency_coefficient / eec_x - 1.0
+            tnml.append(
+                self.get_normalized_modified_load_change(
+                    HomeType.RATED_HOME, end_use, system_index, eec_x
+                )
+            )
+            if apply_to_iad:
+                tnml_iad.append(
+                    self.get_normalized_modified_load_change(
+                        HomeType.IAD_RATED_HOME, end_use, system_index, eec_x
+                    )
+                )
+            teu.append(
+                energy_change
+                * KBTU_TO_MBTU
+                * math.fsum(
+                    fuel_energy * HERSDiagnosticData.get_fuel_conversion(fuel_type)
+                    for fuel_type, fuel_energy in rated_system.energy.items()
+                )
+            )
+            aco2.append(
+                energy_change * self.get_system_emissions(end_use, system_index)
+            )
+
+        opp = base["opp"] * on_site_power_production_scale
+        bsl = base["bsl"] * battery_storage_scale
+        aco2 += [
+            (1.0 - on_site_power_production_scale)
+            * self.series_emissions["on_site_power_production"],
+            (battery_storage_scale - 1.0) * self.series_emissions["battery_storage"],
+        ]
+
+        tnml_total = math.fsum(tnml)
+        teu_total = math.fsum(teu)
+        pe_frac = (teu_total - opp + bsl) / teu_total
+        iad_save = (100 - math.fsum(tnml_iad) / base["trl_iad"] * 100) / 100
+        iaf_cfa, iaf_nbr, iaf_ns = get_index_adjustment_factors(self.data, iad_save)
+        iaf_rh = iaf_cfa * iaf_nbr * iaf_ns
+        return {
+            "hers_index": pe_frac * tnml_total / (base["trl"] * iaf_rh) * 100,
+            "co2_index": math.fsum(aco2) / (base["arco2"] * iaf_rh) * 100,
+        }
+
+    def solve_scale(self, target: float, series: str, index: str = "hers_index"):
+        # Scale on `on_site_power_production` or `battery_storage` reaching the target.
+        # Both indices are affine in either scale, so the solution is closed-form.
+        if series not in SCALED_SERIES:
+            raise NameError(f"'series' must be one of {', '.join(SCALED_SERIES)}.")
+        if index not in INDEX_NAMES:
+            raise NameError(f"'index' must be one of {', '.join(INDEX_NAMES)}.")
+        scale_argument = f"{series}_scale"
+        at_zero = self.evaluate(**{scale_argument: 0.0})[index]
+        slope = self.evaluate(**{scale_argument: 1.0})[index] - at_zero
+        if slope == 0.0:
+            raise RuntimeError(f"{index} does not depend on {series}.")
+        return (target - at_zero) / slope
+
+    def solve_equipment_efficiency(
+        self,
+        target: float,
+        end_use: EndUse,
+        system_index: int = 0,
+        index: str = "hers_index",
+        bracket: Optional[Tuple[float, float]] = None,
+        apply_to_iad: bool = True,
+    ) -> float:
+        # EEC of a Rated Home system reaching the target index, by a bracketed root-find
+        # on the incremental evaluator. The default bracket spans a factor of ten around
+        # the current EEC; if the index is not monotonic in it, the solution closest to
+        # the current EEC is returned.
+        if index not in INDEX_NAMES:
+            raise NameError(f"'index' must be one of {', '.join(INDEX_NAMES)}.")
+        eec_0 = (
+            self.aggregates[HomeType.RATED_HOME]
+            .systems[end_use][system_index]
+            .equipment_efficiency_coefficient
+        )
+        if bracket is None:
+            bracket = (eec_0 / 10, eec_0 * 10)
+
+        def get_index_difference(eec_x: float) -> float:
+            return (
+                self.evaluate(
+                    {(end_use, system_index): eec_x}, apply_to_iad=apply_to_iad
+                )[index]
+                - target
+            )
+
+        return find_root(
+            get_index_difference,
+            *find_bracket(get_index_difference, *bracket, eec_0),
+        )
@@ -0,0 +1,350 @@
+"""Versioned coefficients of the standard, evaluated side by side in one pass."""
+
+import functools
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from koozie import convert  # type: ignore
+
+from .aggregates import (
+    TNML_TERMS,
+    TRL_TERMS,
+    HomeAggregates,
+    aggregate_home_outputs,
+    get_electricity_co2_emissions,
+    get_hourly_emission_factors,
+)
+from .batch import map_files
+from .enumerations import EndUse, FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+from .loaders import load
+from .reductions import get_sum
+
+DEFAULT_VERSION = "default"
+
+
+class StandardCoefficients:
+    # Coefficients that change between editions and addenda of the standard
+    def __init__(
+        self,
+        version: str,
+        fuel_coefficients: Dict[Tuple[EndUse, FuelType], Dict[str, float]],
+        fuel_emission_factors: Dict[FuelType, float],  # lb/kBtu
+        fossil_fuel_conversion: float = 0.4,
+        iaf_cfa_exponent: float = 0.304,
+        iaf_nbr_coefficient: float = 0.069,
+        iaf_ns_exponent: float = 0.12,
+    ):
+        self.version = version
+        self.fuel_coefficients = fuel_coefficients
+        self.fuel_emission_factors = fuel_emission_factors
+        self.fossil_fuel_conversion = fossil_fuel_conversion
+        self.iaf_cfa_exponent = iaf_cfa_exponent
+        self.iaf_nbr_coefficient = iaf_nbr_coefficient
+        self.iaf_ns_exponent = iaf_ns_exponent
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "fuel_coefficients": [
+                {"end_use": end_use.value, "fuel_type": fuel_type.value, **coefficients}
+                for (end_use, fuel_type), coefficients in self.fuel_coefficients.items()
+            ],
+            "fuel_emission_factors": {
+                fuel_type.value: factor
+                for fuel_type, factor in self.fuel_emission_factors.items()
+            },
+            "fossil_fuel_conversion": self.fossil_fuel_conversion,
+            "iaf_cfa_exponent": self.iaf_cfa_exponent,
+            "iaf_nbr_coefficient": self.iaf_nbr_coefficient,
+            "iaf_ns_exponent": self.iaf_ns_exponent,
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "StandardCoefficients":
+        return cls(
+            content["version"],
+            {
+                # missing coefficients are reported by check_standard
+                (EndUse(entry["end_use"]), FuelType(entry["fuel_type"])): {
+                    name: entry[name] for name in ["a", "b"] if name in entry
+                }
+                for entry in content["fuel_coefficients"]
+            },
+            {
+                FuelType(fuel_type): factor
+                for fuel_type, factor in content["fuel_emission_factors"].items()
+            },
+            content["fossil_fuel_conversion"],
+            content["iaf_cfa_exponent"],
+            content["iaf_nbr_coefficient"],
+            content["iaf_ns_exponent"],
+        )
+
+
+standards: Dict[str, StandardCoefficients] = {
+    DEFAULT_VERSION: StandardCoefficients(
+        DEFAULT_VERSION,
+        HERSDiagnosticData.fuel_coefficients,
+        HERSDiagnosticData.fuel_emission_factors,
+    )
+}
+
+
+def check_standard(coefficients: StandardCoefficients):
+    # Every version defines the coefficients of the default one, so versions can be
+    # evaluated side by side
+    for key in HERSDiagnosticData.fuel_coefficients:
+        end_use, fuel_type = key
+        for name in ["a", "b"]:
+            if name not in coefficients.fuel_coefficients.get(key, {}):
+                raise ValueError(
+                    f"Standard '{coefficients.version}' has no '{name}' coefficient "
+                    f"for ({end_use.value}, {fuel_type.value})."
+                )
+    for fuel_type in HERSDiagnosticData.fossil_fuel_types:
+        if fuel_type not in coefficients.fuel_emission_factors:
+            raise ValueError(
+                f"Standard '{coefficients.version}' has no emission factor for "
+                f"{fuel_type.value}."
+            )
+
+
+def add_standard(coefficients: StandardCoefficients):
+    check_standard(coefficients)
+    standards[coefficients.version] = coefficients
+
+
+def get_coefficient_arrays(versions: List[StandardCoefficients]) -> Dict:
+    # Each coefficient as an array with one element per version (all versions have
+    # the coefficients of the default one, see check_standard)
+    return {
+        "fuel_coefficients": {
+            key: {
+                name: np.array(
+                    [
+                        coefficients.fuel_coefficients[key][name]
+                        for coefficients in versions
+                    ]
+                )
+                for name in ["a", "b"]
+            }
+            for key in HERSDiagnosticData.fuel_coefficients
+        },
+        "fuel_emission_factors": {
+            fuel_type: np.array(
+                [
+                    coefficients.fuel_emission_factors[fuel_type]
+                    for coefficients in versions
+                ]
+            )
+            for fuel_type in HERSDiagnosticData.fossil_fuel_types
+        },
+        **{
+            name: np.array([getattr(coefficients, name) for coefficients in versions])
+            for name in [
+                "fossil_fuel_conversion",
+                "iaf_cfa_exponent",
+                "iaf_nbr_coefficient",
+                "iaf_ns_exponent",
+            ]
+        },
+    }
+
+
+def get_sums(terms: List) -> np.ndarray:
+    # Correctly rounded sum of the terms (scalars or arrays) for each version
+    columns = np.atleast_2d(np.array(np.broadcast_arrays(*terms), dtype=float).T)
+    return np.array([math.fsum(column) for column in columns])
+
+
+def get_end_use_loads(
+    rated_home: HomeAggregates, reference_home: HomeAggregates, arrays: Dict
+) -> Dict[str, np.ndarray]:
+    # As aggregates.get_end_use_loads, with the 'a' and 'b' coefficients per version
+    loads = {}
+    for end_use, name in zip(
+        HERSDiagnosticData.system_end_uses, ["heat", "cool", "hw"]
+    ):
+        rated_systems = rated_home.systems[end_use]
+        reference_systems = reference_home.systems[end_use]
+        terms = []
+        for system_index in range(len(rated_systems)):
+            rated_system = rated_systems[system_index]
+            reference_system = reference_systems[system_index]
+            fuel_type = rated_system.primary_fuel_type
+            if fuel_type in HERSDiagnosticData.fossil_fuel_types:
+                fuel_type = FuelType.FOSSIL_FUEL
+            coefficients = arrays["fuel_coefficients"][(end_use, fuel_type)]
+            eec_x = rated_system.equipment_efficiency_coefficient
+            eec_r = reference_system.equipment_efficiency_coefficient
+            nec_x = (
+                rated_system.energy_consumption
+                * (coefficients["a"] * eec_x - coefficients["b"])
+                * (eec_r / eec_x)
+            )
+            terms.append(
+                reference_system.load * nec_x / reference_system.energy_consumption
+            )
+        loads[f"nmeul_{name}"] = get_sums(terms or [0.0])
+        loads[f"reul_{name}"] = math.fsum(
+            reference_systems[system_index].load
+            for system_index in range(len(rated_systems))
+        )
+    for end_use, name in zip(HERSDiagnosticData.other_end_uses, ["la", "vent", "dh"]):
+        loads[f"ec_{name}"] = rated_home.get_end_use_energy(end_use)
+        loads[f"rec_{name}"] = reference_home.get_end_use_energy(end_use)
+    return loads
+
+
+def get_total_energy_use(home: HomeAggregates, arrays: Dict) -> np.ndarray:
+    # TEU (kWh) with the fossil fuel conversion of each version
+    return get_sums(
+        [
+            convert(
+                fuel_energy
+                * (
+                    arrays["fossil_fuel_conversion"]
+                    if fuel_type in HERSDiagnosticData.fossil_fuel_types
+                    else 1.0
+                ),
+                "kBtu",
+                "kWh",
+            )
+            for end_use in HERSDiagnosticData.end_uses
+            for fuel_type, fuel_energy in home.energy[end_use].items()
+        ]
+        or [0.0]
+    )
+
+
+def calculate_versioned_intermediaries(
+    data: Dict,
+    aggregates: Dict[HomeType, HomeAggregates],
+    versions: List[StandardCoefficients],
+) -> Dict[str, np.ndarray]:
+    # aggregates.calculate_intermediaries for all versions at once: each intermediary
+    # is an array with one element per version (the "default" version gives the same
+    # values as calculate_intermediaries)
+    arrays = get_coefficient_arrays(versions)
+    number_of_versions = len(versions)
+    hourly_emission_factors = get_hourly_emission_factors(data)
+
+    loads = get_end_use_loads(
+        aggregates[HomeType.RATED_HOME],
+        aggregates[HomeType.HERS_REFERENCE_HOME],
+        arrays,
+    )
+    loads_iad = get_end_use_loads(
+        aggregates[HomeType.IAD_RATED_HOME],
+        aggregates[HomeType.IAD_HERS_REFERENCE_HOME],
+        arrays,
+    )
+    tnml = get_sums([loads[name] for name in TNML_TERMS])
+    trl = get_sums([loads[name] for name in TRL_TERMS])
+    tnml_iad = get_sums([loads_iad[name] for name in TNML_TERMS])
+    trl_iad = get_sums([loads_iad[name] for name in TRL_TERMS])
+
+    teu = convert(
+        get_total_energy_use(aggregates[HomeType.RATED_HOME], arrays), "kWh", "MBtu"
+    )
+    opp = convert(get_sum(data.get("on_site_power_production", [])), "kWh", "MBtu")
+    bsl = convert(get_sum(data.get("battery_storage", [])), "kWh", "MBtu")
+    pe_frac = (teu - opp + bsl) / teu
+
+    iad_save = (100 - tnml_iad / trl_iad * 100) / 100
+    iaf_cfa = (2400 / data["conditioned_floor_area"]) ** (
+        arrays["iaf_cfa_exponent"] * iad_save
+    )
+    iaf_nbr = 1 + (
+        arrays["iaf_nbr_coefficient"] * iad_save * (data["number_of_bedrooms"] - 3)
+    )
+    iaf_ns = (2 / data["number_of_stories"]) ** (arrays["iaf_ns_exponent"] * iad_save)
+    iaf_rh = iaf_cfa * iaf_nbr * iaf_ns
+
+    aco2, arco2 = [
+        get_electricity_co2_emissions(
+            data, home_type, aggregates[home_type], *hourly_emission_factors
+        )
+        + get_sums(
+            [
+                aggregates[home_type].get_fuel_type_energy(fuel_type)
+                * arrays["fuel_emission_factors"][fuel_type]
+                for fuel_type in HERSDiagnosticData.fossil_fuel_types
+            ]
+        )
+        for home_type in [HomeType.RATED_HOME, HomeType.CO2_REFERENCE_HOME]
+    ]
+
+    intermediaries = {
+        "hers_index": pe_frac * tnml / (trl * iaf_rh) * 100,
+        "co2_index": aco2 / (arco2 * iaf_rh) * 100,
+        "iaf_rh": iaf_rh,
+        "aco2": aco2,
+        "arco2": arco2,
+        "pe_frac": pe_frac,
+        "tnml": tnml,
+        "trl": trl,
+        "teu": teu,
+        "opp": opp,
+        "bsl": bsl,
+        "iad_save": iad_save,
+        "iaf_cfa": iaf_cfa,
+        "iaf_nbr": iaf_nbr,
+        "iaf_ns": iaf_ns,
+        "tnml_iad": tnml_iad,
+        "trl_iad": trl_iad,
+    }
+    for terms in [TNML_TERMS, TRL_TERMS]:
+        for name in terms:
+            intermediaries[name] = loads[name]
+        for name in terms:
+            intermediaries[f"{name}_iad"] = loads_iad[name]
+    return {
+        name: np.broadcast_to(np.asarray(value, dtype=float), (number_of_versions,))
+        for name, value in intermediaries.items()
+    }
+
+
+def evaluate_standards(
+    data: Dict, versions: Optional[List[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    # Intermediaries of each version (all registered versions by default), from a
+    # single aggregation of the document
+    coefficients = [standards[version] for version in (versions or list(standards))]
+    intermediaries = calculate_versioned_intermediaries(
+        data, aggregate_home_outputs(data), coefficients
+    )
+    return {
+        version.version: {
+            name: float(values[index]) for name, values in intermediaries.items()
+        }
+        for index, version in enumerate(coefficients)
+    }
+
+
+def evaluate_file(path, versions: Optional[List[str]] = None) -> Dict:
+    # Evaluate a single file, recording errors instead of raising so one bad file does
+    # not abort a batch
+    result: Dict = {"path": str(path), "status": "pass", "message": ""}
+    try:
+        result["versions"] = evaluate_standards(load(path), versions)
+    except Exception as error:
+        result["status"] = "error"
+        result["message"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def evaluate_files(
+    paths: List,
+    versions: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+) -> List[Dict]:
+    return map_files(
+        functools.partial(evaluate_file, versions=versions),
+        paths,
+        max_workers,
+        use_threads,
+    )
@@ -0,0 +1,173 @@
+"""Monte Carlo uncertainty analysis of the HERS Index and CO2 Index."""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .aggregates import (
+    HomeAggregates,
+    aggregate_home_outputs,
+    calculate_intermediaries,
+    get_electricity_co2_emissions,
+    get_fuel_coefficients,
+    get_hourly_emission_factors,
+    get_index_adjustment_factors,
+)
+from .enumerations import FuelType, HomeType
+from .hers_diagnostic_output import HERSDiagnosticData
+
+DEFAULT_PERCENTILES = (2.5, 5.0, 25.0, 50.0, 75.0, 95.0, 97.5)
+
+
+def sample_factors(
+    random: np.random.Generator, uncertainty: float, number_of_samples: int
+) -> np.ndarray:
+    # Log-normal multipliers with median 1; `uncertainty` is approximately the relative
+    # standard deviation for small values
+    if uncertainty == 0.0:
+        return np.ones(number_of_samples)
+    return np.exp(random.normal(0.0, uncertainty, number_of_samples))
+
+
+def sample_total_loads(
+    rated_home: HomeAggregates,
+    reference_home: HomeAggregates,
+    random: np.random.Generator,
+    number_of_samples: int,
+    eec_uncertainty: float,
+    load_uncertainty: float,
+):
+    # TnML and TRL for every sample, with independently perturbed EECs of the rated and
+    # reference systems and perturbed reference system loads (REUL)
+    tnml = np.zeros(number_of_samples)
+    trl = np.zeros(number_of_samples)
+    for end_use in HERSDiagnosticData.system_end_uses:
+        reference_systems = reference_home.systems[end_use]
+        for system_index, rated_system in enumerate(rated_home.systems[end_use]):
+            reference_system = reference_systems[system_index]
+            coefficients = get_fuel_coefficients(
+                end_use, rated_system.primary_fuel_type
+            )
+            eec_x = rated_system.equipment_efficiency_coefficient * sample_factors(
+                random, eec_uncertainty, number_of_samples
+            )
+            eec_r = reference_system.equipment_efficiency_coefficient * sample_factors(
+                random, eec_uncertainty, number_of_samples
+            )
+            reul = reference_system.load * sample_factors(
+                random, load_uncertainty, number_of_samples
+            )
+            nec_x = (
+                rated_system.energy_consumption
+                * (coefficients["a"] * eec_x - coefficients["b"])
+                * (eec_r / eec_x)
+            )
+            tnml += reul * nec_x / reference_system.energy_consumption
+            trl += reul
+    for end_use in HERSDiagnosticData.other_end_uses:
+        tnml += rated_home.get_end_use_energy(end_use)
+        trl += reference_home.get_end_use_energy(end_use)
+    return tnml, trl
+
+
+def sample_indices(
+    data: Dict,
+    number_of_samples: int = 10000,
+    eec_uncertainty: float = 0.05,
+    load_uncertainty: float = 0.05,
+    emission_factor_uncertainty: float = 0.1,
+    seed: Optional[int] = None,
+    aggregates: Optional[Dict[HomeType, HomeAggregates]] = None,
+) -> Dict[str, np.ndarray]:
+    # Evaluate the HERS Index and CO2 Index for `number_of_samples` perturbations of the
+    # EECs, reference system loads and emission factors at once. The data is aggregated
+    # once; every sample only varies the annual terms, so the cost is independent of
+    # the hourly data. Uncertainties are relative standard deviations.
+    if aggregates is None:
+        aggregates = aggregate_home_outputs(data)
+    random = np.random.default_rng(seed)
+    nominal = calculate_intermediaries(data, aggregates)
+
+    tnml, trl = sample_total_loads(
+        aggregates[HomeType.RATED_HOME],
+        aggregates[HomeType.HERS_REFERENCE_HOME],
+        random,
+        number_of_samples,
+        eec_uncertainty,
+        load_uncertainty,
+    )
+    tnml_iad, trl_iad = sample_total_loads(
+        aggregates[HomeType.IAD_RATED_HOME],
+        aggregates[HomeType.IAD_HERS_REFERENCE_HOME],
+        random,
+        number_of_samples,
+        eec_uncertainty,
+        load_uncertainty,
+    )
+    iad_save = (100 - tnml_iad / trl_iad * 100) / 100
+    iaf_cfa, iaf_nbr, iaf_ns = get_index_adjustment_factors(data, iad_save)
+    iaf_rh = iaf_cfa * iaf_nbr * iaf_ns
+
+    # Emission factors are shared by the Rated Home and the CO2 Reference Home, so each
+    # sample scales both homes' emissions of a fuel by the same factor
+    hourly_emission_factors = get_hourly_emission_factors(data)
+    fuel_factors = {
+        fuel_type: sample_factors(
+            random, emission_factor_uncertainty, number_of_samples
+        )
+        for fuel_type in HERSDiagnosticData.fuel_types
+    }
+    emissions = {}
+    for home_type in HERSDiagnosticData.co2_home_types:
+        home = aggregates[home_type]
+        electricity_emissions = get_electricity_co2_emissions(
+            data, home_type, home, *hourly_emission_factors
+        )
+        emissions[home_type] = (
+            electricity_emissions * fuel_factors[FuelType.ELECTRICITY]
+        )
+        for fuel_type in HERSDiagnosticData.fossil_fuel_types:
+            emissions[home_type] = emissions[home_type] + (
+                home.get_fuel_type_energy(fuel_type)
+                * HERSDiagnosticData.fuel_emission_factors[fuel_type]
+                * fuel_factors[fuel_type]
+            )
+    aco2 = emissions[HomeType.RATED_HOME]
+    arco2 = emissions[HomeType.CO2_REFERENCE_HOME]
+
+    return {
+        "hers_index": nominal["pe_frac"] * tnml / (trl * iaf_rh) * 100,
+        "co2_index": aco2 / (arco2 * iaf_rh) * 100,
+        "iaf_rh": iaf_rh,
+        "tnml": tnml,
+        "trl": trl,
+        "aco2": aco2,
+        "arco2": arco2,
+    }
+
+
+def summarize_samples(
+    samples: Dict[str, np.ndarray],
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> Dict[str, Dict]:
+    summary = {}
+    for name, values in samples.items():
+        summary[name] = {
+            "mean": float(values.mean()),
+            "standard_deviation": float(values.std()),
+            "percentiles": dict(
+                zip(percentiles, np.percentile(values, percentiles).tolist())
+            ),
+        }
+    return summary
+
+
+def get_index_uncertainty(
+    data: Dict,
+    number_of_samples: int = 10000,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    **uncertainties,
+) -> Dict[str, Dict]:
+    return summarize_samples(
+        sample_indices(data, number_of_samples, **uncertainties), percentiles
+    )
@@ -0,0 +1,324 @@
+"""Resumable verification of many files by several workers sharing a SQLite queue."""
+
+import functools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from .batch import map_files, verify_file
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    path TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+class WorkQueue:
+    # Files are leased to a worker for `lease_duration` seconds, extended by heartbeats.
+    # Leases of workers that died expire and the file is leased again, up to
+    # `max_attempts` times. Results are committed once: the first result of a file
+    # wins, so a file finished before a restart is never verified again. Lease
+    # expiry compares wall clock times, so the clocks of the workers must agree.
+    def __init__(
+        self,
+        database_path,
+        lease_duration: float = 300.0,
+        max_attempts: int = 3,
+        timeout: float = 60.0,
+    ):
+        self.database_path = str(database_path)
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        # Rollback journal (the default) rather than WAL, which is not safe on network
+        # file systems. Writers take the database lock with BEGIN IMMEDIATE.
+        self.connection = sqlite3.connect(
+            self.database_path, timeout=timeout, isolation_level=None
+        )
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def execute(self, *arguments) -> sqlite3.Cursor:
+        return self.connection.execute(*arguments)
+
+    def transaction(self, function, *arguments):
+        self.execute("BEGIN IMMEDIATE")
+        try:
+            value = function(*arguments)
+        except BaseException:
+            self.execute("ROLLBACK")
+            raise
+        self.execute("COMMIT")
+        return value
+
+    def add_files(self, paths: List) -> int:
+        # Files already in the queue keep their state; returns the number added
+        def add():
+            now = time.time()
+            cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO tasks (path, status, updated) VALUES (?, ?, ?)",
+                [(str(path), PENDING, now) for path in paths],
+            )
+            return cursor.rowcount
+
+        return self.transaction(add)
+
+    def expire_leases(self, now: float):
+        # Leases past their expiry are released, or failed if out of attempts
+        self.execute(
+            "UPDATE tasks SET status = ?, result = ?, lease_token = NULL, updated = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (
+                FAILED,
+                json.dumps({"status": "error", "message": "Lease expired."}),
+                now,
+                LEASED,
+                now,
+                self.max_attempts,
+            ),
+        )
+        self.execute(
+            "UPDATE tasks SET status = ?, lease_token = NULL, updated = ? "
+            "WHERE status = ? AND lease_expires < ?",
+            (PENDING, now, LEASED, now),
+        )
+
+    def lease(self, worker_id: str, number_of_files: int = 1) -> List[Tuple[str, str]]:
+        # Returns (path, lease token) of up to `number_of_files` files
+        def lease():
+            now = time.time()
+            self.expire_leases(now)
+            paths = [
+                row[0]
+                for row in self.execute(
+                    "SELECT path FROM tasks WHERE status = ? ORDER BY path LIMIT ?",
+                    (PENDING, number_of_files),
+                )
+            ]
+            leases = [(path, uuid.uuid4().hex) for path in paths]
+            self.connection.executemany(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, "
+                "lease_token = ?, lease_owner = ?, lease_expires = ?, updated = ? "
+                "WHERE path = ?",
+                [
+                    (LEASED, token, worker_id, now + self.lease_duration, now, path)
+                    for path, token in leases
+                ],
+            )
+            return leases
+
+        return self.transaction(lease)
+
+    def heartbeat(self, tokens: List[str]) -> int:
+        # Extends the leases still held; returns their number
+        def heartbeat():
+            now = time.time()
+            return self.connection.executemany(
+                "UPDATE tasks SET lease_expires = ?, updated = ? "
+                "WHERE lease_token = ? AND status = ?",
+                [(now + self.lease_duration, now, token, LEASED) for token in tokens],
+            ).rowcount
+
+        return self.transaction(heartbeat)
+
+    def complete(self, path: str, token: str, result: Dict) -> Optional[str]:
+        # Commits the result only while the file is still leased with `token`: a
+        # worker whose lease expired (whether or not the file was leased again) has its
+        # result discarded. Errors (as opposed to failed verification) are retried while
+        # attempts remain. Returns the new status of the file (PENDING when retried), or
+        # None if the result was discarded.
+        def complete():
+            row = self.execute(
+                "SELECT status, attempts, lease_token FROM tasks WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if row is None or row[0] != LEASED or row[2] != token:
+                return None
+            if result["status"] != "error":
+                status = DONE
+            elif row[1] < self.max_attempts:
+                status = PENDING
+            else:
+                status = FAILED
+            self.execute(
+                "UPDATE tasks SET status = ?, lease_token = NULL, result = ?, "
+                "updated = ? WHERE path = ?",
+                (status, json.dumps(result), time.time(), path),
+            )
+            return status
+
+        return self.transaction(complete)
+
+    def get_next_expiry(self) -> Optional[float]:
+        # Earliest expiry of the leases held, None if no file is leased
+        return self.execute(
+            "SELECT MIN(lease_expires) FROM tasks WHERE status = ?", (LEASED,)
+        ).fetchone()[0]
+
+    def get_unfinished(self) -> List[str]:
+        return [
+            row[0]
+            for row in self.execute(
+                "SELECT path FROM tasks WHERE status IN (?, ?) ORDER BY path",
+                (PENDING, LEASED),
+            )
+        ]
+
+    def get_summary(self) -> Dict[str, int]:
+        summary = {status: 0 for status in (PENDING, LEASED, DONE, FAILED)}
+        for status, count in self.execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+        ):
+            summary[status] = count
+        return summary
+
+    def get_results(self) -> Dict[str, Dict]:
+        # Results of finished files by path
+        return {
+            path: json.loads(result)
+            for path, result in self.execute(
+                "SELECT path, result FROM tasks WHERE status IN (?, ?) ORDER BY path",
+                (DONE, FAILED),
+            )
+        }
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def keep_alive(
+    queue_arguments: Tuple, tokens: List[str], interval: float, stop: threading.Event
+):
+    # Heartbeats from a separate connection while the worker's thread verifies a file
+    queue = WorkQueue(*queue_arguments)
+    try:
+        while not stop.wait(interval):
+            queue.heartbeat(tokens)
+    finally:
+        queue.close()
+
+
+def run_worker(
+    database_path,
+    worker_id: Optional[str] = None,
+    lease_duration: float = 300.0,
+    max_attempts: int = 3,
+    heartbeat_interval: Optional[float] = None,
+    max_files: Optional[int] = None,
+    poll_interval: Optional[float] = None,
+    **options,
+) -> Dict:
+    # Verify files from the queue until all are finished (or `max_files` are verified).
+    # While no file is pending but some are leased, e.g., by a worker killed before a
+    # restart, the worker polls every `poll_interval` seconds until their leases expire
+    # and leases them again. `options` are passed on to batch.verify_file. Verified
+    # files are counted by what became of their result: committed, retried (an error
+    # with attempts left) or discarded (the lease had expired).
+    worker_id = worker_id or get_worker_id()
+    heartbeat_interval = heartbeat_interval or lease_duration / 3
+    poll_interval = poll_interval or heartbeat_interval
+    queue_arguments = (database_path, lease_duration, max_attempts)
+    queue = WorkQueue(*queue_arguments)
+    statistics = {
+        "worker_id": worker_id,
+        "verified": 0,
+        "committed": 0,
+        "retried": 0,
+        "discarded": 0,
+    }
+    try:
+        while max_files is None or statistics["verified"] < max_files:
+            leases = queue.lease(worker_id)
+            if not leases:
+                next_expiry = queue.get_next_expiry()
+                if next_expiry is None:
+                    break
+                time.sleep(max(min(next_expiry - time.time(), poll_interval), 0.0))
+                continue
+            path, token = leases[0]
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=keep_alive,
+                args=(queue_arguments, [token], heartbeat_interval, stop),
+                daemon=True,
+            )
+            heartbeat.start()
+            try:
+                result = verify_file(path, **options)
+            finally:
+                stop.set()
+                heartbeat.join()
+            result["worker_id"] = worker_id
+            statistics["verified"] += 1
+            status = queue.complete(path, token, result)
+            if status is None:
+                statistics["discarded"] += 1
+            elif status == PENDING:
+                statistics["retried"] += 1
+            else:
+                statistics["committed"] += 1
+    finally:
+        queue.close()
+    return statistics
+
+
+def run_queue(
+    database_path,
+    paths: Optional[List] = None,
+    number_of_workers: int = 1,
+    lease_duration: float = 300.0,
+    max_attempts: int = 3,
+    **options,
+) -> Dict:
+    # Add `paths` to the queue and verify them with local worker processes (workers on
+    # other machines may run `run_worker` on the same database). Running again after
+    # an interruption resumes with the files not yet finished. Files still unfinished
+    # when the workers return (e.g., with `max_files`) are listed in "unfinished".
+    queue = WorkQueue(database_path, lease_duration, max_attempts)
+    try:
+        if paths:
+            queue.add_files(paths)
+    finally:
+        queue.close()
+    workers = map_files(
+        functools.partial(
+            run_worker,
+            database_path,
+            lease_duration=lease_duration,
+            max_attempts=max_attempts,
+            **options,
+        ),
+        [get_worker_id() for _ in range(number_of_workers)],
+        number_of_workers,
+    )
+    queue = WorkQueue(database_path, lease_duration, max_attempts)
+    try:
+        return {
+            "summary": queue.get_summary(),
+            "unfinished": queue.get_unfinished(),
+            "workers": workers,
+            "results": queue.get_results(),
+        }
+    finally:
+        queue.close()